@@ -1,5 +1,6 @@
 from agency_swarm import Agent
 from agency_swarm.tools import FileSearch, CodeInterpreter # Import the FileSearch tool
+from .tools.LocalSearchTool import LocalSearchTool
 
 class AnsweringAgent(Agent):
     def __init__(self):
@@ -7,8 +8,11 @@ class AnsweringAgent(Agent):
             name="AnsweringAgent",
             description="Answers user questions based on the website content uploaded to the vector store.",
             instructions="./instructions.md", # Points to the instructions file
-            tools=[FileSearch, CodeInterpreter], # Explicitly include the FileSearch tool
-            # tools_folder="./tools", # No custom tools in this folder for this agent
+            tools=[LocalSearchTool, FileSearch, CodeInterpreter], # Local keyword index first, FileSearch as the fallback
+            # tools_folder="./tools", # Tools are listed explicitly so ExampleTool is not loaded
+            # Pages are uploaded in self-contained sections of up to 800 tokens, so a few results carry the answer;
+            # the default of 20 would fill up to ~16k of the 25k prompt tokens
+            file_search={"max_num_results": 8},
             temperature=0.1, # Slightly higher temperature for more natural answers
             max_prompt_tokens=25000,
         )
@@ -0,0 +1,39 @@
+import time
+from agency_swarm.tools import BaseTool
+from pydantic import Field
+from search_index import get_search_index
+
+class LocalSearchTool(BaseTool):
+    """
+    Searches the scraped website content in a local keyword (BM25) index and returns the best matching
+    sections with their page URL, heading and a snippet. Answers in milliseconds without calling the vector store.
+    Best for keyword-heavy questions (names, product terms, error messages, numbers). If it finds nothing
+    relevant, fall back to FileSearch.
+    """
+
+    query: str = Field(
+        ..., description="Keywords to search for, e.g. 'enterprise pricing SSO'. Use the distinctive terms of the user's question."
+    )
+    top_k: int = Field(
+        5, description="Maximum number of sections to return."
+    )
+
+    def run(self) -> str:
+        session_name = self._shared_state.get("session_name") or "default"
+        index = get_search_index(session_name)
+        index.reload() # Picks up pages the scraper committed since the last search
+        if not len(index):
+            return "The local search index is empty for this session. Use FileSearch instead."
+
+        start = time.perf_counter()
+        results = index.search(self.query, self.top_k)
+        elapsed_ms = 1000 * (time.perf_counter() - start)
+
+        if not results:
+            return f"No local matches for '{self.query}'. Try other keywords or use FileSearch."
+
+        lines = [f"Top {len(results)} local matches for '{self.query}' ({elapsed_ms:.1f}ms):"]
+        for rank, result in enumerate(results, 1):
+            heading = f" — {result.heading}" if result.heading else ""
+            lines.append(f"{rank}. {result.url}{heading} (score {result.score:.2f})\n{result.snippet}")
+        return "\n\n".join(lines)
@@ -1,119 +1,218 @@
 import os
 import asyncio
-import requests
-import re
-import html2text
-from xml.etree import ElementTree
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 from agency_swarm.tools import BaseTool
 from pydantic import Field
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+from crawl_manifest import CrawlManifest
+from crawl_journal import CrawlJournal
+from link_discovery import LinkFrontier
+from crawl_scheduler import RobotsCache
+from near_duplicates import NearDuplicateIndex
+from ingest_pipeline import IngestPipeline, Stage
+from markdown_conversion import MarkdownConverter
+from content_extraction import BoilerplateTemplates
+from markdown_chunking import static_chunking_strategy
+from page_buffer import get_page_buffer
+from page_crawler import CrawlSource, PageCrawler
+from page_writer import PageWriter
+from search_index import get_search_index
+from telemetry import exports_telemetry
 
 class WebsiteScraperTool(BaseTool):
     """
-    A tool for scraping all pages of a website using its sitemap.
-    Converts scraped HTML into clean Markdown files.
+    A tool for scraping all pages of a website using its sitemap (including sitemap indexes and gzipped sitemaps).
+    Websites without a sitemap are crawled by following links breadth-first from the website URL.
+    Converts the main content of scraped HTML (without menus, footers and other repeated site chrome) into clean Markdown files,
+    split at their headings into sections sized for the vector store's chunks.
+    Re-runs for the same website and session are incremental: pages whose sitemap lastmod,
+    ETag/Last-Modified or content are unchanged since the last upload are skipped.
+    Near-duplicate pages (versioned paths, tab or print variants of one page) are uploaded only once.
     """
 
     website_url: str = Field(
         ..., description="The base URL of the website to scrape. Example: 'https://example.com'"
     )
     max_concurrent: Optional[int] = Field(
-        5, description="The maximum number of concurrent scraping tasks."
+        5, description="The maximum number of concurrent scraping tasks. The tool keeps this many pages in flight and lowers it per host when the site slows down or rate-limits."
+    )
+    pipeline_upload: bool = Field(
+        False, description="If True, each page is converted and uploaded to the session's vector store as soon as it is scraped, instead of leaving the files for the UploaderAgent. Recommended for large websites."
+    )
+    pipeline_queue_size: int = Field(
+        16, description="Maximum number of pages buffered between the crawl, convert and upload stages in pipeline mode."
+    )
+    fetch_mode: Literal["static", "browser", "auto"] = Field(
+        "auto", description="How pages are fetched: 'static' uses plain HTTP requests only, 'browser' renders every page in headless Chromium, and 'auto' fetches over HTTP and only renders pages that need JavaScript."
+    )
+    conversion_executor: Literal["process", "thread"] = Field(
+        "process", description="Where HTML is converted to Markdown: 'process' uses a process pool (best for heavy pages), 'thread' a thread pool."
+    )
+    conversion_workers: Optional[int] = Field(
+        None, description="Number of HTML-to-Markdown conversion workers. Defaults to the number of CPU cores."
+    )
+    diskless: bool = Field(
+        False, description="If True, converted pages are handed to the uploader in memory instead of being written to 'scraped_content' (pages beyond buffer_max_mb still go to disk). Saves a disk write, read and delete per page on slow file systems; pages not uploaded yet are lost if the process exits."
+    )
+    buffer_max_mb: int = Field(
+        256, description="With diskless, the memory in MB that converted pages may occupy before further pages spill to disk."
+    )
+    extract_main_content: bool = Field(
+        True, description="If True, only each page's main content is converted: navigation, headers, footers, sidebars, cookie banners and blocks repeated across the site's pages are stripped. Set to False to convert whole pages."
+    )
+    chunk_max_tokens: Optional[int] = Field(
+        800, description="Pages are split at their headings into self-contained sections of at most about this many tokens, each starting with the page title, URL and heading path, and the vector store splits files into chunks of this size instead of its automatic chunking. Set to None to upload pages unsectioned with automatic chunking."
+    )
+    chunk_overlap_tokens: int = Field(
+        100, description="With chunk_max_tokens, the number of tokens consecutive vector store chunks share (at most half the chunk size)."
+    )
+    discover_links: Literal["auto", "always", "never"] = Field(
+        "auto", description="How pages are found: 'auto' follows links from the website URL only when the site has no sitemap (or an empty one), 'always' ignores the sitemap and follows links, 'never' only uses the sitemap."
+    )
+    max_depth: int = Field(
+        10, description="When following links, the maximum number of clicks from the website URL (or from a page found by an earlier crawl)."
+    )
+    max_pages: int = Field(
+        10000, description="When following links, the maximum number of pages to crawl."
+    )
+    near_duplicate_threshold: Optional[float] = Field(
+        0.8, description="Pages whose text overlaps this much (0-1) with an already scraped page are treated as near-duplicates and not uploaded. Set to None to keep every page."
+    )
+    build_search_index: bool = Field(
+        True, description="If True, scraped pages are also added to the session's local search index used by the AnsweringAgent's LocalSearchTool."
     )
 
+    @exports_telemetry
     async def run(self) -> str: # Modified return type to string as per best practices
         """
         Runs the website scraper tool.
-        Fetches sitemap URLs, scrapes content, and saves as markdown files.
+        Fetches sitemap URLs, scrapes new or changed content, and saves as markdown files.
 
         Returns:
             str: A message indicating the number of pages scraped and stored.
         """
-        urls = self.get_sitemap_urls()
-        if not urls:
-            return "No URLs found to scrape."
-
-        scraped_data = await self.crawl_parallel(urls, self.max_concurrent)
-        saved_files = self.save_to_markdown(scraped_data)
-       # Store file paths in shared state
-        self._shared_state.set("scraped_files", saved_files)
-
-        return f"{len(saved_files)} pages of {self.website_url} have been scraped and stored in the shared state."
-
-    def get_sitemap_urls(self) -> List[str]:
-        """Fetches all URLs from the website's sitemap."""
-        sitemap_url = f"{self.website_url.rstrip('/')}/sitemap.xml"
+        session_name = self._shared_state.get("session_name") or "default"
         try:
-            response = requests.get(sitemap_url)
-            response.raise_for_status()
-
-            root = ElementTree.fromstring(response.content)
-            namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-            urls = [loc.text for loc in root.findall('.//ns:loc', namespace)]
-
-            return urls
-        except Exception as e:
-            print(f"Error fetching sitemap: {e}")
-            return []
-
-    async def crawl_parallel(self, urls: List[str], max_concurrent: int) -> List[dict]:
-        """Crawls pages in parallel batches."""
-        print("\n=== Starting Parallel Crawling ===")
-
-        browser_config = BrowserConfig(
-            headless=True,
-            verbose=False,
-            extra_args=["--disable-gpu", "--disable-dev-shm-usage", "--no-sandbox"],
-        )
-        crawl_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS)
-
-        crawler = AsyncWebCrawler(config=browser_config)
-        await crawler.start()
-        scraped_data = []
+            chunking = static_chunking_strategy(self.chunk_max_tokens, self.chunk_overlap_tokens) if self.chunk_max_tokens else None
+        except ValueError as e:
+            return f"Error: {e}"
+        # The uploader attaches files with the chunk size the pages were sectioned for
+        self._shared_state.set("chunking_strategy", chunking)
+        manifest = CrawlManifest.for_site(self.website_url, session_name)
+        index = get_search_index(session_name) if self.build_search_index else None
+        # Progress of an interrupted run for this site and session is picked up from its journal
+        journal = CrawlJournal.for_site(self.website_url, session_name)
+        dedup = None
+        if self.near_duplicate_threshold is not None:
+            dedup = NearDuplicateIndex.for_site(self.website_url, session_name, threshold=self.near_duplicate_threshold)
+        restored_files, restored_uploads = journal.restore(manifest)
+        # Pages missing from the local index (not committed before the interruption) are crawled again
+        finished = {url for url in journal.finished_urls() if index is None or url in index}
+        # Recorded up front, so the uploader can pick up finished pages even if this run is interrupted
+        self._shared_state.set("crawl_manifest", manifest.path)
+        self._shared_state.set("crawl_journal", journal.path)
+        frontier = None
+        if self.discover_links != "never":
+            frontier = LinkFrontier(self.website_url, self.max_depth, self.max_pages, on_discovered=journal.pending)
+        robots = RobotsCache() # Read once per origin for both link discovery and Crawl-delay
+        source = CrawlSource(self.website_url, manifest, journal, finished, frontier,
+                             use_sitemap=self.discover_links != "always", max_concurrent=self.max_concurrent, robots=robots)
+        crawler = PageCrawler(self.fetch_mode, self.max_concurrent, manifest, journal, frontier, robots)
 
         try:
-            for i in range(0, len(urls), max_concurrent):
-                batch = urls[i : i + max_concurrent]
-                tasks = [crawler.arun(url, crawl_config, f"session_{i + j}") for j, url in enumerate(batch)]
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-
-                for url, result in zip(batch, results):
-                    if isinstance(result, Exception):
-                        print(f"Error scraping {url}: {result}")
-                    elif result.success:
-                        scraped_data.append({"url": url, "html": result.html})
-
+            boilerplate = BoilerplateTemplates.for_site(self.website_url, session_name) if self.extract_main_content else None
+            buffer = None
+            if self.diskless:
+                buffer = get_page_buffer()
+                buffer.configure(max_bytes=self.buffer_max_mb * 1024 * 1024)
+            async with MarkdownConverter(self.conversion_executor, self.conversion_workers, boilerplate, buffer) as converter:
+                writer = PageWriter(converter, manifest, index, journal, dedup, self.chunk_max_tokens)
+                if self.pipeline_upload:
+                    return await self._upload_pipelined(source, crawler, writer, restored_files, restored_uploads)
+                saved_files = await writer.save_all(crawler.crawl(source))
+                if not crawler.fetched and not source.skipped and not source.resumed:
+                    return "No URLs found to scrape."
         finally:
-            await crawler.close()
-
-        return scraped_data
-
-    def save_to_markdown(self, scraped_data: List[dict]) -> List[str]:
-        """Converts HTML content to Markdown and saves as .md files."""
-        output_dir = "scraped_content" # Relative path within the agency folder
-        os.makedirs(output_dir, exist_ok=True)
-        saved_files = []
-
-        for data in scraped_data:
-            url = data["url"]
-            html_content = data["html"]
+            journal.close()
 
-            # Convert HTML to Markdown
-            markdown_content = html2text.html2text(html_content)
+        removed = manifest.mark_removed() if source.complete else 0
+        writer.commit()
+        manifest.save()
 
-            # Generate a safe filename from the URL
-            filename = re.sub(r'[<>:"/\\|?*]', '_', url.replace("https://", "").replace("http://", "")) + ".md"
-            filepath = os.path.join(output_dir, filename)
-
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write(f"# Scraped Content from {url}\n\n")
-                f.write(markdown_content)
-
-            saved_files.append(filepath) # Store relative path
-
-        print(f"\nSaved {len(saved_files)} pages to '{output_dir}'")
-        return saved_files
+       # Store file paths in shared state
+        scraped_files = list(dict.fromkeys(restored_files + saved_files))
+        self._shared_state.set("scraped_files", scraped_files)
+
+        unchanged = source.skipped + crawler.fetched - len(saved_files) - writer.duplicates
+        resumed_note = f", {source.resumed} pages already finished by an interrupted run" if source.resumed else ""
+        return (f"{len(scraped_files)} new or changed pages of {self.website_url} have been scraped and stored in the shared state "
+                f"({unchanged} unchanged pages skipped, {writer.duplicates} near-duplicate pages skipped, "
+                f"{removed} pages removed from the site{resumed_note}).")
+
+    async def _upload_pipelined(self, source: CrawlSource, crawler: PageCrawler, writer: PageWriter,
+                                restored_files: List[str], restored_uploads: Dict[str, str]) -> str:
+        """Crawls, converts and uploads pages concurrently through bounded queues.
+        Pages an interrupted run already wrote or uploaded (`restored_*`) are uploaded or committed too."""
+        # Imported here so plain scraping does not depend on the uploader's OpenAI setup
+        from ingest_session import IngestSession, restage_bundle_members
+
+        session = IngestSession(self._shared_state)
+        try:
+            vs_id = await session.open()
+        except RuntimeError as e:
+            return f"Error: could not prepare the vector store for pipelined upload: {e}"
+
+        manifest, journal = writer.manifest, writer.journal
+        os.makedirs(writer.output_dir, exist_ok=True)
+        urls_by_path = manifest.pending_by_path()
+
+        async def convert(data: dict) -> Optional[str]:
+            path = await writer.save(data)
+            if path:
+                urls_by_path[path] = data["url"]
+            return path
+
+        async def upload(path: str) -> str:
+            return await session.upload_file(path, journal, urls_by_path[path])
+
+        pipeline = IngestPipeline(
+            [Stage("convert", convert, workers=writer.converter.max_workers), Stage("upload", upload, workers=self.max_concurrent)],
+            queue_size=self.pipeline_queue_size,
+        )
+        session.recover(restored_uploads)
+        try:
+            if restored_files:
+                await session.upload_files(restored_files, journal, urls_by_path)
+            await pipeline.run(crawler.crawl(source))
+            print(f"Pipeline finished: {pipeline.summary()}")
+            print(writer.converter.summary())
+
+            removed = manifest.mark_removed() if source.complete else 0
+            # Bundles an earlier packed upload left are rebuilt without the changed and removed pages
+            if restaged := restage_bundle_members(manifest):
+                urls_by_path.update(manifest.pending_by_path())
+                await session.upload_files(restaged, journal, urls_by_path)
+        except BaseException:
+            await session.cancel()
+            raise
+        await session.attach()
+        writer.commit()
+        stale = await session.sync_manifest(manifest)
+        journal.clear() # Everything it recorded is committed now
+        try:
+            os.rmdir(writer.output_dir) # Uploaded files are deleted one by one; remove the directory if nothing is left
+        except OSError:
+            pass
+
+        self._shared_state.set("scraped_files", [])
+        self._shared_state.set("crawl_manifest", manifest.path)
+
+        converted = pipeline.processed["upload"] + pipeline.failed["upload"]
+        unchanged = source.skipped + pipeline.processed["convert"] - converted - writer.duplicates
+        rebuilt_note = f", {len(restaged)} unchanged pages re-uploaded from rebuilt bundles" if restaged else ""
+        return (f"{len(session.uploaded) - len(restaged)} new or changed pages of {self.website_url} have been scraped and uploaded to vector store {vs_id} "
+                f"({unchanged} unchanged pages skipped, {writer.duplicates} near-duplicate pages skipped, "
+                f"{removed} pages removed from the site, {stale} outdated files deleted{rebuilt_note}). "
+                f"No separate upload step is needed.")
 
 
 if __name__ == "__main__":
@@ -1,26 +1,49 @@
 import asyncio
-from typing import List
-from openai import AsyncOpenAI
 from pathlib import Path
-import aiofiles
 import shutil # Added for directory removal
 from agency_swarm.tools import BaseTool
-from WebsiteQA.thread_functions import load_threads # Assuming thread_functions.py is accessible
+from crawl_manifest import CrawlManifest
+from crawl_journal import CrawlJournal
+from ingest_session import IngestSession, restage_bundle_members
+from page_bundles import PageStore
+from page_buffer import get_page_buffer
+from telemetry import exports_telemetry
 import os
 from dotenv import load_dotenv
 from pydantic import Field
 
 load_dotenv()
 
-client = AsyncOpenAI()
-
 class UploadToOpenAITool(BaseTool):
     """
     Async implementation for uploading files to OpenAI with vector store management.
     Handles concurrent uploads and automatic vector store association.
     Retrieves scraped file paths from shared state ('scraped_files') and requires
     'session_name' to be set in shared state to identify the correct thread.
+    When the scraper left a crawl manifest ('crawl_manifest'), replaced and deleted pages are
+    also removed from the vector store, so re-runs only touch what changed on the site.
+    Uploads go through a shared rate limiter that caps concurrency and honours OpenAI rate limits.
+    Files whose exact content was uploaded before (by any session) are reused by file ID instead of re-uploaded.
+    Uploaded files are attached to the vector store in batches while the remaining uploads continue.
+    With pack_pages, pages are uploaded in size-capped bundles of related pages instead of one file each.
     """
+    max_concurrent_uploads: int = Field(
+        16, description="Maximum number of files uploaded to OpenAI at the same time."
+    )
+    pack_pages: bool = Field(
+        False, description="If True, pages are combined into size-capped Markdown bundles of related pages (grouped by URL path), each page keeping its URL header. Cuts file count and API calls by one to two orders of magnitude on large sites."
+    )
+    bundle_max_kb: int = Field(
+        512, description="Maximum size of one bundle in KB when pack_pages is True."
+    )
+    bundle_max_pages: int = Field(
+        200, description="Maximum number of pages in one bundle when pack_pages is True."
+    )
+    bundle_group_depth: int = Field(
+        1, description="Number of leading URL path segments that define a group of related pages packed together, e.g. 1 packs /docs/... and /blog/... pages separately."
+    )
+
+    @exports_telemetry
     async def run(self) -> str:
         """Main async entry point for the upload workflow."""
         # ✅ Retrieve session ID
@@ -29,7 +52,23 @@ class UploadToOpenAITool(BaseTool):
 
         # ✅ Retrieve saved file paths
         file_paths = self._shared_state.get("scraped_files", [])
-        if not file_paths:
+        manifest_path = self._shared_state.get("crawl_manifest")
+        manifest = CrawlManifest(manifest_path) if manifest_path else None
+        # ✅ Pick up pages an interrupted scraper (or upload) run finished, from its crawl journal
+        journal_path = self._shared_state.get("crawl_journal")
+        journal = CrawlJournal(journal_path) if manifest and journal_path and os.path.exists(journal_path) else None
+        recovered = {}
+        if journal:
+            journal_files, recovered = journal.restore(manifest)
+            file_paths = list(dict.fromkeys(list(file_paths) + journal_files))
+        if manifest:
+            # ✅ Bundles holding changed or removed pages are rebuilt from their other pages
+            file_paths = list(dict.fromkeys(list(file_paths) + restage_bundle_members(manifest)))
+        if not file_paths and not recovered and not (manifest and manifest.removed()):
+            if manifest is not None and self._shared_state.get("scraped_files") is not None:
+                 if journal:
+                     journal.clear() # Every page it recorded is unchanged, a near-duplicate or already committed
+                 return f"✅ No new, changed or removed pages for session {session_name}. The vector store is up to date."
             # Check if the key exists but is empty, or doesn't exist
             if self._shared_state.get("scraped_files") is None:
                  return f"Error: 'scraped_files' key not found in shared state for session {session_name}."
@@ -37,28 +76,36 @@ class UploadToOpenAITool(BaseTool):
                  return f"Error: No files available in 'scraped_files' for session {session_name}."
 
 
-        # ✅ Retrieve the correct thread ID using session_name
-        # Ensure thread_functions.py and the JSON file are in the correct location
-        try:
-            threads = load_threads(session_name)
-            main_thread_id = threads.get("main_thread")
-            if not main_thread_id:
-                return f"Error: No main thread found for session '{session_name}' in threads file."
-        except FileNotFoundError:
-             return f"Error: Could not find the threads JSON file for session '{session_name}'. Make sure thread_functions.py is configured correctly."
-        except Exception as e:
-             return f"Error loading threads for session '{session_name}': {str(e)}"
-
-
+        session = IngestSession(self._shared_state, self.max_concurrent_uploads, self.bundle_max_kb,
+                                self.bundle_max_pages, self.bundle_group_depth)
         try:
-            # ✅ Handle vector store lifecycle
-            vs_id = await self._manage_vector_store(main_thread_id, session_name)
+            # ✅ Resolve the session's main thread and handle the vector store lifecycle
+            vs_id = await session.open()
 
-            # ✅ Concurrently upload all files
-            file_ids = await self._process_files(file_paths)
-
-            # ✅ Attach files to vector store
-            await self._attach_files_to_store(vs_id, file_ids)
+            # ✅ Concurrently upload all files, attaching them to the vector store as they complete
+            session.recover(recovered)
+            urls_by_path = manifest.pending_by_path() if manifest else None
+            try:
+                if file_paths and self.pack_pages:
+                    store = PageStore.for_manifest(manifest.path) if manifest else None
+                    await session.upload_bundles(file_paths, journal, urls_by_path, store)
+                    # Pages an interrupted run already packed were moved into the page store
+                    if store:
+                        session.bundled.update(path for path in recovered
+                                               if (url := urls_by_path.get(path)) and os.path.exists(store.path_for(url)))
+                elif file_paths:
+                    await session.upload_files(file_paths, journal, urls_by_path)
+            except BaseException:
+                await session.cancel()
+                raise
+
+            # ✅ Wait for the attachment batches to finish
+            await session.attach()
+
+            # ✅ Record uploads and drop replaced/removed pages from the vector store
+            stale = await session.sync_manifest(manifest) if manifest else 0
+            if journal:
+                journal.clear() # The crawl it recorded is committed
 
             # Clear the scraped files from shared state after successful upload
             self._shared_state.set("scraped_files", [])
@@ -67,12 +114,13 @@ class UploadToOpenAITool(BaseTool):
             if file_paths: # Only attempt deletion if there were files to process
                 try:
                     # Determine the directory from the first file path
-                    first_file_path = Path(file_paths[0])
+                    first_file_path = Path(next((p for p in file_paths if Path(p).parent.name == "scraped_content"), file_paths[0]))
                     directory_to_delete = first_file_path.parent
                     # Safety check: ensure we are deleting the expected directory
                     if directory_to_delete.name == "scraped_content":
                         print(f"Attempting to delete directory: {directory_to_delete}")
                         shutil.rmtree(directory_to_delete)
+                        get_page_buffer().discard(str(directory_to_delete)) # Pages left in memory go with it
                         print(f"Successfully deleted directory: {directory_to_delete}")
                     else:
                         print(f"⚠️ Warning: Determined directory '{directory_to_delete}' does not match expected 'scraped_content'. Skipping deletion.")
@@ -84,147 +132,14 @@ class UploadToOpenAITool(BaseTool):
                 print("No file paths found, skipping directory deletion.")
             # --- End of directory deletion ---
 
-            return f"✅ Successfully uploaded {len(file_ids)} files. Thread: {main_thread_id}, Vector Store: {vs_id}. Scraped content directory deleted."
+            packed_note = f" ({len(session.bundled)} pages packed into bundles)" if session.bundled else ""
+            return f"✅ Successfully uploaded {len(session.file_ids)} files{packed_note} and removed {stale} outdated files. Thread: {session.thread_id}, Vector Store: {vs_id}. Scraped content directory deleted."
 
         except Exception as e:
             return f"❌ Critical error during upload/attachment or cleanup: {str(e)}"
-
-    async def _manage_vector_store(self, thread_id: str, session_name: str) -> str:
-        """Handle vector store lifecycle for a thread."""
-        try:
-            # Retrieve thread details
-            thread = await client.beta.threads.retrieve(thread_id)
-
-            # ✅ Reuse existing vector store if available
-            if existing := self._get_existing_vector_store(thread):
-                print(f"Found existing vector store {existing} for thread {thread_id}")
-                return existing
-
-            # ✅ Otherwise, create a new vector store
-            print(f"Creating new vector store for thread {thread_id}")
-            return await self._create_vector_store(thread_id, session_name)
-
-        except Exception as e:
-            raise RuntimeError(f"Vector store management failed for thread {thread_id}: {str(e)}")
-
-    def _get_existing_vector_store(self, thread) -> str | None:
-        """Extract existing vector store ID from thread object."""
-        try:
-            return (
-                thread.tool_resources.file_search.vector_store_ids[0]
-                if (thread.tool_resources and thread.tool_resources.file_search and thread.tool_resources.file_search.vector_store_ids)
-                else None
-            )
-        except Exception as e:
-            print(f"Error accessing tool_resources for vector store ID: {e}")
-            return None
-
-
-    async def _create_vector_store(self, thread_id: str, session_name: str) -> str:
-        """Create and attach a new vector store to the thread."""
-        vs = await client.vector_stores.create(
-            name=f"vs_{session_name}",
-            # expires_after={'anchor': 'last_active_at', 'days': 7} # Example expiration
-        )
-        print(f"Created vector store {vs.id} for session {session_name}")
-
-        await client.beta.threads.update(
-            thread_id=thread_id,
-            tool_resources={"file_search": {"vector_store_ids": [vs.id]}}
-        )
-        print(f"Attached vector store {vs.id} to thread {thread_id}")
-        return vs.id
-
-    async def _process_files(self, paths: List[str]) -> List[str]:
-        """Orchestrate concurrent file uploads."""
-        print(f"Starting upload for {len(paths)} files...")
-        results = await asyncio.gather(
-            *[self._upload_file(p) for p in paths],
-            return_exceptions=True
-        )
-
-        # ✅ Filter out failures and log them
-        successful = []
-        failed_count = 0
-        for result, path in zip(results, paths):
-            if isinstance(result, Exception):
-                print(f"⚠️ Failed to upload {Path(path).name}: {str(result)}")
-                failed_count += 1
-            elif result: # Ensure result is not None
-                successful.append(result.id)
-                print(f"Successfully uploaded {Path(path).name} as file ID {result.id}")
-
-
-        if not successful:
-            raise RuntimeError("❌ All file uploads failed.")
-        if failed_count > 0:
-             print(f"⚠️ Warning: {failed_count} file(s) failed to upload.")
-
-
-        return successful
-
-    async def _upload_file(self, path: str, retries: int = 3):
-        """Single file upload handler with retry logic and filename preservation."""
-        filename = Path(path).name # Extract filename with extension
-
-        if not os.path.exists(path):
-             raise FileNotFoundError(f"File not found at path: {path}")
-
-
-        for attempt in range(retries):
-            try:
-                async with aiofiles.open(path, "rb") as f:
-                    file_content = await f.read()
-                    # Pass filename with extension as part of the file tuple
-                    print(f"Attempting to upload {filename} (Attempt {attempt + 1}/{retries})...")
-                    file = await client.files.create(
-                        file=(filename, file_content), # Include filename in upload
-                        purpose="assistants"
-                    )
-                    print(f"File {filename} uploaded successfully with ID: {file.id}. Deleting local file...")
-                    # After successful upload, delete the file from local storage
-                    try:
-                        await aiofiles.os.remove(path)
-                        print(f"Local file {filename} deleted.")
-                    except Exception as delete_error:
-                         print(f"⚠️ Warning: Failed to delete local file {filename}: {delete_error}")
-
-                    return file # Return the file object on success
-            except Exception as e:
-                print(f"⚠️ Error uploading {filename} (Attempt {attempt + 1}/{retries}): {e}")
-                if attempt < retries - 1:
-                    await asyncio.sleep(2 ** attempt) # Exponential backoff
-                else:
-                    # Raise the error only after all retries fail
-                    raise RuntimeError(f"❌ File upload failed for {filename} after {retries} attempts: {str(e)}")
-
-
-    async def _attach_files_to_store(self, vs_id: str, file_ids: List[str]):
-        """Batch attach files to vector store."""
-        if not file_ids:
-             print("No file IDs to attach.")
-             return
-
-        print(f"Attaching {len(file_ids)} files to vector store {vs_id}...")
-        try:
-            # Use file batching for potentially better performance/reliability
-            batch = await client.vector_stores.file_batches.create_and_poll(
-                 vector_store_id=vs_id,
-                 file_ids=file_ids
-            )
-
-            # Check batch status (optional but good practice)
-            if batch.status == 'completed':
-                print(f"Successfully attached {batch.file_counts.completed} files to vector store {vs_id}.")
-            else:
-                 print(f"⚠️ File batch status: {batch.status}. Files completed: {batch.file_counts.completed}, Failed: {batch.file_counts.failed}")
-                 if batch.file_counts.failed > 0:
-                      # Potentially list failed files if API provides details
-                      raise RuntimeError(f"Attachment failed for {batch.file_counts.failed} file(s).")
-
-
-        except Exception as e:
-            raise RuntimeError(f"Attachment to vector store {vs_id} failed: {str(e)}")
+        finally:
+            if journal:
+                journal.close()
 
 # Example Test Case (requires async execution and shared state setup)
 if __name__ == "__main__":
@@ -256,8 +171,8 @@ if __name__ == "__main__":
         mock_state.set("scraped_files", test_files)
         # IMPORTANT: Replace with a REAL session name and ensure a corresponding thread exists in OpenAI
         mock_state.set("session_name", "test_session_123")
-        # Ensure 'thread_functions.py' and a corresponding 'test_session_123_threads.json'
-        # file (with a 'main_thread' ID) exist and are accessible.
+        # Ensure the thread store has a 'main_thread' ID for this session (a legacy
+        # 'test_session_123_threads.json' file is migrated automatically).
 
         # 3. Create tool instance with mocked state
         tool = UploadToOpenAITool()
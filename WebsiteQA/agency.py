@@ -3,7 +3,12 @@ from CEO import CEO
 from ScraperAgent import ScraperAgent
 from UploaderAgent import UploaderAgent
 from AnsweringAgent import AnsweringAgent
-from thread_functions import load_threads, save_threads, deactivate
+from thread_functions import deactivate
+from thread_store import get_thread_store # SQLite-backed by default; migrates legacy *_threads.json files
+from answer_cache import get_answer_cache, turn_context
+from types import SimpleNamespace
+from browser_pool import get_browser_pool # Same import path as the tools, so both share one pool
+from telemetry import get_telemetry
 from dotenv import load_dotenv
 import asyncio
 
@@ -18,8 +23,18 @@ answering_agent = AnsweringAgent()
 # Define the agency structure and communication flow
 
 class WebQAAgency(Agency):
-    def __init__(self, session_name):
+    """Agency for one session. Plain-text questions sent directly to the AnsweringAgent are served
+    from the answer cache when the same (or, with `answer_similarity_threshold`, a similar)
+    question was answered after the same previous turn since the session's vector store last changed.
+    Cached answers are added to the main thread like any other turn, so follow-up questions see them."""
+
+    def __init__(self, session_name, answer_cache=True, answer_similarity_threshold=None):
         self.session_name = session_name
+        self.answer_cache = get_answer_cache() if answer_cache else None
+        self.answer_similarity_threshold = answer_similarity_threshold
+        # `turn_context` of the main thread's last turn, "" while it has none. A conversation resumed from
+        # the thread store has turns this instance never saw, so its questions are cached after the first one.
+        self._turn_context = None if get_thread_store().main_thread(session_name) else ""
         super().__init__(
             [
                 ceo, answering_agent, # CEO is the entry point for user interaction
@@ -30,16 +45,92 @@ class WebQAAgency(Agency):
             ],
             shared_instructions='agency_manifesto.md',
             threads_callbacks={
-                'load': lambda: load_threads(session_name=session_name),
-                'save': lambda new_threads: save_threads(new_threads, session_name=session_name)
+                'load': lambda: get_thread_store().load(session_name),
+                'save': lambda new_threads: get_thread_store().save(session_name, new_threads)
             },
             max_prompt_tokens=25000, # Default max tokens for conversation history
             temperature=0.2, # Default temperature for agents (can be overridden in agent definition)
         )
 
+    def _cacheable(self, message, recipient_agent, message_files, attachments) -> bool:
+        # Answers depend only on the vector store and the previous turn when the question goes straight to the AnsweringAgent
+        return (self.answer_cache is not None and isinstance(message, str) and recipient_agent is answering_agent
+                and not message_files and not attachments and self._turn_context is not None)
+
+    def _cached_answer(self, message: str, context: str):
+        if (answer := self.answer_cache.get(self.session_name, message, self.answer_similarity_threshold, context)) is None:
+            return None
+        print(f"✅ Served answer from cache ({self.answer_cache.summary()})")
+        try:
+            # Every message to the AnsweringAgent goes through the main thread; keep the turn in its history
+            self._ensure_main_thread()
+            messages = self.main_thread.client.beta.threads.messages
+            messages.create(thread_id=self.main_thread.id, role="user", content=message)
+            messages.create(thread_id=self.main_thread.id, role="assistant", content=answer)
+        except Exception as e:
+            print(f"⚠️ Could not add the cached answer to thread {self.main_thread.id}: {e}")
+        return answer
+
+    def _ensure_main_thread(self):
+        # The main thread is created on its first completion; a cached answer can come before that
+        if self.main_thread.id is not None:
+            return
+        self.main_thread.init_thread()
+        threads = get_thread_store().load(self.session_name) or {}
+        threads["main_thread"] = self.main_thread.id
+        get_thread_store().save(self.session_name, threads)
+
+    def _end_turn(self, message, answer):
+        known = isinstance(message, str) and isinstance(answer, str)
+        self._turn_context = turn_context(message, answer) if known else None
+
+    def get_completion(self, message, message_files=None, yield_messages=False, recipient_agent=None, *args, **kwargs):
+        attachments = kwargs.get("attachments")
+        if yield_messages or not self._cacheable(message, recipient_agent, message_files, attachments):
+            answer = super().get_completion(message, message_files, yield_messages, recipient_agent, *args, **kwargs)
+            self._end_turn(message, None if yield_messages else answer)
+            return answer
+
+        context = self._turn_context
+        version = self.answer_cache.version(self.session_name)
+        if (answer := self._cached_answer(message, context)) is None:
+            answer = super().get_completion(message, message_files, yield_messages, recipient_agent, *args, **kwargs)
+            if isinstance(answer, str):
+                self.answer_cache.put(self.session_name, version, message, answer, self.answer_similarity_threshold, context)
+        self._end_turn(message, answer)
+        return answer
+
+    def get_completion_stream(self, message, event_handler, message_files=None, recipient_agent=None,
+                              additional_instructions=None, attachments=None, *args, **kwargs):
+        if not self._cacheable(message, recipient_agent, message_files, attachments):
+            answer = super().get_completion_stream(message, event_handler, message_files, recipient_agent,
+                                                   additional_instructions, attachments, *args, **kwargs)
+            self._end_turn(message, answer)
+            return answer
+
+        context = self._turn_context
+        version = self.answer_cache.version(self.session_name)
+        if (answer := self._cached_answer(message, context)) is not None:
+            # Replay the answer through the handler as a single streamed assistant message
+            event_handler.set_agent(self.main_thread.agent)
+            event_handler.set_recipient_agent(recipient_agent)
+            handler = event_handler()
+            handler.on_message_created(SimpleNamespace(role="assistant", content=[]))
+            handler.on_text_delta(SimpleNamespace(value=answer), None)
+            event_handler.on_all_streams_end()
+        else:
+            answer = super().get_completion_stream(message, event_handler, message_files, recipient_agent,
+                                                   additional_instructions, attachments, *args, **kwargs)
+            if isinstance(answer, str):
+                self.answer_cache.put(self.session_name, version, message, answer, self.answer_similarity_threshold, context)
+        self._end_turn(message, answer)
+        return answer
+
 async def activate(session_name):
     agency = WebQAAgency(session_name=session_name)
     agency.shared_state.set('session_name', session_name)
+    get_browser_pool().warm_up() # Start Chromium in the background so the first scrape does not wait for it
+    get_telemetry() # Starts the exporters configured through WEBSITEQA_TELEMETRY_JSON / WEBSITEQA_METRICS_PORT
     agency.demo_gradio()
 
 if __name__ == '__main__':
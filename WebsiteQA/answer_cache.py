@@ -0,0 +1,187 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional
+from crawl_manifest import write_json_atomic
+
+ANSWER_CACHE_VERSIONS_PATH = "answer_cache_versions.json"
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+
+def normalize_question(question: str) -> str:
+    """Lowercases and strips punctuation and extra whitespace, so trivial rephrasings share an entry."""
+    return " ".join(PUNCTUATION_PATTERN.sub(" ", question.lower()).split())
+
+def turn_context(question: str, answer: str) -> str:
+    """Digest of a conversation turn, used as the `context` of the question that follows it."""
+    return hashlib.sha256(f"{normalize_question(question)}\n{answer}".encode("utf-8")).hexdigest()[:32]
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+class _Entry(NamedTuple):
+    answer: str
+    embedding: Optional[List[float]]
+    created_at: float
+
+class AnswerCache:
+    """LRU cache of AnsweringAgent answers, keyed by session, vector-store version, conversation
+    context and normalized question.
+
+    The context is the `turn_context` of the turn before the question ("" for the first
+    question of a thread), so a follow-up like "and for teams?" is only answered from the
+    cache after the same previous turn.
+
+    Every change to a session's vector store (uploads, teardown) bumps its version through
+    `bump_version`, so answers computed against older content are never served again.
+    Versions are persisted in `versions_path` and re-read when another process bumps them.
+
+    With a `similarity_threshold`, a question that misses exactly is embedded and matched
+    against the cached questions of the same session, version and context by cosine similarity.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 24 * 3600,
+                 versions_path: str = ANSWER_CACHE_VERSIONS_PATH, embedding_model: str = EMBEDDING_MODEL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.versions_path = versions_path
+        self.embedding_model = embedding_model
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._versions_mtime = None
+        self._client = None
+        self._pending_embeddings: Dict[tuple, List[float]] = {} # Embeddings of missed questions, awaiting `put`
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # --- Versions ---
+
+    def _refresh_versions(self):
+        try:
+            mtime = os.stat(self.versions_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._versions_mtime:
+            with open(self.versions_path, "r", encoding="utf-8") as f:
+                self._versions = json.load(f)
+            self._versions_mtime = mtime
+
+    def version(self, session_name: str) -> int:
+        with self._lock:
+            self._refresh_versions()
+            return self._versions.get(session_name, 0)
+
+    def bump_version(self, session_name: str) -> int:
+        """Invalidates every cached answer of the session. Call whenever its vector store changes."""
+        with self._lock:
+            self._refresh_versions()
+            version = self._versions.get(session_name, 0) + 1
+            self._versions[session_name] = version
+            write_json_atomic(self.versions_path, self._versions)
+            self._versions_mtime = os.stat(self.versions_path).st_mtime_ns
+            # Entries of older versions can never be hit again
+            for key in [key for key in self._entries if key[0] == session_name]:
+                del self._entries[key]
+        return version
+
+    # --- Lookups ---
+
+    def _embed(self, text: str) -> Optional[List[float]]:
+        try:
+            if self._client is None:
+                from openai import OpenAI
+                self._client = OpenAI()
+            return self._client.embeddings.create(model=self.embedding_model, input=text).data[0].embedding
+        except Exception as e:
+            print(f"⚠️ Answer cache: could not embed question: {e}")
+            return None
+
+    def get(self, session_name: str, question: str, similarity_threshold: Optional[float] = None,
+            context: str = "") -> Optional[str]:
+        normalized = normalize_question(question)
+        version = self.version(session_name)
+        key = (session_name, version, context, normalized)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry.created_at <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.answer
+        if similarity_threshold is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        embedding = self._embed(normalized)
+        if embedding is not None:
+            with self._lock:
+                candidates = [(k, e) for k, e in self._entries.items()
+                              if k[:3] == (session_name, version, context) and e.embedding and now - e.created_at <= self.ttl]
+            best_key, best_entry, best_score = None, None, similarity_threshold
+            for candidate_key, candidate in candidates:
+                score = _cosine(embedding, candidate.embedding)
+                if score >= best_score:
+                    best_key, best_entry, best_score = candidate_key, candidate, score
+            if best_entry:
+                with self._lock:
+                    if best_key in self._entries:
+                        self._entries.move_to_end(best_key)
+                    self.semantic_hits += 1
+                return best_entry.answer
+        with self._lock:
+            self.misses += 1
+            if embedding is not None:
+                # Keep the embedding for `put`, so the question is not embedded twice
+                if len(self._pending_embeddings) >= self.max_entries:
+                    self._pending_embeddings.clear()
+                self._pending_embeddings[key] = embedding
+        return None
+
+    def put(self, session_name: str, version: int, question: str, answer: str,
+            similarity_threshold: Optional[float] = None, context: str = "") -> None:
+        """Caches an answer computed while the session was at `version` (read before answering)."""
+        if not answer or version != self.version(session_name):
+            return # The vector store changed while the answer was being computed
+        normalized = normalize_question(question)
+        key = (session_name, version, context, normalized)
+        embedding = None
+        if similarity_threshold is not None:
+            with self._lock:
+                embedding = self._pending_embeddings.pop(key, None)
+            if embedding is None:
+                embedding = self._embed(normalized)
+        with self._lock:
+            self._entries[key] = _Entry(answer, embedding, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def summary(self) -> str:
+        lookups = self.hits + self.semantic_hits + self.misses
+        hit_rate = (self.hits + self.semantic_hits) / lookups if lookups else 0.0
+        return (f"answer cache: {self.hits} hits, {self.semantic_hits} similar-question hits, {self.misses} misses "
+                f"({hit_rate:.0%} hit rate), {len(self._entries)} entries, {self.evictions} evictions")
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+def get_answer_cache() -> AnswerCache:
+    """Returns the process-wide answer cache shared by every agency instance."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnswerCache()
+        return _cache
@@ -0,0 +1,120 @@
+import asyncio
+import random
+import time
+from typing import List, Optional, Set
+from openai_client import get_client
+from rate_limiter import get_rate_limiter
+from telemetry import get_telemetry
+
+MAX_BATCH_SIZE = 500 # File IDs per file_batches.create request accepted by the API
+
+class BatchAttacher:
+    """Attaches uploaded files to a vector store in size-capped batches while uploads continue.
+
+    `add(file_id)` queues a file; a batch is created as soon as `batch_size` files are
+    queued, or `linger` seconds after the first file of a partial batch arrived, so indexing
+    starts while later files are still uploading. Up to `max_in_flight` batches are polled
+    concurrently, with jittered exponential backoff between polls, and progress is printed as
+    each batch finishes. `close()` submits the remainder, waits for every batch and raises
+    RuntimeError if any file failed to attach.
+
+    `chunking_strategy` (e.g. a static one matching the size the scraper sectioned pages for)
+    is passed to every batch; without it the vector store chunks files automatically.
+    """
+
+    def __init__(self, vs_id: str, batch_size: int = MAX_BATCH_SIZE, linger: float = 2.0, max_in_flight: int = 4,
+                 poll_interval: float = 0.5, max_poll_interval: float = 10.0, chunking_strategy: Optional[dict] = None):
+        self.vs_id = vs_id
+        self.chunking_strategy = chunking_strategy
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self.linger = linger
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._queued: List[str] = []
+        self._added: Set[str] = set() # Identical pages share a file ID; attach it once
+        self._batches: List[asyncio.Task] = []
+        self._linger_timer: Optional[asyncio.TimerHandle] = None
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.batches_done = 0
+        self.started_at = time.monotonic()
+
+    def add(self, file_id: str):
+        if file_id in self._added:
+            return
+        self._added.add(file_id)
+        self._queued.append(file_id)
+        if len(self._queued) >= self.batch_size:
+            self._submit()
+        elif self._linger_timer is None:
+            self._linger_timer = asyncio.get_running_loop().call_later(self.linger, self._submit)
+
+    def add_many(self, file_ids: List[str]):
+        for file_id in file_ids:
+            self.add(file_id)
+
+    def _submit(self):
+        if self._linger_timer is not None:
+            self._linger_timer.cancel()
+            self._linger_timer = None
+        if not self._queued:
+            return
+        file_ids, self._queued = self._queued, []
+        self.submitted += len(file_ids)
+        self._batches.append(asyncio.create_task(self._attach(file_ids)))
+
+    async def _attach(self, file_ids: List[str]):
+        telemetry = get_telemetry()
+        options = {"chunking_strategy": self.chunking_strategy} if self.chunking_strategy else {}
+        async with self._slots:
+            with telemetry.span("attach_poll"):
+                batch = await get_rate_limiter().call(
+                    lambda: get_client().with_options(max_retries=0).vector_stores.file_batches.with_raw_response.create(
+                        vector_store_id=self.vs_id, file_ids=file_ids, **options
+                    ),
+                    f"Attaching {len(file_ids)} files to {self.vs_id}",
+                )
+                delay = self.poll_interval
+                while batch.status == "in_progress":
+                    await asyncio.sleep(random.uniform(0.5, 1.0) * delay)
+                    delay = min(self.max_poll_interval, delay * 1.5)
+                    batch = await get_rate_limiter().call(
+                        lambda: get_client().with_options(max_retries=0).vector_stores.file_batches.with_raw_response.retrieve(
+                            batch.id, vector_store_id=self.vs_id
+                        ),
+                        f"Polling file batch {batch.id}",
+                    )
+
+        counts = batch.file_counts
+        self.completed += counts.completed
+        self.failed += counts.failed + counts.cancelled
+        self.batches_done += 1
+        telemetry.count("attached_files_total", counts.completed, status="completed")
+        telemetry.count("attached_files_total", counts.failed + counts.cancelled, status="failed")
+        print(f"Attached {self.completed}/{self.submitted} files to vector store {self.vs_id} "
+              f"({self.batches_done}/{len(self._batches)} batches done, {time.monotonic() - self.started_at:.1f}s)"
+              + (f", {self.failed} failed" if self.failed else ""))
+        if batch.status != "completed":
+            print(f"⚠️ File batch {batch.id} finished with status {batch.status}.")
+
+    async def close(self) -> int:
+        """Submits the files still queued and waits for all batches. Returns the number of attached files."""
+        self._submit()
+        results = await asyncio.gather(*self._batches, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise RuntimeError(f"{len(errors)} of {len(results)} file batches could not be attached: {errors[0]}")
+        if self.failed:
+            raise RuntimeError(f"Attachment failed for {self.failed} file(s).")
+        return self.completed
+
+    async def cancel(self):
+        """Stops the linger timer and any batches still polling (e.g. when the uploads failed)."""
+        if self._linger_timer is not None:
+            self._linger_timer.cancel()
+            self._linger_timer = None
+        for task in self._batches:
+            task.cancel()
+        await asyncio.gather(*self._batches, return_exceptions=True)
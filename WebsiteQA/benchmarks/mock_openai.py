@@ -0,0 +1,243 @@
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+FILENAME_PATTERN = re.compile(rb'filename="([^"]*)"')
+AUTO_CHUNKING = (800, 400) # (max_chunk_size_tokens, chunk_overlap_tokens) of the "auto" chunking strategy
+BYTES_PER_TOKEN = 4
+
+def chunk_count(size: int, max_tokens: int, overlap_tokens: int) -> int:
+    """Chunks a file of `size` bytes is split into, estimating four bytes per token."""
+    tokens = size // BYTES_PER_TOKEN
+    return 1 + max(0, -(-(tokens - max_tokens) // (max_tokens - overlap_tokens)))
+
+class MockOpenAIState:
+    """In-memory stand-in for the files, vector store and thread endpoints the agency uses.
+
+    Every request sleeps `latency` seconds (uploads `upload_latency`), and a fraction
+    `rate_limit_rate` of requests is rejected with 429 and a Retry-After, like the real API.
+    File batches stay `in_progress` for `index_latency` seconds after they are created, and
+    batches of more than `max_batch_size` files are rejected, as are invalid chunking
+    strategies. `chunks` estimates how many chunks the attached files were split into.
+    """
+
+    def __init__(self, latency: float = 0.02, upload_latency: float = 0.05, rate_limit_rate: float = 0.0,
+                 retry_after: float = 0.2, seed: int = 0, index_latency: float = 0.0, max_batch_size: int = 500):
+        self.latency = latency
+        self.upload_latency = upload_latency
+        self.index_latency = index_latency
+        self.max_batch_size = max_batch_size
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.files: Dict[str, dict] = {}
+        self.vector_stores: Dict[str, set] = {}
+        self.threads: Dict[str, dict] = {}
+        self.batches: Dict[str, tuple] = {} # batch id -> (file count, time it finishes indexing)
+        self.requests = Counter()
+        self.rate_limited = Counter()
+        self.uploaded_bytes = 0
+        self.chunks = 0
+
+    def new_id(self, prefix: str) -> str:
+        with self._lock:
+            return f"{prefix}-{next(self._ids):08d}"
+
+    def should_rate_limit(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.rate_limit_rate
+
+    def thread(self, thread_id: str) -> dict:
+        # Any thread id exists, so the benchmark only has to store the id in the thread store
+        with self._lock:
+            return self.threads.setdefault(thread_id, {"id": thread_id, "object": "thread", "created_at": 0,
+                                                       "metadata": {}, "tool_resources": {}})
+
+def _file_object(file_id: str, meta: dict) -> dict:
+    return {"id": file_id, "object": "file", "bytes": meta["bytes"], "created_at": 0, "filename": meta["filename"],
+            "purpose": "assistants", "status": "processed"}
+
+def _store_file(file_id: str, vs_id: str) -> dict:
+    return {"id": file_id, "object": "vector_store.file", "created_at": 0, "vector_store_id": vs_id,
+            "status": "completed", "usage_bytes": 0, "last_error": None}
+
+def _vector_store(vs_id: str, files: set) -> dict:
+    return {"id": vs_id, "object": "vector_store", "created_at": 0, "name": vs_id, "usage_bytes": 0,
+            "file_counts": {"in_progress": 0, "completed": len(files), "failed": 0, "cancelled": 0, "total": len(files)},
+            "status": "completed", "last_active_at": 0, "metadata": {}}
+
+def _batch(batch_id: str, vs_id: str, count: int, ready_at: float) -> dict:
+    indexing = time.monotonic() < ready_at
+    return {"id": batch_id, "object": "vector_store.files_batch", "created_at": 0, "vector_store_id": vs_id,
+            "status": "in_progress" if indexing else "completed",
+            "file_counts": {"in_progress": count if indexing else 0, "completed": 0 if indexing else count,
+                            "failed": 0, "cancelled": 0, "total": count}}
+
+def _not_found(what: str):
+    return 404, {"error": {"message": f"No such {what}", "type": "invalid_request_error"}}
+
+def _route(state: MockOpenAIState, method: str, path: str, query: dict, body: bytes):
+    parts = path.strip("/").split("/")[1:] # Drop the "v1" prefix
+    lock = state._lock
+
+    if parts == ["files"] and method == "POST":
+        match = FILENAME_PATTERN.search(body)
+        file_id = state.new_id("file")
+        with lock:
+            state.files[file_id] = {"bytes": len(body), "filename": match.group(1).decode() if match else "upload"}
+            state.uploaded_bytes += len(body)
+        return 200, _file_object(file_id, state.files[file_id])
+    if len(parts) == 2 and parts[0] == "files":
+        with lock:
+            meta = state.files.get(parts[1]) if method == "GET" else state.files.pop(parts[1], None)
+        if meta is None:
+            return _not_found("file")
+        if method == "GET":
+            return 200, _file_object(parts[1], meta)
+        return 200, {"id": parts[1], "object": "file", "deleted": True}
+
+    if parts[:1] == ["threads"] and len(parts) == 2:
+        thread = state.thread(parts[1])
+        if method == "POST":
+            update = json.loads(body or b"{}")
+            with lock:
+                thread["tool_resources"] = update.get("tool_resources", thread["tool_resources"])
+                thread["metadata"] = update.get("metadata", thread["metadata"])
+        elif method == "DELETE":
+            with lock:
+                state.threads.pop(parts[1], None)
+            return 200, {"id": parts[1], "object": "thread.deleted", "deleted": True}
+        return 200, thread
+
+    if parts == ["vector_stores"] and method == "POST":
+        vs_id = state.new_id("vs")
+        with lock:
+            state.vector_stores[vs_id] = set()
+        return 200, _vector_store(vs_id, set())
+    if parts[:1] == ["vector_stores"] and len(parts) >= 2:
+        vs_id = parts[1]
+        with lock:
+            files = state.vector_stores.get(vs_id)
+        if files is None:
+            return _not_found("vector store")
+        if len(parts) == 2:
+            if method == "DELETE":
+                with lock:
+                    state.vector_stores.pop(vs_id, None)
+                return 200, {"id": vs_id, "object": "vector_store.deleted", "deleted": True}
+            return 200, _vector_store(vs_id, files)
+        if parts[2] == "file_batches":
+            if method == "POST":
+                request = json.loads(body)
+                file_ids = request.get("file_ids", [])
+                if len(file_ids) > state.max_batch_size:
+                    return 400, {"error": {"message": f"file_ids may hold at most {state.max_batch_size} items",
+                                           "type": "invalid_request_error"}}
+                strategy = request.get("chunking_strategy") or {"type": "auto"}
+                chunking = AUTO_CHUNKING
+                if strategy["type"] == "static":
+                    chunking = (strategy["static"]["max_chunk_size_tokens"], strategy["static"]["chunk_overlap_tokens"])
+                    if not 100 <= chunking[0] <= 4096 or not 0 <= chunking[1] <= chunking[0] // 2:
+                        return 400, {"error": {"message": f"Invalid static chunking strategy {chunking}",
+                                               "type": "invalid_request_error"}}
+                batch_id = state.new_id("vsfb")
+                with lock:
+                    state.chunks += sum(chunk_count(state.files[file_id]["bytes"], *chunking)
+                                        for file_id in file_ids if file_id in state.files)
+                    files.update(file_ids)
+                    state.batches[batch_id] = (len(file_ids), time.monotonic() + state.index_latency)
+                return 200, _batch(batch_id, vs_id, *state.batches[batch_id])
+            if parts[3] not in state.batches:
+                return _not_found("file batch")
+            return 200, _batch(parts[3], vs_id, *state.batches[parts[3]])
+        if parts[2] == "files":
+            if len(parts) == 3 and method == "GET":
+                limit = int(query.get("limit", 20))
+                after = query.get("after")
+                with lock:
+                    ordered = sorted(files)
+                if after:
+                    ordered = [f for f in ordered if f > after]
+                page = ordered[:limit]
+                return 200, {"object": "list", "data": [_store_file(f, vs_id) for f in page],
+                             "first_id": page[0] if page else None, "last_id": page[-1] if page else None,
+                             "has_more": len(ordered) > limit}
+            if len(parts) == 3 and method == "POST":
+                file_id = json.loads(body)["file_id"]
+                with lock:
+                    files.add(file_id)
+                return 200, _store_file(file_id, vs_id)
+            if len(parts) == 4 and method == "DELETE":
+                with lock:
+                    if parts[3] not in files:
+                        return _not_found("vector store file")
+                    files.discard(parts[3])
+                return 200, {"id": parts[3], "object": "vector_store.file.deleted", "deleted": True}
+    return 404, {"error": {"message": f"Mock does not implement {method} {path}", "type": "invalid_request_error"}}
+
+def _handler(state: MockOpenAIState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _handle(self):
+            path, _, query_string = self.path.partition("?")
+            query = dict(pair.split("=", 1) for pair in query_string.split("&") if "=" in pair)
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            endpoint = re.sub(r"/(files|threads|vector_stores|file_batches)/[^/]+", r"/\1/{id}", path)
+            state.requests[f"{self.command} {endpoint}"] += 1
+
+            is_upload = self.command == "POST" and path.rstrip("/").endswith("/files") and "vector_stores" not in path
+            time.sleep(state.upload_latency if is_upload else state.latency)
+            if state.should_rate_limit():
+                state.rate_limited[f"{self.command} {endpoint}"] += 1
+                status, payload = 429, {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_error"}}
+                headers = {"retry-after-ms": str(int(state.retry_after * 1000)), "x-ratelimit-remaining-requests": "0",
+                           "x-ratelimit-reset-requests": f"{int(state.retry_after * 1000)}ms"}
+            else:
+                status, payload = _route(state, self.command, path, query, body)
+                headers = {}
+
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_DELETE = _handle
+
+    return Handler
+
+class MockOpenAIServer:
+    """Runs the mock API on localhost from a background thread. Point OPENAI_BASE_URL at `base_url`."""
+
+    def __init__(self, state: Optional[MockOpenAIState] = None, port: int = 0):
+        self.state = state or MockOpenAIState()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _handler(self.state))
+        self._server.daemon_threads = True
+        self._server.request_queue_size = 128
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def __enter__(self) -> "MockOpenAIServer":
+        threading.Thread(target=self._server.serve_forever, name="bench-openai", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,225 @@
+import argparse
+import asyncio
+import functools
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List
+from benchmarks.site_server import SiteServer, SyntheticSite
+from benchmarks.mock_openai import MockOpenAIServer, MockOpenAIState
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+SESSION_NAME = "benchmark"
+THREAD_ID = "thread_benchmark"
+
+# Metric name -> True if higher is better
+TRACKED_METRICS = {
+    "pages_per_sec": True,
+    "uploads_per_sec": True,
+    "end_to_end_seconds": False,
+    "rescrape_seconds": False,
+    "peak_rss_mb": False,
+}
+
+SCRAPER_STAGES = ["_upload_pipelined"]
+WRITER_STAGES = ["save_all"] # Includes the crawl it consumes
+SESSION_STAGES = ["upload_files", "upload_bundles", "attach", "sync_manifest"]
+
+@contextmanager
+def timed_methods(cls, names: List[str], timings: Dict[str, float]):
+    """Temporarily wraps async methods of `cls` so the wall time spent in each is added to `timings`."""
+    originals = {name: getattr(cls, name) for name in names}
+
+    def wrap(name, method):
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                timings[name] += time.perf_counter() - start
+        return wrapper
+
+    for name, method in originals.items():
+        setattr(cls, name, wrap(name, method))
+    try:
+        yield
+    finally:
+        for name, method in originals.items():
+            setattr(cls, name, method)
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process plus its (conversion) worker processes."""
+    unit = 1 if sys.platform == "darwin" else 1024 # ru_maxrss is bytes on macOS, KB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return (own + children) * unit / (1024 * 1024)
+
+async def run_benchmark(args) -> dict:
+    site = SyntheticSite(pages=args.pages, page_kb=args.page_kb, latency=args.site_latency_ms / 1000,
+                         sitemap=not args.no_sitemap)
+    api_state = MockOpenAIState(latency=args.api_latency_ms / 1000, upload_latency=args.upload_latency_ms / 1000,
+                                rate_limit_rate=args.rate_limit_rate, index_latency=args.index_latency_ms / 1000)
+    cwd = os.getcwd()
+    with SiteServer(site) as site_server, MockOpenAIServer(api_state) as api, tempfile.TemporaryDirectory() as workdir:
+        os.environ["OPENAI_API_KEY"] = "benchmark"
+        os.environ["OPENAI_BASE_URL"] = api.base_url
+        os.chdir(workdir) # Manifests, caches, indexes and the thread store all go to the scratch directory
+        try:
+            # Imported only now, so everything they set up on first use sees the environment and scratch directory above
+            from agency_swarm.util.shared_state import SharedState
+            from ScraperAgent.tools.WebsiteScraperTool import WebsiteScraperTool
+            from UploaderAgent.tools.UploadToOpenAITool import UploadToOpenAITool
+            from page_writer import PageWriter
+            from ingest_session import IngestSession
+            from sitemap_functions import iter_sitemap_entries
+            from thread_store import get_thread_store
+            from rate_limiter import get_rate_limiter
+            from telemetry import get_telemetry
+
+            get_thread_store().save(SESSION_NAME, {"main_thread": THREAD_ID})
+            get_rate_limiter().configure(requests_per_second=args.requests_per_second)
+            get_telemetry().reset()
+            shared_state = SharedState()
+            shared_state.set("session_name", SESSION_NAME)
+            # Shared state is a class attribute of each tool, as set by the agency
+            WebsiteScraperTool._shared_state = UploadToOpenAITool._shared_state = shared_state
+            stages = defaultdict(float)
+
+            start = time.perf_counter()
+            sitemap_pages = [entry async for entry in iter_sitemap_entries(site_server.url)]
+            stages["sitemap"] = time.perf_counter() - start
+            pages = site.pages if args.no_sitemap else len(sitemap_pages)
+
+            def scraper():
+                return WebsiteScraperTool(
+                    website_url=site_server.url, max_concurrent=args.concurrency, fetch_mode="static",
+                    pipeline_upload=args.mode == "pipeline", conversion_executor=args.executor, diskless=args.diskless,
+                    chunk_max_tokens=args.chunk_tokens or None,
+                )
+
+            with timed_methods(WebsiteScraperTool, SCRAPER_STAGES, stages), \
+                    timed_methods(PageWriter, WRITER_STAGES, stages), \
+                    timed_methods(IngestSession, SESSION_STAGES, stages):
+                start = time.perf_counter()
+                scrape_result = await scraper().run()
+                scrape_seconds = time.perf_counter() - start
+                upload_seconds = scrape_seconds
+                upload_result = None
+                if args.mode == "sequential":
+                    uploader = UploadToOpenAITool(max_concurrent_uploads=args.upload_concurrency, pack_pages=args.pack)
+                    start = time.perf_counter()
+                    upload_result = await uploader.run()
+                    upload_seconds = time.perf_counter() - start
+                end_to_end = scrape_seconds + (upload_seconds if args.mode == "sequential" else 0)
+
+                rescrape_seconds = None
+                if args.incremental:
+                    # Nothing changed on the site, so this measures the incremental (revalidation) path
+                    start = time.perf_counter()
+                    await scraper().run()
+                    rescrape_seconds = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    uploads = api_state.requests.get("POST /v1/files", 0) - api_state.rate_limited.get("POST /v1/files", 0)
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in ("save_baseline", "compare", "tolerance")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "metrics": {
+            "pages": pages,
+            "uploads": uploads,
+            "pages_per_sec": round(pages / scrape_seconds, 2),
+            "uploads_per_sec": round(uploads / upload_seconds, 2) if upload_seconds else 0.0,
+            "end_to_end_seconds": round(end_to_end, 3),
+            "rescrape_seconds": round(rescrape_seconds, 3) if rescrape_seconds is not None else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        },
+        "stages_seconds": {name: round(seconds, 3) for name, seconds in stages.items()},
+        "api": {
+            "requests": dict(api_state.requests),
+            "rate_limited": sum(api_state.rate_limited.values()),
+            "client_retries": get_rate_limiter().retries,
+            "uploaded_mb": round(api_state.uploaded_bytes / 1024 / 1024, 2),
+            "vector_store_chunks": api_state.chunks,
+        },
+        "site": {"requests": site.requests, "not_modified": site.not_modified},
+        "latency": get_telemetry().snapshot()["histograms"],
+        "results": {"scrape": scrape_result, "upload": upload_result},
+    }
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+def save_baseline(report: dict, name: str) -> str:
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = baseline_path(name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Prints current vs baseline metrics and returns the names of regressed metrics."""
+    if baseline["config"] != report["config"]:
+        print("⚠️ Baseline was recorded with a different configuration; the comparison may be meaningless.")
+    regressions = []
+    print(f"\n{'metric':<22}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, higher_is_better in TRACKED_METRICS.items():
+        old, new = baseline["metrics"].get(name), report["metrics"].get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<22}{old:>12}{new:>12}{change:>+10.1%}{'  ❌ regression' if regressed else ''}")
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline ingest benchmark: synthetic site -> scraper -> mock OpenAI API.")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--page-kb", type=int, default=8)
+    parser.add_argument("--mode", choices=["sequential", "pipeline"], default="sequential",
+                        help="sequential: scrape, then run the uploader; pipeline: WebsiteScraperTool(pipeline_upload=True)")
+    parser.add_argument("--concurrency", type=int, default=10, help="WebsiteScraperTool.max_concurrent")
+    parser.add_argument("--upload-concurrency", type=int, default=16, help="UploadToOpenAITool.max_concurrent_uploads")
+    parser.add_argument("--executor", choices=["process", "thread"], default="process")
+    parser.add_argument("--site-latency-ms", type=float, default=0.0)
+    parser.add_argument("--api-latency-ms", type=float, default=20.0)
+    parser.add_argument("--upload-latency-ms", type=float, default=50.0)
+    parser.add_argument("--index-latency-ms", type=float, default=1000.0, help="Time each vector store file batch spends indexing")
+    parser.add_argument("--requests-per-second", type=float, default=20.0, help="Client-side OpenAI rate limit")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of API requests answered with 429")
+    parser.add_argument("--diskless", action="store_true", help="Hand pages to the uploader in memory (WebsiteScraperTool.diskless)")
+    parser.add_argument("--chunk-tokens", type=int, default=800,
+                        help="WebsiteScraperTool.chunk_max_tokens; 0 uploads unsectioned pages with automatic chunking")
+    parser.add_argument("--pack", action="store_true", help="Upload pages in bundles (UploadToOpenAITool.pack_pages; sequential mode)")
+    parser.add_argument("--no-sitemap", action="store_true", help="Serve no sitemap, so pages are found by following links")
+    parser.add_argument("--incremental", action="store_true", help="Re-scrape the unchanged site and report its time")
+    parser.add_argument("--save-baseline", metavar="NAME", help="Save this run as baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="Compare against baselines/NAME.json; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_benchmark(args))
+    print(json.dumps({key: report[key] for key in ("metrics", "stages_seconds", "api", "site", "latency")}, indent=2))
+
+    if args.save_baseline:
+        print(f"✅ Baseline saved to {save_baseline(report, args.save_baseline)}")
+    if args.compare:
+        with open(baseline_path(args.compare), "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"❌ Regressed: {', '.join(regressions)}")
+            return 1
+        print("✅ No regressions.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
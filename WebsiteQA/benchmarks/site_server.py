@@ -0,0 +1,131 @@
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+WORDS = (
+    "agent answer api async batch browser cache crawl data deploy document embed error file guide "
+    "index install latency limit markdown model page pipeline pricing query rate request scale search "
+    "session sitemap store stream team thread token upload vector website worker"
+).split()
+URLS_PER_SITEMAP = 5000
+
+class SyntheticSite:
+    """Deterministic website of `pages` HTML pages of about `page_kb` KB each, with a sitemap index
+    (unless `sitemap` is False). The home page links to the first page and pages link to their
+    children in a tree, so link discovery reaches all of them.
+
+    Page content depends only on the page number and `revision`, so two servers with the
+    same settings serve identical pages; bumping `revision` changes every page. Pages carry
+    an ETag and answer conditional requests with 304.
+    """
+
+    def __init__(self, pages: int = 500, page_kb: int = 8, latency: float = 0.0, revision: int = 0, sitemap: bool = True):
+        self.pages = pages
+        self.sitemap_enabled = sitemap
+        self.page_kb = page_kb
+        self.latency = latency
+        self.revision = revision
+        self.requests = 0
+        self.not_modified = 0
+
+    def page_html(self, number: int) -> str:
+        rng = random.Random(number * 7919 + self.revision)
+        title = " ".join(rng.choices(WORDS, k=3)).title()
+        parts = [f"<html><head><title>{title}</title></head><body><nav>"]
+        parts += [f'<a href="/page/{(number + step) % self.pages}.html">Related {step}</a>' for step in (1, 2, 3)]
+        # Child pages make the link graph a tree of fan-out 4, so every page is a few clicks from the home page
+        parts += [f'<a href="/page/{child}.html">Section {child}</a>' for child in range(4 * number + 1, min(self.pages, 4 * number + 5))]
+        parts.append(f"</nav><main><h1>{title}</h1>")
+        size = 0
+        section = 0
+        while size < self.page_kb * 1024:
+            section += 1
+            heading = " ".join(rng.choices(WORDS, k=2)).title()
+            paragraph = " ".join(rng.choices(WORDS, k=80)).capitalize() + "."
+            parts.append(f"<h2>{section}. {heading}</h2><p>{paragraph}</p>")
+            size += len(paragraph) + len(heading) + 20
+        parts.append("</main><footer>Synthetic benchmark site</footer></body></html>")
+        return "".join(parts)
+
+    def sitemap_index(self, base_url: str) -> str:
+        count = (self.pages + URLS_PER_SITEMAP - 1) // URLS_PER_SITEMAP
+        entries = "".join(f"<sitemap><loc>{base_url}/sitemap-{i}.xml</loc></sitemap>" for i in range(count))
+        return f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</sitemapindex>'
+
+    def sitemap(self, base_url: str, part: int) -> str:
+        numbers = range(part * URLS_PER_SITEMAP, min(self.pages, (part + 1) * URLS_PER_SITEMAP))
+        entries = "".join(f"<url><loc>{base_url}/page/{n}.html</loc><lastmod>2024-01-{1 + self.revision % 28:02d}</lastmod></url>"
+                          for n in numbers)
+        return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>'
+
+def _handler(site: SyntheticSite):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes = b"", content_type: str = "text/html; charset=utf-8", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def do_GET(self):
+            site.requests += 1
+            base_url = f"http://{self.headers.get('Host')}"
+            path = self.path.split("?", 1)[0]
+            if path == "/robots.txt":
+                return self._send(200, b"User-agent: *\nAllow: /\n", "text/plain")
+            if path == "/":
+                return self._send(200, b'<html><body><a href="/page/0.html">Start</a></body></html>')
+            if path.startswith("/sitemap") and not site.sitemap_enabled:
+                return self._send(404, b"Not found")
+            if path == "/sitemap.xml":
+                return self._send(200, site.sitemap_index(base_url).encode(), "application/xml")
+            if path.startswith("/sitemap-") and path.endswith(".xml"):
+                return self._send(200, site.sitemap(base_url, int(path[len("/sitemap-"):-len(".xml")])).encode(), "application/xml")
+            if path.startswith("/page/") and path.endswith(".html"):
+                number = int(path[len("/page/"):-len(".html")])
+                if not 0 <= number < site.pages:
+                    return self._send(404, b"Not found")
+                if site.latency:
+                    time.sleep(site.latency)
+                body = site.page_html(number).encode()
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    site.not_modified += 1
+                    return self._send(304, headers={"ETag": etag})
+                return self._send(200, body, headers={"ETag": etag})
+            self._send(404, b"Not found")
+
+    return Handler
+
+class SiteServer:
+    """Serves a SyntheticSite on localhost from a background thread. Use as a context manager."""
+
+    def __init__(self, site: SyntheticSite, port: int = 0):
+        self.site = site
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _handler(site))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self) -> "SiteServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="bench-site", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
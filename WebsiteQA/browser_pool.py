@@ -0,0 +1,234 @@
+import asyncio
+import atexit
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, Optional
+
+def _headless_crawler() -> Any:
+    from crawl4ai import AsyncWebCrawler, BrowserConfig
+
+    browser_config = BrowserConfig(
+        headless=True,
+        verbose=False,
+        extra_args=["--disable-gpu", "--disable-dev-shm-usage", "--no-sandbox"],
+    )
+    return AsyncWebCrawler(config=browser_config)
+
+@dataclass
+class _PooledBrowser:
+    id: int
+    crawler: Any
+    uses: int = 0
+    in_flight: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    free_sessions: List[str] = field(default_factory=list)
+    sessions_created: int = 0
+    retiring: bool = False
+
+class BrowserPool:
+    """Process-wide pool of warm crawl4ai browsers shared by every scraper run and session.
+
+    Agency Swarm may run async tools on short-lived event loops in worker threads, so the
+    pool owns a dedicated event loop thread and every crawl is forwarded to it. That lets
+    Chromium stay warm between tool invocations instead of being started and closed per run.
+
+    - At most `max_browsers` browsers with `pages_per_browser` open pages each, which bounds
+      total browser memory.
+    - Pages (crawl4ai sessions) are reused across crawls; a browser is recycled after
+      `max_uses` crawls to shed leaked memory.
+    - Browsers idle for longer than `idle_ttl` seconds are closed.
+
+    `crawler_factory` returns a new, not yet started crawler; by default a headless
+    crawl4ai `AsyncWebCrawler`.
+    """
+
+    def __init__(self, max_browsers: int = 2, pages_per_browser: int = 8, max_uses: int = 500, idle_ttl: float = 300.0,
+                 crawler_factory: Optional[Callable[[], Any]] = None):
+        self.crawler_factory = crawler_factory or _headless_crawler
+        self.max_browsers = max_browsers
+        self.pages_per_browser = pages_per_browser
+        self.max_uses = max_uses
+        self.idle_ttl = idle_ttl
+        self._browsers: List[_PooledBrowser] = []
+        self._launching = 0
+        self._next_id = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._cond: Optional[asyncio.Condition] = None
+
+    # --- Public API (callable from any thread / event loop) ---
+
+    async def crawl(self, url: str, config: Any) -> Any:
+        """Crawls `url` with a crawl4ai CrawlerRunConfig on a pooled browser page."""
+        future = asyncio.run_coroutine_threadsafe(self._crawl(url, config), self._ensure_loop())
+        return await asyncio.wrap_future(future)
+
+    def warm_up(self, browsers: int = 1) -> None:
+        """Starts browsers in the background so the first scrape does not pay Chromium cold start."""
+        asyncio.run_coroutine_threadsafe(self._warm_up(min(browsers, self.max_browsers)), self._ensure_loop())
+
+    def stats(self) -> dict:
+        return {
+            "browsers": len(self._browsers),
+            "in_flight": sum(b.in_flight for b in self._browsers),
+            "uses": [b.uses for b in self._browsers],
+        }
+
+    def close(self) -> None:
+        """Closes every browser and stops the pool thread. Registered with atexit."""
+        if self._loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_all(), self._loop).result(timeout=30)
+        except Exception as e:
+            print(f"Error closing browser pool: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        if not self._thread.is_alive():
+            self._loop.close()
+        self._loop = None
+
+    # --- Pool loop internals ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="browser-pool", daemon=True)
+                self._thread.start()
+                asyncio.run_coroutine_threadsafe(self._init(), loop).result()
+                self._loop = loop
+            return self._loop
+
+    async def _init(self):
+        self._cond = asyncio.Condition()
+        self._janitor = asyncio.create_task(self._evict_idle())
+
+    async def _launch(self) -> _PooledBrowser:
+        crawler = self.crawler_factory()
+        await crawler.start()
+        self._next_id += 1
+        print(f"Browser pool: started browser {self._next_id}")
+        return _PooledBrowser(id=self._next_id, crawler=crawler)
+
+    async def _close(self, browser: _PooledBrowser):
+        try:
+            await browser.crawler.close()
+            print(f"Browser pool: closed browser {browser.id} after {browser.uses} crawls")
+        except Exception as e:
+            print(f"Browser pool: error closing browser {browser.id}: {e}")
+
+    async def _lease(self):
+        while True:
+            async with self._cond:
+                while True:
+                    available = [b for b in self._browsers if not b.retiring and b.in_flight < self.pages_per_browser]
+                    if available:
+                        browser = min(available, key=lambda b: b.in_flight)
+                        browser.in_flight += 1
+                        if browser.free_sessions:
+                            session_id = browser.free_sessions.pop()
+                        else:
+                            browser.sessions_created += 1
+                            session_id = f"pool_{browser.id}_{browser.sessions_created}"
+                        return browser, session_id
+                    if len(self._browsers) + self._launching < self.max_browsers:
+                        self._launching += 1
+                        break
+                    await self._cond.wait()
+
+            # Launch outside the lock so other crawls keep using the existing browsers meanwhile
+            launched = None
+            try:
+                launched = await self._launch()
+            finally:
+                async with self._cond:
+                    self._launching -= 1
+                    if launched:
+                        self._browsers.append(launched)
+                    self._cond.notify_all()
+
+    async def _release(self, browser: _PooledBrowser, session_id: str, healthy: bool):
+        async with self._cond:
+            browser.in_flight -= 1
+            browser.uses += 1
+            browser.last_used = time.monotonic()
+            if browser.uses >= self.max_uses:
+                browser.retiring = True
+            elif healthy:
+                browser.free_sessions.append(session_id)
+            close_now = browser.retiring and browser.in_flight == 0
+            if close_now:
+                self._browsers.remove(browser)
+            self._cond.notify_all()
+
+        if close_now:
+            await self._close(browser)
+        elif not healthy:
+            # Do not hand a page in an unknown state to the next crawl
+            strategy = getattr(browser.crawler, "crawler_strategy", None)
+            if hasattr(strategy, "kill_session"):
+                try:
+                    await strategy.kill_session(session_id)
+                except Exception:
+                    pass
+
+    async def _crawl(self, url: str, config: Any):
+        browser, session_id = await self._lease()
+        healthy = False
+        try:
+            result = await browser.crawler.arun(url, config, session_id)
+            healthy = True
+            return result
+        finally:
+            await self._release(browser, session_id, healthy)
+
+    async def _warm_up(self, browsers: int):
+        async with self._cond:
+            missing = max(0, browsers - len(self._browsers) - self._launching)
+            self._launching += missing
+        for _ in range(missing):
+            launched = None
+            try:
+                launched = await self._launch()
+            except Exception as e:
+                print(f"Browser pool: warm-up failed: {e}")
+            finally:
+                async with self._cond:
+                    self._launching -= 1
+                    if launched:
+                        self._browsers.append(launched)
+                    self._cond.notify_all()
+
+    async def _evict_idle(self):
+        while True:
+            await asyncio.sleep(max(1.0, min(self.idle_ttl / 2, 30.0)))
+            now = time.monotonic()
+            async with self._cond:
+                idle = [b for b in self._browsers if b.in_flight == 0 and now - b.last_used > self.idle_ttl]
+                for browser in idle:
+                    self._browsers.remove(browser)
+            for browser in idle:
+                await self._close(browser)
+
+    async def _close_all(self):
+        self._janitor.cancel()
+        await asyncio.gather(self._janitor, return_exceptions=True)
+        async with self._cond:
+            browsers, self._browsers = self._browsers, []
+        for browser in browsers:
+            await self._close(browser)
+
+_pool: Optional[BrowserPool] = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool(**kwargs) -> BrowserPool:
+    """Returns the process-wide browser pool, creating it with `kwargs` on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(**kwargs)
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import re
+from html import escape
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+from crawl_manifest import write_json_atomic
+
+BOILERPLATE_DIR = "boilerplate"
+
+# Never part of the readable content
+NOISE_TAGS = ("script", "style", "noscript", "template", "svg", "iframe", "canvas", "button", "select", "dialog")
+# Site chrome, dropped unless it wraps the page's title or main content
+CHROME_TAGS = ("nav", "aside", "footer", "header")
+CHROME_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search"}
+CHROME_PATTERN = re.compile(
+    r"\b(?:cookie|consent|gdpr|sidebar|side-bar|breadcrumbs?|skip-link|skip-to-content|newsletter|share|social|"
+    r"announcement|edit-this-page|pagination|toc|table-of-contents)\b", re.IGNORECASE)
+# Readability-style class/id hints
+POSITIVE_PATTERN = re.compile(r"article|body|content|entry|main|page|post|text|blog|story|markdown|prose|docs?", re.IGNORECASE)
+NEGATIVE_PATTERN = re.compile(r"comment|contact|foot|masthead|media|meta|promo|related|scroll|shoutbox|sponsor|"
+                              r"shopping|tags|tool|widget|nav|menu|banner|ad-|popup", re.IGNORECASE)
+TAG_WEIGHTS = {"div": 5, "section": 5, "pre": 3, "td": 3, "blockquote": 3, "article": 10, "main": 10,
+               "address": -3, "ol": -3, "ul": -3, "dl": -3, "dd": -3, "dt": -3, "li": -3, "form": -3,
+               "h1": -5, "h2": -5, "h3": -5, "h4": -5, "h5": -5, "h6": -5, "th": -5}
+SCORED_TAGS = ("p", "pre", "td", "blockquote")
+# Blocks learned as boilerplate when they repeat across pages. Headings and code are never removed,
+# since docs legitimately repeat "Parameters" or `pip install ...` on every page.
+TEMPLATE_TAGS = frozenset(("p", "li", "blockquote", "dd", "dt", "div"))
+BLOCK_TAGS = frozenset(("p", "li", "blockquote", "dd", "dt", "div", "section", "article", "main", "ul", "ol", "dl",
+                        "table", "pre", "h1", "h2", "h3", "h4", "h5", "h6", "figure", "details"))
+MIN_CONTENT_CHARS = 250 # A shorter pick is less likely the article than a scoring miss; the cleaned body is used then
+
+def _attrs(element) -> str:
+    return f"{element.get('class', '')} {element.get('id', '')}"
+
+def _text_length(element) -> int:
+    return len(" ".join(element.text_content().split()))
+
+def _link_density(element, length: Optional[int] = None) -> float:
+    length = _text_length(element) if length is None else length
+    if not length:
+        return 0.0
+    return sum(_text_length(link) for link in element.iter("a")) / length
+
+def _drop(element):
+    parent = element.getparent()
+    if parent is not None:
+        element.drop_tree()
+
+def _is_chrome(element, page_chars: int) -> bool:
+    tag = element.tag.lower()
+    if tag in ("html", "body", "main", "article") or element.get("role") == "main":
+        return False
+    if tag in CHROME_TAGS or element.get("role") in CHROME_ROLES:
+        chrome = True
+    elif CHROME_PATTERN.search(_attrs(element)):
+        # Class names are only hints: a wrapper like "layout has-toc" holding most of the page is not chrome
+        chrome = _text_length(element) < page_chars / 2
+    else:
+        return False
+    # An article header holding the title, or a wrapper around the content, is kept
+    return chrome and next(element.iter("main", "article", "h1"), None) is None
+
+def _remove_noise(root):
+    """Removes scripts, hidden elements and site chrome (menus, headers, footers, sidebars, cookie banners)."""
+    for element in list(root.iter(*NOISE_TAGS)):
+        _drop(element)
+    page_chars = _text_length(root)
+    stack = list(root)
+    while stack:
+        element = stack.pop()
+        if not isinstance(element.tag, str):
+            continue
+        if element.get("hidden") is not None or element.get("aria-hidden") == "true" \
+                or re.search(r"display\s*:\s*none", element.get("style", "")) or _is_chrome(element, page_chars):
+            _drop(element)
+            continue
+        stack.extend(element)
+
+def _score_candidates(root) -> Dict:
+    """Readability scoring: paragraphs credit their parent fully and grandparent by half."""
+    scores: Dict = {}
+    for paragraph in root.iter(*SCORED_TAGS):
+        text = " ".join(paragraph.text_content().split())
+        if len(text) < 25:
+            continue
+        score = 1 + text.count(",") + min(len(text) // 100, 3)
+        parent = paragraph.getparent()
+        for level, ancestor in enumerate((parent, parent.getparent())):
+            if ancestor is None:
+                break
+            if ancestor not in scores:
+                weight = TAG_WEIGHTS.get(ancestor.tag.lower(), 0)
+                attrs = _attrs(ancestor)
+                weight += 25 * bool(POSITIVE_PATTERN.search(attrs)) - 25 * bool(NEGATIVE_PATTERN.search(attrs))
+                scores[ancestor] = weight
+            scores[ancestor] += score / (1 + level)
+    return {element: score * (1 - _link_density(element)) for element, score in scores.items()}
+
+def _main_content(root):
+    """Picks <main>, a single <article>, or the best-scoring element together with its
+    qualifying siblings. Returns None when nothing stands out."""
+    body = root.find(".//body")
+    body = root if body is None else body
+    semantic = root.xpath("//main | //*[@role='main']")
+    articles = root.xpath("//article")
+    for element in (semantic[:1] or []) + (articles if len(articles) == 1 else []):
+        if _text_length(element) >= MIN_CONTENT_CHARS:
+            return element
+    scores = _score_candidates(body)
+    if not scores:
+        return None
+    top = max(scores, key=scores.get)
+    parent = top.getparent()
+    if parent is None or top is body:
+        return top
+    # Content split across sibling containers (e.g. sections of one article) is kept together
+    threshold = max(10.0, scores[top] * 0.2)
+    siblings = [sibling for sibling in parent if sibling is top or scores.get(sibling, 0) >= threshold
+                or (isinstance(sibling.tag, str) and sibling.tag.lower() == "p" and _text_length(sibling) > 80
+                    and _link_density(sibling) < 0.25)]
+    if len(siblings) == 1:
+        return top
+    from lxml import html as lxml_html
+    container = lxml_html.Element("div")
+    for sibling in siblings:
+        container.append(sibling)
+    return container
+
+def block_hash(element) -> Optional[int]:
+    """Hash of a block's tag and normalized text, or None if it is not a template candidate.
+    Short labels ("Returns", "Example") are only candidates when they are links, like "Next" or "Home"."""
+    tag = element.tag.lower() if isinstance(element.tag, str) else ""
+    if tag not in TEMPLATE_TAGS:
+        return None
+    if tag == "div" and any(isinstance(child.tag, str) and child.tag.lower() in BLOCK_TAGS for child in element):
+        return None # Only leaf divs carry their own text
+    text = " ".join(element.text_content().split()).lower()
+    if not text or (text.count(" ") < 2 and _link_density(element, len(text)) < 0.5):
+        return None
+    return int.from_bytes(hashlib.blake2b(f"{tag}:{text}".encode("utf-8"), digest_size=8).digest(), "little")
+
+def _strip_templates(content, templates: FrozenSet[int]) -> Tuple[List[int], int]:
+    """Removes blocks matching learned templates. Returns every block hash seen (for learning) and the number removed."""
+    hashes, removed = [], 0
+    stack = list(content)
+    while stack:
+        element = stack.pop()
+        if (h := block_hash(element)) is not None:
+            hashes.append(h)
+            if h in templates:
+                element.drop_tree()
+                removed += 1
+                continue
+        stack.extend(element)
+    return hashes, removed
+
+def extract_main_content(page_html: str, templates: FrozenSet[int] = frozenset()) -> Tuple[str, List[int], int]:
+    """Returns the HTML of the page's main content, the hashes of its blocks and the number of
+    template blocks removed. Falls back to the page with only noise removed when no main content
+    is found, and to the unchanged HTML when it cannot be parsed."""
+    from lxml import etree, html as lxml_html # Deferred to the first page (in each worker process)
+    try:
+        root = lxml_html.document_fromstring(page_html)
+    except (etree.ParserError, ValueError):
+        return page_html, [], 0
+    title = " ".join((root.findtext(".//title") or "").split())
+    body = root.find(".//body")
+    body = root if body is None else body
+    _remove_noise(root)
+    body_chars = _text_length(body)
+    content = _main_content(root)
+    if content is None or _text_length(content) < min(MIN_CONTENT_CHARS, body_chars // 2):
+        content = body
+    hashes, removed = _strip_templates(content, templates)
+    result = lxml_html.tostring(content, encoding="unicode")
+    # The <title> is outside the content; keep it as the heading when the content has none
+    if title and next(content.iter("h1"), None) is None:
+        result = f"<h1>{escape(title)}</h1>{result}"
+    return result, hashes, removed
+
+class BoilerplateTemplates:
+    """Learns blocks repeated across a site's pages ("Was this page helpful?", "Edit on GitHub",
+    version banners, inline menus) so they can be stripped from later pages.
+
+    `observe(hashes)` records the block hashes of one page; a block becomes a template once it
+    appeared on at least `min_pages` pages and on `min_fraction` of the pages observed so far.
+    Learned templates are saved to `path`, so later runs strip them from the first page on.
+    Counts of blocks seen once are pruned when more than `max_tracked` are held.
+    """
+
+    def __init__(self, path: str, min_pages: int = 5, min_fraction: float = 0.3, max_tracked: int = 200_000):
+        self.path = path
+        self.min_pages = min_pages
+        self.min_fraction = min_fraction
+        self.max_tracked = max_tracked
+        self.templates: Set[int] = set()
+        self._counts: Dict[int, int] = {}
+        self._pages = 0
+        self._snapshot: FrozenSet[int] = frozenset()
+        self.learned = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.templates = set(json.load(f).get("templates", []))
+            self._snapshot = frozenset(self.templates)
+
+    @classmethod
+    def for_site(cls, website_url: str, session_name: str, directory: str = BOILERPLATE_DIR, **kwargs) -> "BoilerplateTemplates":
+        host = urlsplit(website_url).netloc or website_url
+        safe_host = re.sub(r'[<>:"/\\|?*]', '_', host)
+        return cls(os.path.join(directory, f"{session_name}_{safe_host}.json"), **kwargs)
+
+    def snapshot(self) -> FrozenSet[int]:
+        """The current templates, in a form cheap to send to worker processes."""
+        return self._snapshot
+
+    def observe(self, hashes: Iterable[int]):
+        self._pages += 1
+        changed = False
+        for h in set(hashes):
+            count = self._counts.get(h, 0) + 1
+            self._counts[h] = count
+            if h not in self.templates and count >= self.min_pages and count >= self.min_fraction * self._pages:
+                self.templates.add(h)
+                self.learned += 1
+                changed = True
+        if changed:
+            self._snapshot = frozenset(self.templates)
+        if len(self._counts) > self.max_tracked:
+            # Site chrome repeats within a few pages; blocks seen once by now are page content
+            self._counts = {h: count for h, count in self._counts.items() if count > 1}
+
+    def save(self):
+        write_json_atomic(self.path, {"templates": sorted(self.templates)})
@@ -0,0 +1,158 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+from crawl_manifest import CrawlManifest
+from page_buffer import get_page_buffer
+
+JOURNAL_DIR = "crawl_journals"
+JOURNAL_MAX_AGE = 24 * 3600 # Older journals are discarded: the pages they finished may have changed since
+FSYNC_EVERY = 256 # Records between fsyncs; every record is flushed to the OS immediately
+
+class CrawlJournal:
+    """Append-only, per-site and per-session log of crawl progress, so an interrupted crawl resumes.
+
+    Each line records the latest state of one URL:
+
+    - `pending`: handed to the crawler
+    - `done`: converted and written to `path` (no `path` if unchanged since the last upload)
+    - `failed`: fetch or conversion failed; retried by the next run
+    - `uploaded`: the written file was uploaded as `file_id`
+
+    Replaying the lines gives the state of every URL. A new scraper run for the same site and
+    session skips URLs that are `done` or `uploaded`, and `restore` puts their pages back into
+    the crawl manifest so the uploader commits them. The journal is cleared once the uploader
+    has committed the crawl.
+    """
+
+    def __init__(self, path: str, max_age: float = JOURNAL_MAX_AGE):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._file = None
+        self._unsynced = 0
+        if os.path.exists(path):
+            self._load(max_age)
+
+    @classmethod
+    def for_site(cls, website_url: str, session_name: str, directory: str = JOURNAL_DIR, **kwargs) -> "CrawlJournal":
+        host = urlsplit(website_url).netloc or website_url
+        safe_host = re.sub(r'[<>:"/\\|?*]', '_', host)
+        return cls(os.path.join(directory, f"{session_name}_{safe_host}.jsonl"), **kwargs)
+
+    def _load(self, max_age: float):
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break # Torn last line of a crashed run
+                if "started_at" in record:
+                    self.started_at = record["started_at"]
+                elif "url" in record:
+                    self.entries[record["url"]] = {**self.entries.get(record["url"], {}), **record}
+        if time.time() - self.started_at > max_age:
+            print(f"Discarding crawl journal {self.path}: it is older than {max_age / 3600:.0f}h.")
+            self.clear()
+        elif self.entries:
+            counts = self.counts()
+            print(f"Resuming from crawl journal {self.path}: " + ", ".join(f"{n} {state}" for state, n in counts.items()))
+
+    def _append(self, record: dict):
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                new = not os.path.exists(self.path)
+                self._file = open(self.path, "a", encoding="utf-8")
+                if new:
+                    self._file.write(json.dumps({"started_at": self.started_at}) + "\n")
+            self.entries[record["url"]] = {**self.entries.get(record["url"], {}), **record}
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= FSYNC_EVERY:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+
+    # --- Recording ---
+
+    def pending(self, url: str, lastmod: Optional[str] = None):
+        self._append({"url": url, "state": "pending", "lastmod": lastmod})
+
+    def done(self, url: str, path: Optional[str] = None, content_hash: Optional[str] = None,
+             etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self._append({"url": url, "state": "done", "path": path, "content_hash": content_hash,
+                      "etag": etag, "last_modified": last_modified})
+
+    def failed(self, url: str, error: str):
+        self._append({"url": url, "state": "failed", "error": error[:500]})
+
+    def uploaded(self, url: str, file_id: str):
+        self._append({"url": url, "state": "uploaded", "file_id": file_id})
+
+    # --- Resuming ---
+
+    def state(self, url: str) -> Optional[str]:
+        return self.entries.get(url, {}).get("state")
+
+    def finished_urls(self) -> Set[str]:
+        """URLs the next crawl can skip: finished pages whose file (or upload) is still available."""
+        buffer = get_page_buffer()
+        return {url for url, entry in self.entries.items()
+                if entry["state"] == "uploaded"
+                or (entry["state"] == "done" and (not entry.get("path") or buffer.exists(entry["path"])))}
+
+    def restore(self, manifest: CrawlManifest) -> Tuple[List[str], Dict[str, str]]:
+        """Stages the journal's finished pages in the manifest again (a crash loses unsaved staging).
+
+        Returns the written files that still need uploading, and {path: file_id} of pages
+        already uploaded but not yet committed.
+        """
+        files, uploaded = [], {}
+        buffer = get_page_buffer() # Pages handed over in memory are only available within this process
+        for url, entry in self.entries.items():
+            path = entry.get("path")
+            if entry["state"] not in ("done", "uploaded") or not path:
+                continue
+            if entry["state"] == "done" and not buffer.exists(path):
+                continue
+            page = manifest.pages.get(url, {})
+            if entry["state"] == "uploaded" and page.get("file_id") == entry["file_id"] and "pending" not in page:
+                continue # Already committed
+            manifest.mark_seen(url, entry.get("lastmod"))
+            if "pending" not in page and not manifest.stage(url, entry["content_hash"], path,
+                                                            entry.get("etag"), entry.get("last_modified")):
+                continue
+            if entry["state"] == "uploaded":
+                uploaded[path] = entry["file_id"]
+            else:
+                files.append(path)
+        return files, uploaded
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for entry in self.entries.values():
+            counts[entry["state"]] = counts.get(entry["state"], 0) + 1
+        return counts
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+                self._unsynced = 0
+
+    def clear(self):
+        """Deletes the journal once its crawl has been committed (or is too old to resume)."""
+        self.close()
+        self.entries.clear()
+        self.started_at = time.time()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
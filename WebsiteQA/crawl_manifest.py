@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import re
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import httpx # Only `revalidate` takes a client; the uploader and teardown import this module without it
+
+MANIFEST_DIR = "crawl_manifests"
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def write_json_atomic(path: str, data) -> None:
+    """Writes JSON to a temporary file and renames it over `path`, so readers never see a partial file."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class CrawlManifest:
+    """Per-site, per-session record of what has been crawled and uploaded.
+
+    Each page entry holds the committed state of the page as it exists in the vector
+    store (sitemap `lastmod`, ETag/Last-Modified validators, Markdown content hash and
+    OpenAI `file_id`). The scraper stages new or changed pages under `pending`; the
+    uploader commits them once the new file is in the vector store, and removes pages
+    that disappeared from the sitemap. Near-duplicates of another page are recorded with
+    `duplicate_of` and their validators but no file, so later crawls skip or revalidate
+    them like uploaded pages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pages: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.pages = json.load(f).get("pages", {})
+        self._seen: Dict[str, Optional[str]] = {}
+
+    @classmethod
+    def for_site(cls, website_url: str, session_name: str, directory: str = MANIFEST_DIR) -> "CrawlManifest":
+        host = urlsplit(website_url).netloc or website_url
+        safe_host = re.sub(r'[<>:"/\\|?*]', '_', host)
+        return cls(os.path.join(directory, f"{session_name}_{safe_host}.json"))
+
+    def save(self) -> None:
+        write_json_atomic(self.path, {"pages": self.pages})
+
+    # --- Scraper side ---
+
+    def mark_seen(self, url: str, lastmod: Optional[str] = None) -> None:
+        """Records that `url` is still listed in the sitemap (or reached by following links) during this run."""
+        self._seen[url] = lastmod
+        page = self.pages.get(url, {})
+        if not page.get("duplicate_of"): # A duplicate's earlier upload stays flagged until the uploader deletes it
+            page.pop("removed", None)
+
+    def mark_gone(self, url: str) -> None:
+        """Records that `url` answered 404 or 410, so `mark_removed` flags its uploaded version
+        even if it is still listed."""
+        self._seen.pop(url, None)
+
+    def duplicate(self, url: str, canonical: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Records `url` as a near-duplicate of `canonical`. Nothing is uploaded for it, and an
+        earlier upload of the page is flagged `removed` so the uploader deletes it."""
+        page = self.pages.setdefault(url, {})
+        validators = {**page, **page.pop("pending", {})} # A page staged earlier in this run has the newest ones
+        page.pop("content_hash", None)
+        page.update(lastmod=self._seen.get(url, validators.get("lastmod")), etag=etag or validators.get("etag"),
+                    last_modified=last_modified or validators.get("last_modified"), duplicate_of=canonical)
+        if page.get("file_id"):
+            page["removed"] = True
+
+    def release_duplicates(self, canonicals: Set[str], keep: Set[str] = frozenset()) -> int:
+        """Forgets the pages recorded as duplicates of `canonicals` (changed or removed pages), except
+        those in `keep` (compared during this crawl), so the next crawl fetches and compares them
+        again. Returns how many were released."""
+        released = 0
+        for url, page in self.pages.items():
+            if page.get("duplicate_of") in canonicals and url not in keep:
+                del page["duplicate_of"]
+                self.invalidate(url)
+                released += 1
+        return released
+
+    def _committed(self, url: str) -> Optional[dict]:
+        page = self.pages.get(url)
+        return page if page and (page.get("file_id") or page.get("duplicate_of")) else None
+
+    def is_fresh(self, url: str, lastmod: Optional[str]) -> bool:
+        """True if the sitemap `lastmod` matches the committed one, so the page can be skipped."""
+        page = self._committed(url)
+        return bool(lastmod and page and page.get("lastmod") == lastmod)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        page = self._committed(url)
+        if not page:
+            return {}
+        headers = {}
+        if page.get("etag"):
+            headers["If-None-Match"] = page["etag"]
+        if page.get("last_modified"):
+            headers["If-Modified-Since"] = page["last_modified"]
+        return headers
+
+    def not_modified(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Commits fresh validators for a page whose content is unchanged."""
+        page = self.pages[url]
+        page["lastmod"] = self._seen.get(url)
+        if etag:
+            page["etag"] = etag
+        if last_modified:
+            page["last_modified"] = last_modified
+
+    def stage(self, url: str, markdown_hash: str, path: str,
+              etag: Optional[str] = None, last_modified: Optional[str] = None) -> bool:
+        """Stages a crawled page for upload.
+
+        Returns False (and stages nothing) when the Markdown is identical to the committed
+        version, in which case the page does not need to be uploaded again.
+        """
+        page = self.pages.get(url)
+        if page and page.get("file_id") and page.get("content_hash") == markdown_hash:
+            self.not_modified(url, etag, last_modified)
+            return False
+        page = self.pages.setdefault(url, {})
+        if page.pop("duplicate_of", None):
+            page.pop("removed", None) # Its earlier upload is replaced by the new file instead
+        page["pending"] = {
+            "lastmod": self._seen.get(url),
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": markdown_hash,
+            "path": path,
+        }
+        return True
+
+    def mark_removed(self) -> int:
+        """Flags committed pages that were not listed in the sitemap during this run."""
+        if not self._seen:
+            # An empty or failed sitemap fetch must not wipe the whole store
+            return 0
+        removed = 0
+        for url, page in self.pages.items():
+            if url not in self._seen:
+                page["removed"] = True
+                page.pop("duplicate_of", None)
+                removed += 1
+        return removed
+
+    # --- Uploader side ---
+
+    def pending_by_path(self) -> Dict[str, str]:
+        """Maps the local file path of every staged page to its URL."""
+        return {page["pending"]["path"]: url for url, page in self.pages.items() if "pending" in page}
+
+    def commit(self, url: str, file_id: str, bundled: bool = False) -> Optional[str]:
+        """Promotes the staged version of `url` and returns the file id it replaces, if any.
+        `bundled` marks pages uploaded in a bundle shared with other pages."""
+        page = self.pages[url]
+        pending = page.pop("pending")
+        pending.pop("path", None)
+        old_file_id = page.get("file_id")
+        page.update(pending, file_id=file_id)
+        if bundled:
+            page["bundled"] = True
+        else:
+            page.pop("bundled", None)
+        return old_file_id if old_file_id != file_id else None
+
+    def stale_bundle_members(self) -> List[str]:
+        """Unchanged pages sharing a bundle with a page that is staged or removed.
+        Their bundle is rebuilt, so they have to be uploaded again."""
+        affected = {page["file_id"] for page in self.pages.values()
+                    if page.get("bundled") and page.get("file_id") and ("pending" in page or page.get("removed"))}
+        return [url for url, page in self.pages.items()
+                if page.get("bundled") and page.get("file_id") in affected and "pending" not in page and not page.get("removed")]
+
+    def restage(self, url: str, path: str) -> None:
+        """Stages the committed version of `url` again from a local copy at `path`."""
+        page = self.pages[url]
+        page["pending"] = {key: page.get(key) for key in ("lastmod", "etag", "last_modified", "content_hash")}
+        page["pending"]["path"] = path
+
+    def invalidate(self, url: str) -> None:
+        """Forgets the validators of `url`, so the next crawl fetches and uploads it again."""
+        for key in ("lastmod", "etag", "last_modified", "content_hash"):
+            self.pages[url].pop(key, None)
+
+    def removed(self) -> List[str]:
+        return [url for url, page in self.pages.items() if page.get("removed")]
+
+    def forget(self, url: str) -> Optional[str]:
+        """Drops a removed page and returns its file id so it can be deleted from the vector store.
+        A near-duplicate only loses its uploaded file; its entry is kept."""
+        page = self.pages.get(url, {})
+        if page.get("duplicate_of"):
+            page.pop("removed", None)
+            page.pop("bundled", None)
+            return page.pop("file_id", None)
+        return self.pages.pop(url, {}).get("file_id")
+
+async def revalidate(client: "httpx.AsyncClient", url: str, headers: Dict[str, str]) -> Optional[Dict[str, Optional[str]]]:
+    """Sends a conditional GET for `url`.
+
+    Returns None when the server answers 304 Not Modified. Otherwise returns the
+    response's new validators; the body is not downloaded, since the page is crawled
+    separately.
+    """
+    async with client.stream("GET", url, headers=headers) as response:
+        if response.status_code == 304:
+            return None
+        return {"etag": response.headers.get("etag"), "last_modified": response.headers.get("last-modified")}
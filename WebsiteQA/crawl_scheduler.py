@@ -0,0 +1,273 @@
+import asyncio
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional, Tuple, Union
+from urllib.parse import urlsplit
+import httpx
+from http_fetch import create_http_client
+
+# Status codes that mean "slow down" rather than "this page is broken"
+BACKOFF_STATUSES = {429, 500, 502, 503, 504}
+
+class HostLimiter:
+    """AIMD concurrency window for a single host.
+
+    The window grows by roughly one slot per round trip while responses are healthy and
+    is halved on 429/5xx responses, errors or sustained latency growth (the short-term
+    average exceeding `latency_tolerance` times the long-term baseline). Decreases are applied at most once per round trip
+    so a burst of failures from the same window only counts once. A robots.txt Crawl-delay
+    spaces out request starts.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, crawl_delay: float = 0.0,
+                 decrease_factor: float = 0.5, latency_tolerance: float = 3.0):
+        self.max_limit = max(min_limit, max_limit)
+        self.min_limit = min_limit
+        self.limit = float(self.max_limit)
+        self.crawl_delay = crawl_delay
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.baseline_latency: Optional[float] = None
+        self.avg_latency: Optional[float] = None
+        self.requests = 0
+        self.backoffs = 0
+        self._next_start = 0.0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+            # Reserve a start slot under the lock so concurrent acquirers queue behind each other
+            now = time.monotonic()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + self.crawl_delay
+        if start_at > now:
+            await asyncio.sleep(start_at - now)
+
+    async def release(self, latency: float, status: Optional[int], failed: bool = False):
+        self.requests += 1
+        self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+        backoff = failed or status in BACKOFF_STATUSES
+        if not backoff:
+            self.baseline_latency = latency if self.baseline_latency is None else 0.98 * self.baseline_latency + 0.02 * latency
+
+        slow = self.baseline_latency is not None and self.avg_latency > self.latency_tolerance * self.baseline_latency
+        if backoff or slow:
+            now = time.monotonic()
+            if now - self._last_decrease >= (self.avg_latency or 0.0):
+                self._last_decrease = now
+                self.backoffs += 1
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+class RobotsRules:
+    """Parsed robots.txt of one origin. Without a robots.txt everything is allowed."""
+
+    def __init__(self, text: Optional[str] = None, user_agent: str = "*"):
+        self.user_agent = user_agent
+        self._parser = None
+        if text is not None:
+            from urllib.robotparser import RobotFileParser # Pulls in urllib.request; only needed once per crawl
+            self._parser = RobotFileParser()
+            self._parser.parse(text.splitlines())
+
+    def allows(self, url: str) -> bool:
+        return self._parser is None or self._parser.can_fetch(self.user_agent, url)
+
+    @property
+    def crawl_delay(self) -> float:
+        """Seconds between request starts, from Crawl-delay or Request-rate (0 if neither is set)."""
+        if self._parser is None:
+            return 0.0
+        if delay := self._parser.crawl_delay(self.user_agent):
+            return float(delay)
+        if rate := self._parser.request_rate(self.user_agent):
+            return rate.seconds / rate.requests
+        return 0.0
+
+class RobotsCache:
+    """robots.txt rules per origin, fetched once per crawl. Shared by the link frontier
+    (allow rules) and the scheduler (Crawl-delay), so each origin's file is read once."""
+
+    def __init__(self, user_agent: str = "*"):
+        self.user_agent = user_agent
+        self.origins: Dict[str, RobotsRules] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def rules(self, origin: str) -> RobotsRules:
+        if origin not in self.origins:
+            async with self._locks.setdefault(origin, asyncio.Lock()):
+                if origin not in self.origins:
+                    self.origins[origin] = await self._fetch(origin)
+        return self.origins[origin]
+
+    async def _fetch(self, origin: str) -> RobotsRules:
+        try:
+            async with create_http_client(1) as client:
+                response = await client.get(f"{origin}/robots.txt")
+        except httpx.HTTPError as e:
+            print(f"Could not read robots.txt for {origin}: {e}")
+            return RobotsRules(user_agent=self.user_agent)
+        if response.status_code != 200:
+            return RobotsRules(user_agent=self.user_agent)
+        return RobotsRules(response.text, self.user_agent)
+
+class CrawlScheduler:
+    """Sliding-window crawl scheduler.
+
+    Keeps up to `max_concurrent` fetches in flight at all times: as soon as one page
+    finishes the next URL starts, instead of waiting for a whole batch. Each host gets its
+    own `HostLimiter` that adapts the window to observed latency and error rates and
+    honours the robots.txt Crawl-delay. URLs wait in a queue per host, so a throttled
+    host holds back only its own pages; free slots go to hosts with room in their window.
+
+    `fetch(url, slot)` performs the request; `slot` is the index of the concurrency slot
+    it holds, and no two fetches hold the same slot at once (useful for reusing one browser
+    session per slot). `status_of(result)` extracts the HTTP status from a fetch result, or
+    returns None if unknown. Pass the crawl's `RobotsCache` as `robots` to reuse robots.txt
+    files already read for the link frontier.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str, int], Awaitable[Any]],
+        max_concurrent: int,
+        status_of: Callable[[Any], Optional[int]] = lambda result: getattr(result, "status_code", None),
+        min_per_host: int = 1,
+        user_agent: str = "*",
+        respect_crawl_delay: bool = True,
+        robots: Optional[RobotsCache] = None,
+    ):
+        self.fetch = fetch
+        self.max_concurrent = max(1, max_concurrent)
+        self.status_of = status_of
+        self.min_per_host = min_per_host
+        self.respect_crawl_delay = respect_crawl_delay
+        self.robots = robots or RobotsCache(user_agent)
+        # URLs read ahead of the fetches; enough that other hosts' pages queue up behind a throttled one
+        self.max_queued = self.max_concurrent * 8
+        self.hosts: Dict[str, HostLimiter] = {}
+        self._host_locks: Dict[str, asyncio.Lock] = {}
+
+    async def _limiter_for(self, url: str) -> HostLimiter:
+        origin = _origin(url)
+        if origin in self.hosts:
+            return self.hosts[origin]
+        async with self._host_locks.setdefault(origin, asyncio.Lock()):
+            if origin not in self.hosts:
+                crawl_delay = (await self.robots.rules(origin)).crawl_delay if self.respect_crawl_delay else 0.0
+                if crawl_delay:
+                    print(f"Honouring robots.txt Crawl-delay of {crawl_delay:.2f}s for {origin}")
+                self.hosts[origin] = HostLimiter(self.max_concurrent, self.min_per_host, crawl_delay)
+        return self.hosts[origin]
+
+    async def run(self, urls: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[Tuple[str, Any]]:
+        """Crawls every URL from `urls`, yielding (url, result) pairs in completion order.
+
+        Failed fetches yield the raised exception as the result.
+        """
+        queued = asyncio.Semaphore(self.max_queued)
+        host_queues: Dict[str, asyncio.Queue] = {}
+        free_slots: asyncio.Queue = asyncio.Queue()
+        for slot in range(self.max_concurrent):
+            free_slots.put_nowait(slot)
+        # Bounded so a slow consumer holds back the fetches instead of buffering pages
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.max_concurrent)
+        done = object()
+        tasks = set()
+        fed = 0
+
+        def start(coro):
+            task = asyncio.create_task(coro)
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        async def fetch_one(url: str, slot: int, limiter: HostLimiter):
+            start = time.monotonic()
+            status, failed = None, False
+            try:
+                result = await self.fetch(url, slot)
+                status = self.status_of(result)
+            except Exception as e:
+                result, failed = e, True
+            finally:
+                await limiter.release(time.monotonic() - start, status, failed)
+            await results.put((url, result))
+            free_slots.put_nowait(slot)
+
+        async def dispatcher(url: str, queue: asyncio.Queue):
+            limiter = await self._limiter_for(url)
+            while True:
+                url = await queue.get()
+                # Room in the host's window first, so waiting for a slow host never holds a slot
+                await limiter.acquire()
+                slot = await free_slots.get()
+                queued.release()
+                start(fetch_one(url, slot, limiter))
+
+        async def feed(url: str):
+            nonlocal fed
+            await queued.acquire()
+            origin = _origin(url)
+            if origin not in host_queues:
+                host_queues[origin] = asyncio.Queue()
+                start(dispatcher(url, host_queues[origin]))
+            host_queues[origin].put_nowait(url)
+            fed += 1
+
+        async def feeder():
+            try:
+                if isinstance(urls, AsyncIterable):
+                    async for url in urls:
+                        await feed(url)
+                else:
+                    for url in urls:
+                        await feed(url)
+            except asyncio.CancelledError:
+                raise # The consumer is gone; nobody is left to read the sentinel
+            except Exception:
+                await results.put(done) # Results of URLs already fed are still delivered first
+                raise
+            await results.put(done)
+
+        feeder_task = asyncio.create_task(feeder())
+        try:
+            received, total = 0, None
+            while total is None or received < total:
+                item = await results.get()
+                if item is done:
+                    total = fed
+                    continue
+                received += 1
+                yield item
+            # Surface errors raised by the URL source itself
+            await feeder_task
+        finally:
+            running = [feeder_task, *tasks]
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-host window, latency and backoff figures for progress reporting."""
+        return {
+            origin: {
+                "limit": round(limiter.limit, 2),
+                "avg_latency": round(limiter.avg_latency or 0.0, 3),
+                "requests": limiter.requests,
+                "backoffs": limiter.backoffs,
+                "crawl_delay": limiter.crawl_delay,
+            }
+            for origin, limiter in self.hosts.items()
+        }
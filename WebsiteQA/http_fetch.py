@@ -0,0 +1,66 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+import httpx
+
+# Containers that client-side frameworks mount into; an empty one means the page is rendered by JS
+SPA_SHELL_PATTERN = re.compile(
+    r'<div[^>]+id=["\'](?:root|app|__next|__nuxt|svelte|gatsby-focus-wrapper)["\'][^>]*>\s*</div>'
+    r'|<app-root[^>]*>\s*</app-root>'
+    r'|\bng-app\b',
+    re.IGNORECASE,
+)
+NOSCRIPT_PATTERN = re.compile(
+    r'<noscript[^>]*>[^<]*(?:enable|requires?|need)[^<]*javascript',
+    re.IGNORECASE,
+)
+STRIP_PATTERN = re.compile(r'<(script|style|noscript|template)[^>]*>.*?</\1>|<[^>]+>', re.IGNORECASE | re.DOTALL)
+
+# Below this much visible text a page is treated as a shell waiting for JavaScript
+MIN_VISIBLE_TEXT = 200
+
+@dataclass
+class StaticPage:
+    """Result of a plain HTTP fetch, shaped like crawl4ai's CrawlResult for the fields the scraper uses."""
+    url: str
+    status_code: int
+    html: str = ""
+    response_headers: Dict[str, str] = field(default_factory=dict)
+    success: bool = True
+    error_message: Optional[str] = None
+
+def create_http_client(max_connections: int = 20) -> httpx.AsyncClient:
+    """Pooled keep-alive client with HTTP/2, shared by all fetches of one crawl."""
+    return httpx.AsyncClient(
+        http2=True,
+        follow_redirects=True,
+        timeout=httpx.Timeout(30.0),
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        headers={"User-Agent": "Mozilla/5.0 (compatible; WebsiteQA/1.0)"},
+    )
+
+async def fetch_static(client: httpx.AsyncClient, url: str, headers: Optional[Dict[str, str]] = None) -> StaticPage:
+    """GETs a page without a browser. Conditional `headers` may produce a 304 result.
+    The page's `url` is the one redirects led to."""
+    response = await client.get(url, headers=headers)
+    page = StaticPage(url=str(response.url), status_code=response.status_code, response_headers=dict(response.headers))
+    if response.status_code == 304:
+        return page
+    if response.status_code >= 400:
+        page.success = False
+        page.error_message = f"HTTP {response.status_code}"
+        return page
+    content_type = response.headers.get("content-type", "")
+    if "html" not in content_type and "xml" not in content_type:
+        page.success = False
+        page.error_message = f"Unsupported content type {content_type or 'unknown'}"
+        return page
+    page.html = response.text
+    return page
+
+def needs_js_rendering(html: str) -> bool:
+    """Heuristically detects pages whose content only appears after JavaScript runs."""
+    if SPA_SHELL_PATTERN.search(html) or NOSCRIPT_PATTERN.search(html):
+        return True
+    visible_text = " ".join(STRIP_PATTERN.sub(" ", html).split())
+    return len(visible_text) < MIN_VISIBLE_TEXT
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from typing import Any, AsyncIterable, Awaitable, Callable, List, NamedTuple, Optional
+
+class Stage(NamedTuple):
+    """One step of an `IngestPipeline`.
+
+    `handler(item)` returns the item for the next stage, or None to drop it (e.g. an
+    unchanged page that needs no upload). `workers` handlers run concurrently.
+    """
+    name: str
+    handler: Callable[[Any], Awaitable[Optional[Any]]]
+    workers: int = 1
+
+class IngestPipeline:
+    """Runs items from an async source through a chain of stages connected by bounded queues.
+
+    Every stage starts working as soon as the first item reaches it, so crawling,
+    conversion and uploading overlap. Because each queue holds at most `queue_size`
+    items, a slow stage blocks the one before it, and ultimately the source, which caps
+    peak memory at roughly `queue_size` items per stage whatever the input size.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 16):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.processed = {stage.name: 0 for stage in stages}
+        self.failed = {stage.name: 0 for stage in stages}
+        self.busy_time = {stage.name: 0.0 for stage in stages}
+
+    async def run(self, source: AsyncIterable[Any]) -> List[Any]:
+        """Feeds every item of `source` through the stages and returns the outputs of the last stage."""
+        done = object()
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        outputs = []
+
+        async def feed():
+            try:
+                async for item in source:
+                    await queues[0].put(item)
+            finally:
+                for _ in range(self.stages[0].workers):
+                    await queues[0].put(done)
+
+        async def work(index: int, stage: Stage, finished: list):
+            inbox = queues[index]
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            while (item := await inbox.get()) is not done:
+                start = time.monotonic()
+                try:
+                    result = await stage.handler(item)
+                except Exception as e:
+                    self.failed[stage.name] += 1
+                    print(f"⚠️ {stage.name} failed: {e}")
+                    continue
+                finally:
+                    self.busy_time[stage.name] += time.monotonic() - start
+                self.processed[stage.name] += 1
+                if result is None:
+                    continue
+                if outbox is not None:
+                    await outbox.put(result)
+                else:
+                    outputs.append(result)
+            # The last worker of a stage to finish closes the next stage
+            finished[0] += 1
+            if finished[0] == stage.workers and outbox is not None:
+                for _ in range(self.stages[index + 1].workers):
+                    await outbox.put(done)
+
+        tasks = [asyncio.create_task(feed())]
+        for index, stage in enumerate(self.stages):
+            finished = [0]
+            tasks += [asyncio.create_task(work(index, stage, finished)) for _ in range(stage.workers)]
+
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return outputs
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{name}: {self.processed[name]} ok / {self.failed[name]} failed ({self.busy_time[name]:.1f}s busy)"
+            for name in self.processed
+        )
@@ -0,0 +1,346 @@
+import asyncio
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+from thread_functions import delete_file
+from thread_store import get_thread_store
+from crawl_manifest import CrawlManifest
+from crawl_journal import CrawlJournal
+from rate_limiter import get_rate_limiter
+from upload_cache import get_upload_cache, sha256_bytes
+from batch_attacher import BatchAttacher
+from page_bundles import BUNDLE_SEPARATOR, PageStore, plan_bundles
+from page_buffer import get_page_buffer
+from answer_cache import get_answer_cache
+from telemetry import get_telemetry
+from openai_client import get_client
+
+def restage_bundle_members(manifest: CrawlManifest) -> List[str]:
+    """Stages the unchanged pages of bundles that hold a changed or removed page again, from
+    their copies in the page store, and returns their paths. Pages without a copy are
+    invalidated so the next crawl uploads them again."""
+    store = PageStore.for_manifest(manifest.path)
+    restaged, missing = [], 0
+    for url in manifest.stale_bundle_members():
+        if os.path.exists(path := store.path_for(url)):
+            manifest.restage(url, path)
+            restaged.append(path)
+        else:
+            manifest.invalidate(url)
+            missing += 1
+    if restaged:
+        print(f"Rebuilding bundles: {len(restaged)} unchanged pages are uploaded again with the changed ones.")
+    if missing:
+        print(f"⚠️ Warning: {missing} bundled page(s) have no local copy; they will be uploaded again after the next crawl.")
+    return restaged
+
+def _urls_by_path(journal: Optional[CrawlJournal], urls_by_path: Optional[Dict[str, str]]) -> Dict[str, str]:
+    if journal and urls_by_path is None:
+        return {path: entry["url"] for entry in journal.entries.values() if (path := entry.get("path"))}
+    return urls_by_path or {}
+
+class IngestSession:
+    """Uploads pages to a session's vector store and commits them to the crawl manifest.
+
+    Used by UploadToOpenAITool and by the scraper's pipeline mode. `shared_state` is the
+    calling tool's shared state, which supplies the session name and the chunking strategy
+    the scraper sectioned pages for. `open()` resolves the vector store of the session's
+    main thread, creating one if needed. Uploaded files are queued for attachment as they
+    complete, so indexing overlaps the remaining uploads; `attach()` waits for the batches
+    and `sync_manifest()` records the uploads and deletes the files they replace.
+    """
+
+    def __init__(self, shared_state, max_concurrent_uploads: int = 16, bundle_max_kb: int = 512,
+                 bundle_max_pages: int = 200, bundle_group_depth: int = 1):
+        self.shared_state = shared_state
+        self.max_concurrent_uploads = max_concurrent_uploads
+        self.bundle_max_kb = bundle_max_kb
+        self.bundle_max_pages = bundle_max_pages
+        self.bundle_group_depth = bundle_group_depth
+        self.thread_id: Optional[str] = None
+        self.vs_id: Optional[str] = None
+        self.attacher: Optional[BatchAttacher] = None
+        self.uploaded: Dict[str, str] = {} # Local path -> file ID of every page uploaded (or recovered) so far
+        self.bundled: Set[str] = set() # Paths of the pages uploaded in bundles
+
+    @property
+    def session_name(self) -> str:
+        return self.shared_state.get("session_name") or "default"
+
+    @property
+    def file_ids(self) -> List[str]:
+        return list(dict.fromkeys(self.uploaded.values())) # Identical pages share one file ID
+
+    async def open(self) -> str:
+        """Resolves the session's main thread and returns its vector store ID, creating one if needed."""
+        if not (session_name := self.shared_state.get("session_name")):
+            raise RuntimeError("session ID (session_name) not found in shared state.")
+        if not (thread_id := get_thread_store().main_thread(session_name)):
+            raise RuntimeError(f"No main thread found for session '{session_name}' in the thread store.")
+        self.thread_id = thread_id
+        self.vs_id = await self._manage_vector_store(thread_id, session_name)
+        self.attacher = BatchAttacher(self.vs_id, chunking_strategy=self.shared_state.get("chunking_strategy"))
+        return self.vs_id
+
+    def recover(self, uploaded: Dict[str, str]):
+        """Adds uploads an interrupted run finished (local path -> file ID) without uploading them again."""
+        self.uploaded.update(uploaded)
+        self.attacher.add_many(list(uploaded.values()))
+
+    async def cancel(self):
+        """Stops attachment batches still in flight, e.g. when the uploads failed."""
+        if self.attacher is not None:
+            await self.attacher.cancel()
+
+    async def _manage_vector_store(self, thread_id: str, session_name: str) -> str:
+        """Handle vector store lifecycle for a thread."""
+        try:
+            # Retrieve thread details
+            thread = await get_client().beta.threads.retrieve(thread_id)
+
+            # ✅ Reuse existing vector store if available
+            if existing := self._get_existing_vector_store(thread):
+                print(f"Found existing vector store {existing} for thread {thread_id}")
+                return existing
+
+            # ✅ Otherwise, create a new vector store
+            print(f"Creating new vector store for thread {thread_id}")
+            return await self._create_vector_store(thread_id, session_name)
+
+        except Exception as e:
+            raise RuntimeError(f"Vector store management failed for thread {thread_id}: {str(e)}")
+
+    def _get_existing_vector_store(self, thread) -> str | None:
+        """Extract existing vector store ID from thread object."""
+        try:
+            return (
+                thread.tool_resources.file_search.vector_store_ids[0]
+                if (thread.tool_resources and thread.tool_resources.file_search and thread.tool_resources.file_search.vector_store_ids)
+                else None
+            )
+        except Exception as e:
+            print(f"Error accessing tool_resources for vector store ID: {e}")
+            return None
+
+    async def _create_vector_store(self, thread_id: str, session_name: str) -> str:
+        """Create and attach a new vector store to the thread."""
+        vs = await get_client().vector_stores.create(
+            name=f"vs_{session_name}",
+            # expires_after={'anchor': 'last_active_at', 'days': 7} # Example expiration
+        )
+        print(f"Created vector store {vs.id} for session {session_name}")
+
+        await get_client().beta.threads.update(
+            thread_id=thread_id,
+            tool_resources={"file_search": {"vector_store_ids": [vs.id]}}
+        )
+        print(f"Attached vector store {vs.id} to thread {thread_id}")
+        return vs.id
+
+    async def upload_file(self, path: str, journal: Optional[CrawlJournal] = None, url: Optional[str] = None) -> str:
+        """Uploads one page and queues it for attachment. With a crawl journal and the page's URL,
+        the upload is recorded so a rerun does not repeat it. Returns the file ID."""
+        file_id = await self._upload_file(path)
+        self.uploaded[path] = file_id
+        if journal and url:
+            journal.uploaded(url, file_id)
+        self.attacher.add(file_id)
+        return file_id
+
+    async def upload_files(self, paths: List[str], journal: Optional[CrawlJournal] = None,
+                           urls_by_path: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Orchestrate concurrent file uploads. Returns a mapping of local path to uploaded file ID.
+        Each upload is recorded in the crawl journal, if any, and queued for attachment as it completes."""
+        print(f"Starting upload for {len(paths)} files (up to {self.max_concurrent_uploads} at a time)...")
+        limiter = get_rate_limiter()
+        limiter.configure(max_concurrent=self.max_concurrent_uploads)
+        limiter.reset_stats()
+        # Bounds how many files are read into memory ahead of their upload slot
+        read_ahead = asyncio.Semaphore(self.max_concurrent_uploads * 2)
+        urls_by_path = _urls_by_path(journal, urls_by_path)
+
+        async def bounded_upload(path: str) -> str:
+            async with read_ahead:
+                return await self.upload_file(path, journal, urls_by_path.get(path))
+
+        results = await asyncio.gather(
+            *[bounded_upload(p) for p in paths],
+            return_exceptions=True
+        )
+        cache = get_upload_cache()
+        cache.save()
+
+        # ✅ Filter out failures and log them
+        successful = {}
+        failed_count = 0
+        for result, path in zip(results, paths):
+            if isinstance(result, Exception):
+                print(f"⚠️ Failed to upload {Path(path).name}: {str(result)}")
+                failed_count += 1
+            elif result: # Ensure result is not None
+                successful[path] = result
+
+        print(f"Upload throughput: {limiter.summary()}; {cache.summary()}")
+        if not successful:
+            raise RuntimeError("❌ All file uploads failed.")
+        if failed_count > 0:
+             print(f"⚠️ Warning: {failed_count} file(s) failed to upload.")
+        return successful
+
+    async def upload_bundles(self, paths: List[str], journal: Optional[CrawlJournal] = None,
+                             urls_by_path: Optional[Dict[str, str]] = None,
+                             store: Optional[PageStore] = None) -> Dict[str, str]:
+        """Packs pages into size-capped bundles of related pages and uploads them concurrently.
+        Returns a mapping of each packed page's local path to its bundle's file ID.
+        Uploaded pages are moved into the page store (or deleted without one)."""
+        urls_by_path = _urls_by_path(journal, urls_by_path)
+        buffer = get_page_buffer()
+        pages = [(urls_by_path.get(path), path, buffer.size(path)) for path in paths if buffer.exists(path)]
+        bundles = plan_bundles(pages, self.bundle_max_kb * 1024, self.bundle_max_pages, self.bundle_group_depth)
+        print(f"Packing {len(pages)} pages into {len(bundles)} bundles (up to {self.bundle_max_kb} KB each), "
+              f"uploading up to {self.max_concurrent_uploads} at a time...")
+        limiter = get_rate_limiter()
+        limiter.configure(max_concurrent=self.max_concurrent_uploads)
+        limiter.reset_stats()
+        # Bounds how many bundles are held in memory ahead of their upload slot
+        read_ahead = asyncio.Semaphore(self.max_concurrent_uploads * 2)
+
+        async def upload_bundle(bundle) -> str:
+            async with read_ahead:
+                contents = [await buffer.read(path) for _, path in bundle.members]
+                file_id = await self._upload_content(bundle.name, BUNDLE_SEPARATOR.join(contents))
+            for url, path in bundle.members:
+                if store and url:
+                    store.put(url, path)
+                else:
+                    await buffer.remove(path)
+                if journal and url:
+                    journal.uploaded(url, file_id)
+            self.attacher.add(file_id)
+            return file_id
+
+        results = await asyncio.gather(*[upload_bundle(bundle) for bundle in bundles], return_exceptions=True)
+        cache = get_upload_cache()
+        cache.save()
+
+        successful = {}
+        failed_pages = 0
+        for result, bundle in zip(results, bundles):
+            if isinstance(result, Exception):
+                print(f"⚠️ Failed to upload {bundle.name} ({len(bundle.members)} pages): {str(result)}")
+                failed_pages += len(bundle.members)
+            else:
+                successful.update((path, result) for _, path in bundle.members)
+
+        print(f"Upload throughput: {limiter.summary()}; {cache.summary()}")
+        if not successful:
+            raise RuntimeError("❌ All bundle uploads failed.")
+        if failed_pages:
+            print(f"⚠️ Warning: {failed_pages} page(s) in failed bundles were not uploaded.")
+        self.uploaded.update(successful)
+        self.bundled.update(successful)
+        return successful
+
+    async def _upload_file(self, path: str) -> str:
+        """Single file upload handler with rate-limited retries and filename preservation.
+        The page is read from the page buffer when the scraper handed it over in memory.
+        Deletes the local file (or frees the buffered page) once it is uploaded. Returns the file ID."""
+        filename = Path(path).name # Extract filename with extension
+        buffer = get_page_buffer()
+
+        if not buffer.exists(path):
+             raise FileNotFoundError(f"File not found at path: {path}")
+
+        file_content = await buffer.read(path) # The buffered bytes themselves, sent as is
+
+        file_id = await self._upload_content(filename, file_content)
+
+        # After successful upload, delete the file from local storage
+        try:
+            await buffer.remove(path)
+        except Exception as delete_error:
+             print(f"⚠️ Warning: Failed to delete local file {filename}: {delete_error}")
+
+        return file_id
+
+    async def _upload_content(self, filename: str, file_content: bytes) -> str:
+        """Uploads `file_content` as `filename` through the shared rate limiter.
+        Reuses the file ID of an identical, previously uploaded file when the upload cache has one."""
+        cache = get_upload_cache()
+        digest = sha256_bytes(file_content)
+        try:
+            file_id = await cache.lookup(get_client(), digest, self.session_name)
+        except Exception as e:
+            print(f"⚠️ Warning: Could not verify cached upload for {filename}, uploading it again: {e}")
+            file_id = None
+
+        # Per-file progress goes to telemetry (uploads_total, upload_seconds) rather than the console
+        telemetry = get_telemetry()
+        if file_id:
+            telemetry.count("uploads_total", result="reused")
+        else:
+            try:
+                # Retries are handled by the limiter, with jitter, instead of the client's own retry loop
+                with telemetry.span("upload"):
+                    file = await get_rate_limiter().call(
+                        lambda: get_client().with_options(max_retries=0).files.with_raw_response.create(
+                            file=(filename, file_content), # Include filename in upload
+                            purpose="assistants"
+                        ),
+                        f"Upload of {filename}",
+                    )
+            except Exception as e:
+                telemetry.count("uploads_total", result="failed")
+                raise RuntimeError(f"❌ File upload failed for {filename}: {str(e)}")
+            file_id = file.id
+            cache.store(digest, file_id, self.session_name)
+            telemetry.count("uploads_total", result="uploaded")
+            telemetry.count("upload_bytes_total", len(file_content))
+        return file_id
+
+    async def attach(self):
+        """Waits until every uploaded file is attached to the vector store and indexed."""
+        file_ids = self.file_ids
+        self.attacher.add_many(file_ids)
+        if not self.attacher.submitted and not file_ids:
+             print("No file IDs to attach.")
+             return
+
+        print(f"Attaching {len(file_ids)} files to vector store {self.vs_id} ({self.attacher.completed} already attached)...")
+        try:
+            attached = await self.attacher.close()
+        except Exception as e:
+            raise RuntimeError(f"Attachment to vector store {self.vs_id} failed: {str(e)}")
+        finally:
+            # The store's content changed, so answers cached for this session are outdated
+            get_answer_cache().bump_version(self.session_name)
+        print(f"Successfully attached {attached} files to vector store {self.vs_id}.")
+
+    async def sync_manifest(self, manifest: CrawlManifest) -> int:
+        """Commits uploaded pages to the crawl manifest and deletes the files they replace,
+        plus the files of pages that disappeared from the site. Returns the number of stale files."""
+        stale_ids = []
+        pending = manifest.pending_by_path()
+        for path, file_id in self.uploaded.items():
+            if not (url := pending.get(path)):
+                # No longer staged (a near-duplicate of a page converted after it): nothing would ever delete it
+                stale_ids.append(file_id)
+            elif old_file_id := manifest.commit(url, file_id, path in self.bundled):
+                stale_ids.append(old_file_id)
+        for url in manifest.removed():
+            if old_file_id := manifest.forget(url):
+                stale_ids.append(old_file_id)
+        # Save before deleting so a crash never leaves the manifest pointing at deleted files
+        manifest.save()
+        PageStore.for_manifest(manifest.path).prune(url for url, page in manifest.pages.items() if page.get("bundled"))
+
+        # Identical pages share a file ID, so only drop files no remaining page uses
+        in_use = {page.get("file_id") for page in manifest.pages.values()}
+        stale_ids = [file_id for file_id in dict.fromkeys(stale_ids) if file_id not in in_use]
+        if stale_ids:
+            print(f"Removing {len(stale_ids)} outdated files from vector store {self.vs_id}...")
+            await asyncio.gather(*[delete_file(get_client(), file_id, self.vs_id, self.session_name) for file_id in stale_ids],
+                                 return_exceptions=True)
+            get_upload_cache().save()
+            get_answer_cache().bump_version(self.session_name) # Cached answers may cite removed content
+        return len(stale_ids)
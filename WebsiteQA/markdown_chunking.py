@@ -0,0 +1,171 @@
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+HEADING_LINE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+FENCE_LINE = re.compile(r"^\s*(```|~~~)")
+
+# Token counts are estimated: English averages about four characters per token, other scripts about one
+CHARS_PER_TOKEN = 4
+MIN_CHUNK_TOKENS, MAX_CHUNK_TOKENS = 100, 4096 # Bounds of the vector store's static chunking strategy
+
+class Section(NamedTuple):
+    path: Tuple[str, ...] # Headings above and including the section's own, page title excluded
+    text: str
+
+def estimate_tokens(text: str) -> int:
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return ascii_chars // CHARS_PER_TOKEN + len(text) - ascii_chars + 1
+
+def static_chunking_strategy(max_tokens: int, overlap_tokens: int) -> dict:
+    """The `chunking_strategy` for vector store file batches. Raises ValueError outside the API's bounds."""
+    if not MIN_CHUNK_TOKENS <= max_tokens <= MAX_CHUNK_TOKENS:
+        raise ValueError(f"Chunk size must be between {MIN_CHUNK_TOKENS} and {MAX_CHUNK_TOKENS} tokens, got {max_tokens}.")
+    if not 0 <= overlap_tokens <= max_tokens // 2:
+        raise ValueError(f"Chunk overlap must be between 0 and half the chunk size ({max_tokens // 2}), got {overlap_tokens}.")
+    return {"type": "static", "static": {"max_chunk_size_tokens": max_tokens, "chunk_overlap_tokens": overlap_tokens}}
+
+def page_title(markdown: str, url: str) -> str:
+    """The page's first level-1 heading (extraction prepends the HTML title if it has none), else its URL."""
+    for line in markdown.splitlines():
+        match = HEADING_LINE.match(line)
+        if match and len(match.group(1)) == 1:
+            return match.group(2).strip()
+    return url
+
+def split_sections(markdown: str, title: Optional[str] = None) -> List[Section]:
+    """Splits a Markdown page at its headings. Lines in fenced code blocks are never taken for headings,
+    and the first level-1 heading matching `title` is left out of the heading paths."""
+    sections: List[Section] = []
+    stack: List[Tuple[int, str]] = []
+    lines: List[str] = []
+    in_fence = title_seen = False
+
+    def flush():
+        text = "\n".join(lines).strip()
+        if text:
+            sections.append(Section(tuple(heading for _, heading in stack), text))
+        lines.clear()
+
+    for line in markdown.splitlines():
+        if FENCE_LINE.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else HEADING_LINE.match(line)
+        if match:
+            flush()
+            level, heading = len(match.group(1)), match.group(2).strip()
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            if level == 1 and heading == title and not title_seen:
+                title_seen = True # The title is in every section's context line already
+            else:
+                stack.append((level, heading))
+        lines.append(line)
+    flush()
+    return sections
+
+def _blocks(text: str) -> List[str]:
+    """Paragraphs of `text`; a fenced code block stays in one piece, blank lines included."""
+    blocks, current, in_fence = [], [], False
+    for line in text.split("\n"):
+        if FENCE_LINE.match(line):
+            in_fence = not in_fence
+        if not line.strip() and not in_fence:
+            if current:
+                blocks.append("\n".join(current))
+                current = []
+            continue
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """The longest prefix of `text` within `max_tokens`, cut at a space when one is close to the end."""
+    end = min(len(text), max(1, (max_tokens - 1) * CHARS_PER_TOKEN))
+    while end > 1 and (tokens := estimate_tokens(text[:end])) > max_tokens:
+        end = min(end - 1, end * max_tokens // tokens)
+    head = text[:end]
+    space = head.rfind(" ")
+    return head[:space + 1] if space > len(head) // 2 else head
+
+def _split_long(text: str, max_tokens: int) -> List[str]:
+    """Cuts `text` into pieces of at most `max_tokens` at paragraph, then line, then word boundaries."""
+    pieces, current = [], ""
+    for block in _blocks(text):
+        units = [block] if estimate_tokens(block) <= max_tokens else block.split("\n")
+        for n, unit in enumerate(units):
+            separator = "\n" if n else "\n\n"
+            while estimate_tokens(unit) > max_tokens:
+                # A long line fills up the current piece first, so a heading is not left on its own
+                room = max_tokens - estimate_tokens(current + separator) if current else max_tokens
+                if room < max_tokens // 4:
+                    pieces.append(current)
+                    current, room = "", max_tokens
+                head = _truncate(unit, room)
+                pieces.append(f"{current}{separator}{head.rstrip()}" if current else head.rstrip())
+                current = ""
+                unit = unit[len(head):].lstrip()
+            if not unit:
+                continue
+            candidate = f"{current}{separator}{unit}" if current else unit
+            if estimate_tokens(candidate) > max_tokens:
+                pieces.append(current)
+                candidate = unit
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+def _context(title: str, url: str, path: Tuple[str, ...], text: str = "") -> str:
+    """The line a section starts with: page title, URL and the headings above the section's text."""
+    first = HEADING_LINE.match(text.split("\n", 1)[0])
+    if path and first and first.group(2).strip() == path[-1]:
+        path = path[:-1] # The section opens with that heading itself
+    return " > ".join([f"[{title.replace('[', '(').replace(']', ')')}]({url})", *path])
+
+def chunk_markdown(markdown: str, url: str, max_tokens: int, min_fill: float = 0.5) -> List[str]:
+    """Splits a page into self-contained sections of at most about `max_tokens` tokens.
+
+    Sections follow the page's headings. Consecutive sections are merged up to the limit;
+    a new top-level heading starts a new section unless the current one is less than
+    `min_fill` full. Longer sections are cut at paragraph boundaries (never inside a code
+    block unless the block alone is too long). Each section starts with a context line
+    holding the page title, URL and heading path, so a retrieved chunk says where it comes
+    from without its neighbours.
+    """
+    title = page_title(markdown, url)
+    chunks: List[str] = []
+    group: List[Section] = []
+
+    def common_path() -> Tuple[str, ...]:
+        path = group[0].path
+        for section in group[1:]:
+            n = 0
+            while n < min(len(path), len(section.path)) and path[n] == section.path[n]:
+                n += 1
+            path = path[:n]
+        return path
+
+    def render(sections: List[Section]) -> str:
+        text = "\n\n".join(s.text for s in sections)
+        return _context(title, url, common_path() if sections is group else sections[0].path, text) + "\n\n" + text
+
+    for section in split_sections(markdown, title):
+        budget = max_tokens - estimate_tokens(_context(title, url, section.path)) - 1
+        if estimate_tokens(section.text) > budget:
+            if group:
+                chunks.append(render(group))
+                group.clear()
+            for piece in _split_long(section.text, max(1, budget)):
+                chunks.append(_context(title, url, section.path, piece) + "\n\n" + piece)
+            continue
+        if group:
+            size = estimate_tokens(render(group + [section]))
+            new_topic = section.path[:1] != group[0].path[:1] and estimate_tokens(render(group)) >= min_fill * max_tokens
+            if new_topic or size > max_tokens:
+                chunks.append(render(group))
+                group.clear()
+        group.append(section)
+    if group:
+        chunks.append(render(group))
+    return chunks
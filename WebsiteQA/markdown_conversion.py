@@ -0,0 +1,125 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import FrozenSet, List, Literal, Optional, Tuple
+import aiofiles
+from content_extraction import BoilerplateTemplates, extract_main_content
+from near_duplicates import minhash_signature
+from page_buffer import PageBuffer
+from telemetry import get_telemetry
+
+def html_to_markdown(html: str, extract: bool = False, templates: FrozenSet[int] = frozenset()) -> Tuple[str, float, int, List[int], int]:
+    """Converts HTML to Markdown and returns it with the CPU time spent, the size of the HTML
+    that was converted, the page's block hashes and the number of template blocks removed.
+    With `extract`, only the main content is converted and blocks in `templates` are stripped.
+
+    Module-level so it can be pickled and run in a worker process.
+    """
+    import html2text # Deferred to the first conversion (in each worker process)
+    start = time.thread_time()
+    hashes, removed = [], 0
+    if extract:
+        html, hashes, removed = extract_main_content(html, templates)
+    markdown = html2text.html2text(html)
+    return markdown, time.thread_time() - start, len(html), hashes, removed
+
+class MarkdownConverter:
+    """Runs HTML to Markdown conversion off the event loop and writes files asynchronously.
+
+    `html2text` is pure-Python and CPU-bound, so the default "process" executor spreads
+    pages across cores; "thread" avoids the pickling overhead and suits small pages or
+    platforms where forking is undesirable. Per-page conversion times are collected for
+    reporting. Use as an async context manager so the pool is shut down afterwards. If
+    the process pool cannot start (e.g. no working semaphores in the sandbox), threads
+    are used instead.
+
+    With `boilerplate`, only each page's main content is converted, and blocks the site
+    repeats on many pages are learned from the converted pages and stripped from later ones.
+    The learned templates are saved when the converter is closed.
+
+    With `buffer`, pages are handed to the uploader through the in-memory page buffer
+    instead of being written to disk (it spills to disk past its size limit).
+    """
+
+    def __init__(self, executor: Literal["process", "thread"] = "process", max_workers: Optional[int] = None,
+                 boilerplate: Optional[BoilerplateTemplates] = None, buffer: Optional[PageBuffer] = None):
+        self.executor_type = executor
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.boilerplate = boilerplate
+        self.buffer = buffer
+        self._executor: Optional[Executor] = None
+        self.timings: List[Tuple[str, float]] = []
+        self.html_bytes = self.content_bytes = self.markdown_bytes = self.blocks_removed = 0
+
+    async def __aenter__(self) -> "MarkdownConverter":
+        if self.executor_type == "process":
+            try:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                return self
+            except (OSError, ImportError, NotImplementedError) as e:
+                print(f"⚠️ Could not start conversion processes ({e}); converting on threads instead.")
+                self.executor_type = "thread"
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="html2text")
+        return self
+
+    async def __aexit__(self, *exc):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        if self.boilerplate is not None:
+            self.boilerplate.save()
+
+    async def convert(self, url: str, html: str) -> str:
+        loop = asyncio.get_running_loop()
+        telemetry = get_telemetry()
+        extract = self.boilerplate is not None
+        templates = self.boilerplate.snapshot() if extract else frozenset()
+        with telemetry.span("conversion", executor=self.executor_type):
+            markdown, seconds, content_size, hashes, removed = await loop.run_in_executor(
+                self._executor, html_to_markdown, html, extract, templates
+            )
+        if extract:
+            self.boilerplate.observe(hashes)
+        self.timings.append((url, seconds))
+        self.html_bytes += len(html)
+        self.content_bytes += content_size
+        self.markdown_bytes += len(markdown)
+        self.blocks_removed += removed
+        telemetry.observe("conversion_cpu_seconds", seconds)
+        telemetry.count("conversion_html_bytes_total", len(html), stage="input")
+        telemetry.count("conversion_html_bytes_total", content_size, stage="extracted")
+        telemetry.count("markdown_bytes_total", len(markdown))
+        return markdown
+
+    async def signature(self, markdown: str) -> Optional[bytes]:
+        """Computes the page's near-duplicate signature on the same worker pool."""
+        loop = asyncio.get_running_loop()
+        with get_telemetry().span("signature", executor=self.executor_type):
+            return await loop.run_in_executor(self._executor, minhash_signature, markdown)
+
+    async def write(self, path: str, content: str) -> None:
+        if self.buffer is not None:
+            await self.buffer.put(path, content.encode("utf-8"))
+            return
+        telemetry = get_telemetry()
+        with telemetry.span("disk_write"):
+            async with aiofiles.open(path, "w", encoding="utf-8") as f:
+                await f.write(content)
+        telemetry.count("disk_write_bytes_total", len(content.encode("utf-8")))
+
+    def summary(self) -> str:
+        if not self.timings:
+            return "No pages converted."
+        total = sum(seconds for _, seconds in self.timings)
+        slowest_url, slowest = max(self.timings, key=lambda t: t[1])
+        summary = (f"Converted {len(self.timings)} pages on {self.max_workers} {self.executor_type} workers: "
+                   f"{total:.2f}s CPU total, {1000 * total / len(self.timings):.1f}ms avg, "
+                   f"slowest {1000 * slowest:.1f}ms ({slowest_url})")
+        if self.boilerplate is not None:
+            summary += (f"\nMain-content extraction kept {self.content_bytes / 1024:.0f} of {self.html_bytes / 1024:.0f} KB of HTML "
+                        f"({100 * (1 - self.content_bytes / max(1, self.html_bytes)):.0f}% removed); "
+                        f"{len(self.boilerplate.templates)} boilerplate blocks known ({self.boilerplate.learned} learned this run), "
+                        f"{self.blocks_removed} repeated blocks stripped; {self.markdown_bytes / 1024:.0f} KB of Markdown produced.")
+        if self.buffer is not None:
+            summary += f"\n{self.buffer.summary()}"
+        return summary
@@ -0,0 +1,150 @@
+import base64
+import hashlib
+import json
+import os
+import re
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Set
+from urllib.parse import urlsplit
+from crawl_manifest import write_json_atomic
+
+NEAR_DUPLICATES_DIR = "near_duplicates"
+
+SIGNATURE_BINS = 128
+BANDS = 16 # LSH bands of SIGNATURE_BINS // BANDS rows: pages above ~0.8 similarity share a band with ~95% probability
+SHINGLE_WORDS = 5
+MIN_SHINGLES = 32 # Shorter pages carry too little text to call them duplicates
+EMPTY_BIN = 0xFFFF
+
+WORD_PATTERN = re.compile(r"\w+")
+# Link targets differ between otherwise identical copies (versioned or localized paths), so only link text counts
+LINK_TARGET_PATTERN = re.compile(r"\]\([^)]*\)")
+
+def minhash_signature(markdown: str) -> Optional[bytes]:
+    """One-permutation MinHash of the page's word shingles.
+
+    Each shingle is hashed once; the hash picks one of SIGNATURE_BINS bins and the bin keeps
+    the minimum of the remaining bits (16 of them are stored). Matching bins estimate the
+    Jaccard similarity of two pages' shingle sets. Returns None for pages too short to compare.
+    Module-level so it can run in the converter's worker processes.
+    """
+    words = WORD_PATTERN.findall(LINK_TARGET_PATTERN.sub("]", markdown).lower())
+    if len(words) - SHINGLE_WORDS + 1 < MIN_SHINGLES:
+        return None
+    mins = [None] * SIGNATURE_BINS
+    for i in range(len(words) - SHINGLE_WORDS + 1):
+        h = int.from_bytes(hashlib.blake2b(" ".join(words[i:i + SHINGLE_WORDS]).encode(), digest_size=8).digest(), "little")
+        b, value = h & (SIGNATURE_BINS - 1), h >> 7
+        if mins[b] is None or value < mins[b]:
+            mins[b] = value
+    return array("H", [EMPTY_BIN if m is None else m & 0xFFFF for m in mins]).tobytes()
+
+def similarity(a: bytes, b: bytes) -> float:
+    """Estimated Jaccard similarity of two signatures, ignoring bins empty in both."""
+    a, b = array("H", a), array("H", b)
+    matches = used = 0
+    for x, y in zip(a, b):
+        if x == EMPTY_BIN and y == EMPTY_BIN:
+            continue
+        used += 1
+        matches += x == y
+    return matches / used if used else 0.0
+
+def _band_keys(signature: bytes) -> List[int]:
+    width = len(signature) // BANDS
+    return [hash((band, signature[band * width:(band + 1) * width])) for band in range(BANDS)]
+
+class DuplicateCheck(NamedTuple):
+    canonical: Optional[str] # Page the checked URL duplicates, None if it is canonical itself
+    demoted: Optional[str] = None # Former canonical page the checked URL took the place of
+
+class NearDuplicateIndex:
+    """Per-site, per-session clusters of near-duplicate pages (versioned paths, `?tab=` variants,
+    print views, mostly untranslated localized copies).
+
+    `check(url, signature)` compares a page with the canonical pages seen so far through
+    locality-sensitive hashing. Whatever order concurrent conversions finish in, a cluster's
+    canonical page is a page that was canonical in an earlier crawl, so pages already in
+    the vector store keep their place, or else its lowest URL. A page ranking before the
+    canonical page it matches takes its place, and the former canonical page is reported
+    as `demoted`.
+    Signatures of canonical pages and the mapping of each duplicate to its canonical page
+    are saved to `path` for later runs.
+    """
+
+    def __init__(self, path: str, threshold: float = 0.8):
+        self.path = path
+        self.threshold = threshold
+        self.signatures: Dict[str, bytes] = {}
+        self.duplicates: Dict[str, str] = {}
+        self._buckets: Dict[int, Set[str]] = {}
+        self.skipped = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.duplicates = data.get("duplicates", {})
+            for url, encoded in data.get("signatures", {}).items():
+                self._add(url, base64.b64decode(encoded))
+        self._established = set(self.signatures) # Canonical pages of earlier crawls
+
+    @classmethod
+    def for_site(cls, website_url: str, session_name: str, directory: str = NEAR_DUPLICATES_DIR, **kwargs) -> "NearDuplicateIndex":
+        host = urlsplit(website_url).netloc or website_url
+        safe_host = re.sub(r'[<>:"/\\|?*]', '_', host)
+        return cls(os.path.join(directory, f"{session_name}_{safe_host}.json"), **kwargs)
+
+    def _add(self, url: str, signature: bytes):
+        self.signatures[url] = signature
+        for key in _band_keys(signature):
+            self._buckets.setdefault(key, set()).add(url)
+
+    def _discard(self, url: str):
+        if (signature := self.signatures.pop(url, None)) is None:
+            return
+        for key in _band_keys(signature):
+            if bucket := self._buckets.get(key):
+                bucket.discard(url)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _rank(self, url: str):
+        return url not in self._established, url
+
+    def check(self, url: str, signature: Optional[bytes]) -> DuplicateCheck:
+        self._discard(url)
+        if signature is None:
+            self.duplicates.pop(url, None)
+            return DuplicateCheck(None)
+        candidates = set()
+        for key in _band_keys(signature):
+            candidates |= self._buckets.get(key, set())
+        matches = sorted((candidate for candidate in candidates if similarity(signature, self.signatures[candidate]) >= self.threshold),
+                         key=self._rank)
+        if matches and self._rank(matches[0]) < self._rank(url):
+            self.duplicates[url] = matches[0]
+            self.skipped += 1
+            return DuplicateCheck(matches[0])
+        self._add(url, signature)
+        self.duplicates.pop(url, None)
+        if not matches:
+            return DuplicateCheck(None)
+        demoted = matches[0]
+        self._discard(demoted)
+        for duplicate, canonical in self.duplicates.items():
+            if canonical == demoted:
+                self.duplicates[duplicate] = url
+        self.duplicates[demoted] = url
+        return DuplicateCheck(None, demoted)
+
+    def remove(self, url: str):
+        """Forgets a page that left the site. Its duplicates are compared afresh on the next crawl."""
+        self._discard(url)
+        self._established.discard(url)
+        self.duplicates.pop(url, None)
+
+    def save(self):
+        write_json_atomic(self.path, {
+            "threshold": self.threshold,
+            "signatures": {url: base64.b64encode(signature).decode() for url, signature in self.signatures.items()},
+            "duplicates": self.duplicates,
+        })
@@ -0,0 +1,22 @@
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+_client: Optional["AsyncOpenAI"] = None
+_client_lock = threading.Lock()
+
+def get_client() -> "AsyncOpenAI":
+    """Returns the process-wide async OpenAI client, created on first use.
+
+    Built lazily rather than at import, so importing the tools and `thread_functions` stays
+    cheap (the `openai` package itself is only imported here) and reads OPENAI_API_KEY /
+    OPENAI_BASE_URL as they are when the client is needed.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import AsyncOpenAI
+            _client = AsyncOpenAI()
+        return _client
@@ -0,0 +1,114 @@
+import os
+import threading
+from typing import Dict, Optional
+import aiofiles
+import aiofiles.os
+from telemetry import get_telemetry
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+class PageBuffer:
+    """Hands converted pages from the scraper to the uploader in memory.
+
+    Pages are keyed by the path they would have on disk (`scraped_content/<page>.md`), so the
+    manifest, crawl journal and `scraped_files` refer to them exactly as to files. `put` keeps
+    a page in memory while the buffer holds less than `max_bytes`, and writes it to its path
+    otherwise. `read`, `size`, `exists` and `remove` look in memory first and fall back to the
+    file system, so callers handle buffered pages, spilled pages and ordinary files alike.
+    Pages are stored as the bytes that are uploaded; `read` returns them without copying.
+
+    Buffered pages live only as long as the process: after a crash the scraper fetches them again.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._pages: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.buffered = 0
+        self.spilled = 0
+
+    def configure(self, max_bytes: Optional[int] = None):
+        with self._lock:
+            if max_bytes:
+                self.max_bytes = max_bytes
+
+    async def put(self, path: str, content: bytes) -> None:
+        """Stores `content` under `path`, in memory if it fits in the budget, else on disk."""
+        telemetry = get_telemetry()
+        with self._lock:
+            # A page written again replaces its buffered copy, whether the new content stays in memory or not
+            if (old := self._pages.pop(path, None)) is not None:
+                self.bytes -= len(old)
+            fits = self.bytes + len(content) <= self.max_bytes
+            if fits:
+                self._pages[path] = content
+                self.bytes += len(content)
+                self.buffered += 1
+        if fits:
+            telemetry.count("page_buffer_pages_total", result="memory")
+            return
+        self.spilled += 1
+        telemetry.count("page_buffer_pages_total", result="spilled")
+        with telemetry.span("disk_write"):
+            async with aiofiles.open(path, "wb") as f:
+                await f.write(content)
+        telemetry.count("disk_write_bytes_total", len(content))
+
+    def exists(self, path: str) -> bool:
+        return path in self._pages or os.path.exists(path)
+
+    def size(self, path: str) -> int:
+        if (content := self._pages.get(path)) is not None:
+            return len(content)
+        return os.path.getsize(path)
+
+    async def read(self, path: str) -> bytes:
+        if (content := self._pages.get(path)) is not None:
+            return content
+        async with aiofiles.open(path, "rb") as f:
+            return await f.read()
+
+    def _pop(self, path: str) -> Optional[bytes]:
+        with self._lock:
+            content = self._pages.pop(path, None)
+            if content is not None:
+                self.bytes -= len(content)
+            return content
+
+    async def remove(self, path: str) -> None:
+        """Frees a page once it is uploaded, or deletes its file."""
+        if self._pop(path) is None:
+            await aiofiles.os.remove(path)
+
+    def move(self, path: str, target: str) -> None:
+        """Moves a page out of the buffer (or a file) to the file `target`."""
+        if (content := self._pop(path)) is None:
+            os.replace(path, target)
+            return
+        with open(target, "wb") as f:
+            f.write(content)
+
+    def discard(self, directory: str) -> int:
+        """Drops every buffered page under `directory` (whose files are being deleted). Returns the number dropped."""
+        prefix = os.path.join(os.path.normpath(directory), "")
+        with self._lock:
+            paths = [path for path in self._pages if os.path.normpath(path).startswith(prefix)]
+        for path in paths:
+            self._pop(path)
+        return len(paths)
+
+    def summary(self) -> str:
+        return (f"Page buffer: {self.buffered} pages handed over in memory, {self.spilled} spilled to disk, "
+                f"{self.bytes / 2**20:.1f} MB held (limit {self.max_bytes / 2**20:.0f} MB)")
+
+_buffer: Optional[PageBuffer] = None
+_buffer_lock = threading.Lock()
+
+def get_page_buffer() -> PageBuffer:
+    """Returns the process-wide page buffer shared by the scraper and the uploader."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = PageBuffer()
+        return _buffer
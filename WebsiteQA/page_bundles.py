@@ -0,0 +1,101 @@
+import os
+import re
+from typing import Iterable, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import urlsplit
+from page_buffer import get_page_buffer
+
+PAGE_STORE_DIR = "bundled_pages"
+BUNDLE_SEPARATOR = b"\n\n---\n\n"
+
+class PageBundle(NamedTuple):
+    name: str
+    members: List[Tuple[Optional[str], str]] # (url, path) of each page, in order
+    size: int
+
+def bundle_group(url: Optional[str], depth: int = 1) -> str:
+    """Host and first `depth` path segments of `url`: pages under /docs/ or /blog/ are packed together."""
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    segments = [segment for segment in parts.path.split("/") if segment][:depth]
+    return "/".join([parts.netloc, *segments])
+
+def _safe_name(text: str) -> str:
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', text).strip("_")[:80] or "site"
+
+def plan_bundles(pages: Iterable[Tuple[Optional[str], str, int]], max_bytes: int, max_pages: int,
+                 group_depth: int = 1, min_fill: float = 0.25) -> List[PageBundle]:
+    """Packs (url, path, size) pages into bundles of at most `max_bytes` and `max_pages` pages.
+
+    Pages are ordered by URL path prefix (see `bundle_group`) and URL, so related pages share
+    a bundle. A new prefix starts a new bundle unless the current one is less than `min_fill`
+    full, which keeps sections of a page or two from each becoming a file of their own.
+    A page larger than `max_bytes` gets a bundle to itself.
+    """
+    keyed = sorted((bundle_group(url, group_depth), url or "", path, size) for url, path, size in pages)
+    bundles: List[PageBundle] = []
+    members: List[Tuple[Optional[str], str]] = []
+    size = 0
+    group = first_group = None
+    counts = {}
+
+    def flush():
+        nonlocal members, size
+        if members:
+            index = counts[first_group] = counts.get(first_group, 0) + 1
+            bundles.append(PageBundle(f"bundle_{_safe_name(first_group)}_{index:04d}.md", members, size))
+        members, size = [], 0
+
+    for key, url, path, page_size in keyed:
+        full = members and (size + page_size + len(BUNDLE_SEPARATOR) > max_bytes or len(members) >= max_pages)
+        if full or (members and key != group and size >= min_fill * max_bytes):
+            flush()
+        if not members:
+            first_group = key
+        group = key
+        members.append((url or None, path))
+        size += page_size + (len(BUNDLE_SEPARATOR) if len(members) > 1 else 0)
+    flush()
+    return bundles
+
+class PageStore:
+    """Local copies of the Markdown of bundled pages, one file per URL.
+
+    A bundle in the vector store cannot be edited, so when one of its pages changes or
+    disappears the bundle is rebuilt from the current version of the others, kept here.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @classmethod
+    def for_manifest(cls, manifest_path: str, directory: str = PAGE_STORE_DIR) -> "PageStore":
+        return cls(os.path.join(directory, os.path.splitext(os.path.basename(manifest_path))[0]))
+
+    def path_for(self, url: str) -> str:
+        filename = re.sub(r'[<>:"/\\|?*]', '_', url.replace("https://", "").replace("http://", "")) + ".md"
+        return os.path.join(self.directory, filename)
+
+    def put(self, url: str, path: str) -> None:
+        """Moves the uploaded page at `path` (a file or a page buffered in memory) into the store."""
+        target = self.path_for(url)
+        if os.path.abspath(path) != os.path.abspath(target):
+            os.makedirs(self.directory, exist_ok=True)
+            get_page_buffer().move(path, target)
+
+    def prune(self, keep_urls: Iterable[str]) -> int:
+        """Deletes stored pages other than `keep_urls`. Returns the number deleted."""
+        if not os.path.isdir(self.directory):
+            return 0
+        keep: Set[str] = {os.path.basename(self.path_for(url)) for url in keep_urls}
+        pruned = 0
+        for filename in os.listdir(self.directory):
+            if filename not in keep:
+                os.remove(os.path.join(self.directory, filename))
+                pruned += 1
+        if not keep:
+            try:
+                os.rmdir(self.directory)
+            except OSError:
+                pass
+        return pruned
@@ -0,0 +1,215 @@
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Set, Union
+import httpx
+from sitemap_functions import iter_sitemap_entries
+from crawl_scheduler import CrawlScheduler, RobotsCache
+from crawl_manifest import CrawlManifest, revalidate
+from crawl_journal import CrawlJournal
+from link_discovery import LinkFrontier
+from http_fetch import create_http_client, fetch_static, needs_js_rendering
+from browser_pool import get_browser_pool
+from telemetry import get_telemetry
+
+# Returned by the crawl fetcher when a conditional GET answers 304 Not Modified
+NOT_MODIFIED = object()
+
+# Statuses meaning the page no longer exists, so its uploaded version is removed
+GONE_STATUSES = {404, 410}
+
+class CrawlSource:
+    """The URLs a crawl visits.
+
+    Iterating yields the sitemap's new and changed pages; unchanged pages (`skipped`) and
+    pages an interrupted run finished (`resumed`) are counted instead. With a link frontier,
+    a site without sitemap pages is crawled by following links from its start URL.
+    `complete` tells whether the listing covered the whole site, so pages missing from it
+    can be taken as removed. Links are only followed where the origin's robots.txt (read
+    through `robots`, shared with the crawler) allows.
+    """
+
+    def __init__(self, website_url: str, manifest: CrawlManifest, journal: CrawlJournal, finished: Set[str] = frozenset(),
+                 frontier: Optional[LinkFrontier] = None, use_sitemap: bool = True, max_concurrent: int = 5,
+                 robots: Optional[RobotsCache] = None):
+        self.website_url = website_url
+        self.manifest = manifest
+        self.journal = journal
+        self.finished = finished
+        self.frontier = frontier
+        self.use_sitemap = use_sitemap
+        self.max_concurrent = max_concurrent
+        self.robots = robots or RobotsCache()
+        self.skipped = 0
+        self.resumed = 0
+        self.failed_sitemaps: List[str] = []
+        self.followed_links = False
+
+    @property
+    def complete(self) -> bool:
+        if self.followed_links:
+            # Pages beyond the limit were not reached, which does not mean they are gone
+            return not self.frontier.truncated
+        # A partially failed sitemap would make every page it lists look deleted
+        return not self.failed_sitemaps
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        listed = 0
+        if self.use_sitemap:
+            async for entry in iter_sitemap_entries(
+                self.website_url,
+                max_concurrent=self.max_concurrent,
+                on_error=lambda sitemap_url, e: self.failed_sitemaps.append(sitemap_url),
+            ):
+                listed += 1
+                self.manifest.mark_seen(entry.loc, entry.lastmod)
+                if self.manifest.is_fresh(entry.loc, entry.lastmod):
+                    self.skipped += 1
+                    continue
+                if entry.loc in self.finished:
+                    self.resumed += 1
+                    continue
+                self.journal.pending(entry.loc, entry.lastmod)
+                yield entry.loc
+        if self.frontier is None or listed:
+            return
+
+        print(f"No sitemap pages found; following links from {self.website_url} instead.")
+        self.followed_links = True # The link graph decides which pages were removed now
+        frontier = self.frontier
+        frontier.allowed = (await self.robots.rules(frontier.origin)).allows
+        # Pages known from earlier runs are seeded: unchanged ones answer 304 and reveal no links
+        frontier.seed([frontier.start_url, *self.journal.entries, *self.manifest.pages])
+        async for url in frontier:
+            self.manifest.mark_seen(url)
+            if url in self.finished:
+                self.resumed += 1
+                frontier.completed(url)
+                continue
+            yield url
+
+class PageCrawler:
+    """Fetches pages through a `CrawlScheduler` and yields each successful one as soon as it arrives.
+
+    Pages already in the manifest are revalidated with a conditional GET first and skipped
+    on 304. Depending on `fetch_mode`, pages are fetched over plain HTTP and only rendered
+    in the browser when needed ('auto'), always rendered ('browser') or never ('static').
+    Each outcome is recorded in the crawl journal and reported to the link frontier, if
+    any, which queues the page's links. `fetched` counts the pages yielded. Crawl-delays
+    come from `robots`.
+    """
+
+    def __init__(self, fetch_mode: str = "auto", max_concurrent: int = 5, manifest: Optional[CrawlManifest] = None,
+                 journal: Optional[CrawlJournal] = None, frontier: Optional[LinkFrontier] = None,
+                 robots: Optional[RobotsCache] = None):
+        self.fetch_mode = fetch_mode
+        self.max_concurrent = max_concurrent
+        self.manifest = manifest
+        self.journal = journal
+        self.frontier = frontier
+        self.robots = robots
+        self.fetched = 0
+        self.fetch_counts = {"static": 0, "browser": 0}
+        self._revalidated: Dict[str, dict] = {} # Validators from conditional GETs answered with 200 in browser mode
+        self._crawl_config = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+    async def _render(self, url: str):
+        if self._crawl_config is None:
+            # crawl4ai pulls in Playwright; static-only crawls never import it
+            from crawl4ai import CrawlerRunConfig, CacheMode
+            self._crawl_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS)
+        self.fetch_counts["browser"] += 1
+        # Warm browsers are shared across runs and sessions; one is only started once a page needs it
+        return await get_browser_pool().crawl(url, self._crawl_config)
+
+    async def _fetch(self, url: str, slot: int):
+        with get_telemetry().span("page_crawl", fetch_mode=self.fetch_mode):
+            return await self._fetch_page(url)
+
+    async def _fetch_page(self, url: str):
+        headers = self.manifest.conditional_headers(url) if self.manifest else {}
+        if self.fetch_mode == "browser":
+            if headers:
+                try:
+                    validators = await revalidate(self._http_client, url, headers)
+                    if validators is None:
+                        return NOT_MODIFIED
+                    # The browser may not report them; kept so the next run can revalidate the page too
+                    self._revalidated[url] = validators
+                except httpx.HTTPError as e:
+                    print(f"Conditional GET failed for {url}, crawling it anyway: {e}")
+            return await self._render(url)
+
+        try:
+            page = await fetch_static(self._http_client, url, headers)
+        except httpx.HTTPError as e:
+            if self.fetch_mode == "static":
+                raise
+            print(f"HTTP fetch failed for {url}, rendering it in the browser: {e}")
+            return await self._render(url)
+        if page.status_code == 304:
+            return NOT_MODIFIED
+        # Only JS-rendered pages and pages that block plain clients (403) are worth a browser fetch;
+        # rate limits and server errors go back to the scheduler so it can slow down
+        if self.fetch_mode == "auto" and (page.status_code == 403 or (page.success and needs_js_rendering(page.html))):
+            return await self._render(url)
+        self.fetch_counts["static"] += 1
+        return page
+
+    async def crawl(self, urls: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[dict]:
+        """Yields {url, html, etag, last_modified} for each successfully crawled page, in completion order."""
+        print(f"\n=== Starting Parallel Crawling (fetch mode: {self.fetch_mode}) ===")
+        if isinstance(urls, AsyncIterable):
+            urls = urls.__aiter__() # Closed below, so an abandoned listing stops its own fetches
+        manifest, journal, frontier = self.manifest, self.journal, self.frontier
+        telemetry = get_telemetry()
+        self.fetch_counts = {"static": 0, "browser": 0}
+        self._http_client = create_http_client(self.max_concurrent)
+        scheduler = CrawlScheduler(self._fetch, self.max_concurrent, robots=self.robots)
+
+        try:
+            async for url, result in scheduler.run(urls):
+                validators = self._revalidated.pop(url, {})
+                if frontier is not None:
+                    fetched = result is not NOT_MODIFIED and not isinstance(result, Exception) and result.success
+                    # Links on a redirected page are relative to where it ended up
+                    final_url = (getattr(result, "redirected_url", None) or result.url) if fetched else None
+                    frontier.completed(url, result.html if fetched else None, final_url)
+                if result is NOT_MODIFIED:
+                    manifest.not_modified(url)
+                    telemetry.count("pages_total", result="not_modified")
+                    if journal:
+                        journal.done(url)
+                elif isinstance(result, Exception):
+                    print(f"Error scraping {url}: {result}")
+                    telemetry.count("pages_total", result="failed")
+                    if journal:
+                        journal.failed(url, str(result))
+                elif result.success:
+                    telemetry.count("pages_total", result="fetched")
+                    telemetry.count("crawl_bytes_total", len(result.html.encode("utf-8")))
+                    headers = {k.lower(): v for k, v in (result.response_headers or {}).items()}
+                    self.fetched += 1
+                    yield {
+                        "url": url,
+                        "html": result.html,
+                        "etag": headers.get("etag") or validators.get("etag"),
+                        "last_modified": headers.get("last-modified") or validators.get("last_modified"),
+                    }
+                else:
+                    print(f"Error scraping {url}: {result.error_message}")
+                    telemetry.count("pages_total", result="failed")
+                    if journal:
+                        journal.failed(url, str(result.error_message))
+                    if manifest and getattr(result, "status_code", None) in GONE_STATUSES:
+                        manifest.mark_gone(url)
+
+        finally:
+            if hasattr(urls, "aclose"):
+                await urls.aclose()
+            await self._http_client.aclose()
+
+        for origin, stats in scheduler.stats().items():
+            print(f"{origin}: {stats['requests']} requests, avg latency {stats['avg_latency']}s, "
+                  f"final concurrency {stats['limit']}, {stats['backoffs']} backoffs")
+        print(f"Fetched {self.fetch_counts['static']} pages over HTTP and {self.fetch_counts['browser']} in the browser.")
+        for mode, count in self.fetch_counts.items():
+            telemetry.count("page_fetches_total", count, fetch_mode=mode)
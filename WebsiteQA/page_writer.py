@@ -0,0 +1,142 @@
+import asyncio
+import os
+import re
+from typing import AsyncIterable, List, Optional, Union
+from crawl_manifest import CrawlManifest, content_hash
+from crawl_journal import CrawlJournal
+from near_duplicates import NearDuplicateIndex
+from markdown_conversion import MarkdownConverter
+from markdown_chunking import chunk_markdown
+from search_index import SearchIndex
+from telemetry import get_telemetry
+
+OUTPUT_DIR = "scraped_content" # Relative path within the agency folder
+
+def page_filename(url: str) -> str:
+    """A safe filename for the page at `url`."""
+    return re.sub(r'[<>:"/\\|?*]', '_', url.replace("https://", "").replace("http://", "")) + ".md"
+
+class PageWriter:
+    """Converts crawled pages to Markdown on the converter's worker pool and writes them to `output_dir`.
+
+    With a manifest, pages whose Markdown is identical to the uploaded version are not
+    written, and with a near-duplicate index, neither are near-duplicates of another page
+    (they are recorded in the manifest instead, so later crawls skip them while unchanged).
+    Written pages are queued for the local search index, if any, and split into sections of
+    at most `chunk_max_tokens` tokens when it is set. Each outcome is recorded in the crawl journal.
+    """
+
+    def __init__(self, converter: MarkdownConverter, manifest: Optional[CrawlManifest] = None,
+                 index: Optional[SearchIndex] = None, journal: Optional[CrawlJournal] = None,
+                 dedup: Optional[NearDuplicateIndex] = None, chunk_max_tokens: Optional[int] = None,
+                 output_dir: str = OUTPUT_DIR):
+        self.converter = converter
+        self.manifest = manifest
+        self.index = index
+        self.journal = journal
+        self.dedup = dedup
+        self.chunk_max_tokens = chunk_max_tokens
+        self.output_dir = output_dir
+        self._compared = set() # Pages checked against the near-duplicate index in this crawl
+
+    @property
+    def duplicates(self) -> int:
+        return self.dedup.skipped if self.dedup else 0
+
+    async def save(self, data: dict) -> Optional[str]:
+        """Converts one crawled page to Markdown and writes it.
+        Returns the file path, or None if unchanged or a near-duplicate."""
+        url = data["url"]
+        manifest, index, journal = self.manifest, self.index, self.journal
+
+        # Convert HTML to Markdown off the event loop
+        try:
+            markdown_content = await self.converter.convert(url, data["html"])
+        except Exception as e:
+            if journal:
+                journal.failed(url, f"Conversion failed: {e}")
+            raise
+
+        if self.dedup is not None:
+            check = self.dedup.check(url, await self.converter.signature(markdown_content))
+            self._compared.add(url)
+            if check.canonical:
+                self._skip_duplicate(url, check.canonical, data.get("etag"), data.get("last_modified"))
+                return None
+            if check.demoted:
+                self._compared.add(check.demoted)
+                self._skip_duplicate(check.demoted, url)
+
+        filepath = os.path.join(self.output_dir, page_filename(url))
+        if self.chunk_max_tokens:
+            # Only the uploaded file is sectioned; the near-duplicate check and local index use the plain page
+            body = "\n\n".join(chunk_markdown(markdown_content, url, self.chunk_max_tokens))
+        else:
+            body = markdown_content
+        markdown_hash = content_hash(body)
+        changed = not manifest or manifest.stage(url, markdown_hash, filepath, data.get("etag"), data.get("last_modified"))
+        if index is not None and (changed or url not in index):
+            index.add_page(url, markdown_content)
+        if not changed:
+            if journal:
+                journal.done(url)
+            return None
+
+        await self.converter.write(filepath, f"# Scraped Content from {url}\n\n{body}")
+        if self.dedup is not None and url in self.dedup.duplicates:
+            return None # A lower URL of its cluster was checked while the page was being written
+        if journal:
+            journal.done(url, filepath, markdown_hash, data.get("etag"), data.get("last_modified"))
+        return filepath
+
+    def _skip_duplicate(self, url: str, canonical: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        print(f"Skipping {url}: near-duplicate of {canonical}")
+        get_telemetry().count("pages_total", result="near_duplicate")
+        if self.manifest:
+            self.manifest.duplicate(url, canonical, etag, last_modified)
+        if self.index is not None and url in self.index:
+            self.index.remove_page(url)
+        if self.journal:
+            self.journal.done(url)
+
+    async def save_all(self, pages: Union[List[dict], AsyncIterable[dict]]) -> List[str]:
+        """Saves every page and returns the paths written. Pages from an async iterable are
+        converted as they arrive, so the journal records them as done while the crawl is still running."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        if isinstance(pages, AsyncIterable):
+            saves = []
+            try:
+                async for data in pages:
+                    saves.append(asyncio.create_task(self.save(data)))
+            except BaseException:
+                for task in saves:
+                    task.cancel()
+                raise
+        else:
+            saves = [self.save(data) for data in pages]
+        results = await asyncio.gather(*saves)
+        # Pages that became near-duplicates of a page saved after them are no longer staged
+        staged = self.manifest.pending_by_path() if self.manifest else None
+        saved_files = [filepath for filepath in results if filepath and (staged is None or filepath in staged)] # Store relative paths
+
+        print(f"\nSaved {len(saved_files)} pages to '{self.output_dir}'")
+        print(self.converter.summary())
+        return saved_files
+
+    def commit(self):
+        """Drops pages the manifest marks as removed from the near-duplicate and search indexes and saves both.
+        Duplicates of changed or removed pages are released, so the next crawl compares them again."""
+        if self.dedup is not None:
+            changed = {url for url, page in self.manifest.pages.items() if "pending" in page}
+            for url in self.manifest.removed():
+                if not self.manifest.pages[url].get("duplicate_of"):
+                    self.dedup.remove(url)
+                    changed.add(url)
+            self.manifest.release_duplicates(changed, keep=self._compared)
+            self.dedup.save()
+        if self.index is None:
+            return
+        for url in self.manifest.removed():
+            self.index.remove_page(url)
+        self.index.commit()
+        print(f"Local search index: {len(self.index)} sections.")
@@ -0,0 +1,224 @@
+import asyncio
+import random
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+from telemetry import get_telemetry
+
+T = TypeVar("T")
+
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parses OpenAI reset headers ("1s", "6m0s", "120ms") and Retry-After seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parts = DURATION_PART.findall(value)
+        return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts) if parts else None
+
+def _retry_after(headers) -> Optional[float]:
+    if not headers:
+        return None
+    if (ms := headers.get("retry-after-ms")) is not None:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after"))
+
+def _is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    # Connection errors and timeouts (APITimeoutError is a subclass) carry no status code
+    # Looked up rather than imported: until some client has loaded `openai`, the error cannot be one of its
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(error, openai.APIConnectionError)
+
+class _Slots:
+    """Concurrency gate of one event loop. Its size is read from the limiter on every
+    acquire, so a reconfigured ceiling applies to calls already waiting for a slot."""
+
+    def __init__(self, limiter: "RateLimiter"):
+        self.limiter = limiter
+        self.in_use = 0
+        self._waiters: deque = deque()
+
+    async def __aenter__(self):
+        while self.in_use >= self.limiter.max_concurrent:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self.wake() # Hand the slot it was woken for to the next waiter
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_use += 1
+
+    async def __aexit__(self, *exc_info):
+        self.in_use -= 1
+        self.wake()
+
+    def wake(self):
+        """Wakes as many waiters as there are free slots; they check the ceiling again themselves."""
+        free = self.limiter.max_concurrent - self.in_use
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+class RateLimiter:
+    """Token-bucket scheduler for OpenAI API calls with a concurrency ceiling.
+
+    - At most `max_concurrent` calls run at once (per event loop) and calls start at no
+      more than `requests_per_second` on average, with bursts of up to `burst`.
+    - Rate-limit headers are read from raw responses: when `x-ratelimit-remaining-requests`
+      runs out, every caller pauses until `x-ratelimit-reset-requests`.
+    - 429/5xx and connection errors are retried with full-jitter exponential backoff, or
+      after Retry-After when the server sends it, so failed calls do not retry in lockstep.
+
+    `call()` accepts a coroutine factory. If it returns an OpenAI raw response
+    (`client.<resource>.with_raw_response.<method>(...)`), headers are inspected and the
+    parsed object is returned.
+    """
+
+    def __init__(self, max_concurrent: int = 16, requests_per_second: float = 20.0, burst: Optional[int] = None,
+                 max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_concurrent = max_concurrent
+        self.requests_per_second = requests_per_second
+        self.burst = burst or max_concurrent
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+        self._slots = weakref.WeakKeyDictionary()
+        self.completed = 0
+        self.retries = 0
+        self.failures = 0
+        self._first_start: Optional[float] = None
+        self._last_finish: Optional[float] = None
+
+    def configure(self, max_concurrent: Optional[int] = None, requests_per_second: Optional[float] = None):
+        """Adjusts the limits. Calls in flight keep their slots; a lower concurrency ceiling
+        holds back new calls until enough of them finish, a higher one admits waiting calls right away."""
+        with self._lock:
+            if max_concurrent:
+                self.max_concurrent = max_concurrent
+                self.burst = max(self.burst, max_concurrent)
+                for loop, slots in list(self._slots.items()):
+                    if not loop.is_closed():
+                        loop.call_soon_threadsafe(slots.wake)
+            if requests_per_second:
+                self.requests_per_second = requests_per_second
+
+    def _slots_for_loop(self) -> _Slots:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if (slots := self._slots.get(loop)) is None:
+                slots = self._slots[loop] = _Slots(self)
+            return slots
+
+    def _reserve(self) -> float:
+        """Takes a token and returns how long to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.requests_per_second)
+            self._refilled_at = now
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.requests_per_second
+            return max(wait, self._resume_at - now)
+
+    def _pause(self, seconds: float):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def _observe(self, headers):
+        if not headers:
+            return
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        if remaining is not None and remaining.isdigit() and int(remaining) == 0:
+            if reset := parse_duration(headers.get("x-ratelimit-reset-requests")):
+                self._pause(reset + random.uniform(0, self.base_delay))
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        response = getattr(error, "response", None)
+        if (retry_after := _retry_after(getattr(response, "headers", None))) is not None:
+            delay = retry_after + random.uniform(0, self.base_delay)
+        else:
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if getattr(error, "status_code", None) == 429:
+            # Everyone backs off, not only the caller that hit the limit
+            self._pause(delay)
+        return delay
+
+    async def call(self, make_call: Callable[[], Awaitable[T]], description: str = "request") -> T:
+        for attempt in range(self.max_retries + 1):
+            async with self._slots_for_loop():
+                if wait := self._reserve():
+                    await asyncio.sleep(wait)
+                if self._first_start is None:
+                    self._first_start = time.monotonic()
+                try:
+                    result = await make_call()
+                except Exception as e:
+                    if not _is_retryable(e) or attempt == self.max_retries:
+                        self.failures += 1
+                        get_telemetry().count("openai_failures_total", error=e.__class__.__name__)
+                        raise
+                    delay = self._backoff(attempt, e)
+                    self.retries += 1
+                    get_telemetry().count("openai_retries_total", error=e.__class__.__name__)
+                    print(f"⚠️ {description} failed ({e.__class__.__name__}), retrying in {delay:.1f}s "
+                          f"(attempt {attempt + 1}/{self.max_retries})")
+                else:
+                    if hasattr(result, "headers") and hasattr(result, "parse"):
+                        self._observe(result.headers)
+                        result = result.parse()
+                    self.completed += 1
+                    get_telemetry().count("openai_requests_total")
+                    self._last_finish = time.monotonic()
+                    return result
+            # Sleep outside the slot so other calls can use the slot meanwhile
+            await asyncio.sleep(delay)
+
+    def reset_stats(self):
+        self.completed = self.retries = self.failures = 0
+        self._first_start = self._last_finish = None
+
+    def throughput(self) -> float:
+        """Sustained completed calls per second since the first call started."""
+        if self._first_start is None or self._last_finish is None or self._last_finish <= self._first_start:
+            return 0.0
+        return self.completed / (self._last_finish - self._first_start)
+
+    def summary(self) -> str:
+        return (f"{self.completed} calls at {self.throughput():.1f}/s sustained, "
+                f"{self.retries} retries, {self.failures} failures")
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """Returns the process-wide limiter shared by uploads and session teardown."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
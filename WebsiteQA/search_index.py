@@ -0,0 +1,346 @@
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import threading
+from array import array
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from crawl_manifest import write_json_atomic
+import markdown_chunking
+
+SEARCH_INDEX_DIR = "search_indexes"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the this to was what when where "
+    "which who why will with you your".split()
+)
+MAX_SECTION_CHARS = 4000 # Longer sections are split so results point at a passage, not a whole page
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def split_sections(markdown: str) -> List[Tuple[str, str]]:
+    """Splits a Markdown page into (heading path, text) sections at its headings, as chunking does."""
+    sections = []
+    for path, text in markdown_chunking.split_sections(markdown):
+        heading = " > ".join(path)
+        while len(text) > MAX_SECTION_CHARS:
+            cut = text.rfind("\n\n", 0, MAX_SECTION_CHARS)
+            cut = cut if cut > MAX_SECTION_CHARS // 2 else MAX_SECTION_CHARS
+            sections.append((heading, text[:cut].strip()))
+            text = text[cut:].strip()
+        if text:
+            sections.append((heading, text))
+    return sections
+
+class SearchResult(NamedTuple):
+    url: str
+    heading: str
+    score: float
+    snippet: str
+
+class _Segment:
+    """One immutable, memory-mapped slice of the index.
+
+    Files: `<name>.lex.json` (term -> [offset, count]), `<name>.ids` / `<name>.tfs`
+    (parallel uint32 doc ids and float32 weighted term frequencies), `<name>.text`
+    (section texts, UTF-8) and `<name>.docs.json` ([url, heading, start, end, length] per doc).
+    """
+
+    def __init__(self, directory: str, name: str):
+        self.name = name
+        base = os.path.join(directory, name)
+        with open(f"{base}.lex.json", "r", encoding="utf-8") as f:
+            self.lexicon: Dict[str, List[int]] = json.load(f)
+        with open(f"{base}.docs.json", "r", encoding="utf-8") as f:
+            self.docs: List[list] = json.load(f)
+        self._maps = []
+        self._views = []
+        self.ids = self._map(f"{base}.ids", "I")
+        self.tfs = self._map(f"{base}.tfs", "f")
+        self.text = self._map(f"{base}.text", None)
+        self.live: List[bool] = [True] * len(self.docs)
+
+    def _map(self, path: str, typecode: Optional[str]):
+        if os.path.getsize(path) == 0:
+            return memoryview(b"")
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        self._maps.append(mapped)
+        self._views.append(view)
+        if typecode:
+            view = view.cast(typecode)
+            self._views.append(view)
+        return view
+
+    def doc_text(self, doc: int) -> str:
+        _, _, start, end, _ = self.docs[doc]
+        return bytes(self.text[start:end]).decode("utf-8")
+
+    def close(self):
+        try:
+            for view in reversed(self._views):
+                view.release()
+            for mapped in self._maps:
+                mapped.close()
+        except BufferError:
+            pass # A search still holds a slice; the mapping is freed when it is garbage collected
+
+    @staticmethod
+    def write(directory: str, name: str, sections: List[Tuple[str, str, str]], heading_boost: float) -> None:
+        """Writes (url, heading, text) sections as a new segment."""
+        postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        docs = []
+        text_parts = []
+        offset = 0
+        for doc, (url, heading, text) in enumerate(sections):
+            body = tokenize(text)
+            weights = Counter(body)
+            # Terms in the page and section headings count extra
+            for token in set(tokenize(heading)):
+                weights[token] += heading_boost
+            for token, weight in weights.items():
+                postings[token].append((doc, weight))
+            encoded = text.encode("utf-8")
+            docs.append([url, heading, offset, offset + len(encoded), len(body)])
+            text_parts.append(encoded)
+            offset += len(encoded)
+
+        ids, tfs, lexicon = array("I"), array("f"), {}
+        for term in sorted(postings):
+            lexicon[term] = [len(ids), len(postings[term])]
+            for doc, weight in postings[term]:
+                ids.append(doc)
+                tfs.append(weight)
+
+        base = os.path.join(directory, name)
+        with open(f"{base}.ids", "wb") as f:
+            ids.tofile(f)
+        with open(f"{base}.tfs", "wb") as f:
+            tfs.tofile(f)
+        with open(f"{base}.text", "wb") as f:
+            f.write(b"".join(text_parts))
+        write_json_atomic(f"{base}.docs.json", docs)
+        write_json_atomic(f"{base}.lex.json", lexicon)
+
+    @staticmethod
+    def remove_files(directory: str, name: str) -> None:
+        for suffix in (".lex.json", ".docs.json", ".ids", ".tfs", ".text"):
+            try:
+                os.remove(os.path.join(directory, name + suffix))
+            except OSError:
+                pass
+
+class SearchIndex:
+    """Local BM25 index over the scraped Markdown of one session.
+
+    The index is a set of immutable segments whose postings and texts are memory-mapped,
+    plus `meta.json`, which records for every page URL the segment holding its current
+    sections. Adding or changing a page writes its sections into the next segment and
+    repoints the URL, so earlier segments never change; removed or replaced sections are
+    skipped at query time. Segments are merged once there are more than `max_segments`
+    or a third of the indexed sections are dead.
+
+    Terms in section headings get `heading_boost` added to their term frequency. Document
+    frequencies count live sections only, so scores do not drift until the next compaction.
+    Searches and the swapping of segments (reload, compaction, clear) exclude each other,
+    so a search never reads a segment that is being unmapped.
+    """
+
+    def __init__(self, directory: str, heading_boost: float = 2.0, max_segments: int = 8,
+                 flush_sections: int = 5000, k1: float = 1.2, b: float = 0.75):
+        self.directory = directory
+        self.heading_boost = heading_boost
+        self.max_segments = max_segments
+        self.flush_sections = flush_sections
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock() # Queued updates and writes
+        self._segments_lock = threading.RLock() # Mapped segments, against searches reading them
+        self._pending: Dict[str, List[Tuple[str, str]]] = {}
+        self._removed: set = set()
+        self.segments: Dict[str, _Segment] = {}
+        self.meta = {"segments": [], "live": {}, "next_segment": 0}
+        self.meta_mtime = None
+        self._avg_length = 1.0
+        self.reload()
+
+    @classmethod
+    def for_session(cls, session_name: str, **kwargs) -> "SearchIndex":
+        return cls(os.path.join(SEARCH_INDEX_DIR, session_name), **kwargs)
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, "meta.json")
+
+    def reload(self) -> None:
+        """Re-reads meta.json (if another process committed) and maps new segments."""
+        if not os.path.exists(self._meta_path):
+            return
+        with self._segments_lock:
+            mtime = os.stat(self._meta_path).st_mtime_ns
+            if mtime == self.meta_mtime:
+                return
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            segments = {}
+            for name in meta["segments"]:
+                segments[name] = self.segments.pop(name, None) or _Segment(self.directory, name)
+            for segment in self.segments.values():
+                segment.close()
+            self.segments, self.meta, self.meta_mtime = segments, meta, mtime
+            self._refresh_liveness()
+
+    def _refresh_liveness(self):
+        live = self.meta["live"]
+        lengths = []
+        for segment in self.segments.values():
+            segment.live = [live.get(url, [None])[0] == segment.name for url, *_ in segment.docs]
+            lengths.extend(doc[4] for doc, is_live in zip(segment.docs, segment.live) if is_live)
+        self._avg_length = max(sum(lengths) / len(lengths), 1.0) if lengths else 1.0
+
+    # --- Updates ---
+
+    def add_page(self, url: str, markdown: str) -> None:
+        """Queues the page's sections, replacing any indexed version once committed."""
+        sections = split_sections(markdown)
+        with self._lock:
+            self._pending[url] = sections
+            self._removed.discard(url)
+            flush = sum(len(s) for s in self._pending.values()) >= self.flush_sections
+        if flush:
+            self.commit()
+
+    def remove_page(self, url: str) -> None:
+        with self._lock:
+            self._pending.pop(url, None)
+            self._removed.add(url)
+
+    def commit(self) -> None:
+        """Writes queued pages as a new segment and atomically publishes the new meta.json."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            removed, self._removed = self._removed, set()
+            if not pending and not removed:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            meta = {"segments": list(self.meta["segments"]), "live": dict(self.meta["live"]),
+                    "next_segment": self.meta["next_segment"]}
+            for url in removed:
+                meta["live"].pop(url, None)
+            if pending:
+                name = f"seg_{meta['next_segment']:06d}"
+                meta["next_segment"] += 1
+                sections = [(url, heading, text) for url, page in pending.items() for heading, text in page]
+                _Segment.write(self.directory, name, sections, self.heading_boost)
+                meta["segments"].append(name)
+                for url, page in pending.items():
+                    meta["live"][url] = [name, len(page)]
+            write_json_atomic(self._meta_path, meta)
+            self.meta_mtime = None
+        self.reload()
+        if self._needs_compaction():
+            self.compact()
+
+    def _needs_compaction(self) -> bool:
+        total = sum(len(segment.docs) for segment in self.segments.values())
+        live = sum(count for _, count in self.meta["live"].values())
+        return len(self.segments) > self.max_segments or (total > 0 and live < total * 2 / 3)
+
+    def compact(self) -> None:
+        """Merges every live section into one segment and deletes the old segment files."""
+        with self._lock:
+            with self._segments_lock:
+                sections = [
+                    (segment.docs[doc][0], segment.docs[doc][1], segment.doc_text(doc))
+                    for segment in self.segments.values()
+                    for doc in range(len(segment.docs)) if segment.live[doc]
+                ]
+            name = f"seg_{self.meta['next_segment']:06d}"
+            _Segment.write(self.directory, name, sections, self.heading_boost)
+            counts = Counter(url for url, _, _ in sections)
+            meta = {"segments": [name], "live": {url: [name, counts[url]] for url in self.meta["live"]},
+                    "next_segment": self.meta["next_segment"] + 1}
+            old = list(self.segments)
+            write_json_atomic(self._meta_path, meta)
+            self.meta_mtime = None
+        self.reload()
+        for old_name in old:
+            # Readers that still map the old files keep working; the data stays until they unmap
+            _Segment.remove_files(self.directory, old_name)
+        print(f"Search index compacted into {name} ({len(sections)} sections).")
+
+    def clear(self) -> None:
+        with self._lock, self._segments_lock:
+            for segment in self.segments.values():
+                segment.close()
+            self.segments = {}
+            self.meta = {"segments": [], "live": {}, "next_segment": 0}
+            self.meta_mtime = None
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    # --- Queries ---
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.meta["live"] or url in self._pending
+
+    def __len__(self) -> int:
+        return sum(count for _, count in self.meta["live"].values())
+
+    def search(self, query: str, top_k: int = 5) -> List[SearchResult]:
+        with self._segments_lock:
+            self.reload()
+            return self._search(set(tokenize(query)), top_k)
+
+    def _search(self, terms: set, top_k: int) -> List[SearchResult]:
+        total_docs = len(self)
+        if not terms or not total_docs:
+            return []
+        avg_length = self._avg_length
+
+        scores: Dict[Tuple[str, int], float] = defaultdict(float)
+        for term in terms:
+            postings = []
+            for segment in self.segments.values():
+                if term not in segment.lexicon:
+                    continue
+                offset, count = segment.lexicon[term]
+                ids = segment.ids[offset:offset + count]
+                tfs = segment.tfs[offset:offset + count]
+                postings.extend((segment, doc, tf) for doc, tf in zip(ids, tfs) if segment.live[doc])
+            if not postings:
+                continue
+            idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for segment, doc, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * segment.docs[doc][4] / avg_length)
+                scores[(segment.name, doc)] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        results = []
+        for (name, doc), score in best:
+            segment = self.segments[name]
+            url, heading = segment.docs[doc][:2]
+            results.append(SearchResult(url, heading, score, _snippet(segment.doc_text(doc), terms)))
+        return results
+
+def _snippet(text: str, terms: set, width: int = 400) -> str:
+    lowered = text.lower()
+    positions = [p for p in (lowered.find(term) for term in terms) if p >= 0]
+    start = max(0, min(positions) - width // 4) if positions else 0
+    snippet = " ".join(text[start:start + width].split())
+    return ("…" if start else "") + snippet + ("…" if start + width < len(text) else "")
+
+_indexes: Dict[str, SearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+def get_search_index(session_name: str) -> SearchIndex:
+    """Returns the process-wide index for the session, shared by the scraper and the search tool."""
+    with _indexes_lock:
+        if session_name not in _indexes:
+            _indexes[session_name] = SearchIndex.for_session(session_name)
+        return _indexes[session_name]
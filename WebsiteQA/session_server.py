@@ -0,0 +1,311 @@
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import unquote
+from agency_swarm.util.shared_state import SharedState
+from agency import WebQAAgency, ceo, answering_agent
+from browser_pool import get_browser_pool
+from telemetry import get_telemetry
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Session whose request the current thread (or task) is serving
+current_session: ContextVar[Optional[str]] = ContextVar("current_session", default=None)
+
+def _require_session() -> str:
+    if (session_name := current_session.get()) is None:
+        raise RuntimeError("No session is active; use SessionManager.session() around agency calls.")
+    return session_name
+
+class SessionSharedState(SharedState):
+    """One SharedState for all sessions that keeps a separate dict per session.
+
+    Tool classes hold a single class-level `_shared_state`, so with shared agents every
+    session's tools see this object; `data` resolves to the active session's values.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def data(self) -> dict:
+        session_name = _require_session()
+        with self._lock:
+            return self._sessions.setdefault(session_name, {"session_name": session_name})
+
+    def drop(self, session_name: str):
+        with self._lock:
+            self._sessions.pop(session_name, None)
+
+class SessionThreads(Mapping):
+    """Stands in for `agents_and_threads` on the shared SendMessage tools and resolves
+    to the threads of the active session's agency."""
+
+    def __init__(self, manager: "SessionManager"):
+        self._manager = manager
+
+    def _threads(self) -> dict:
+        return self._manager.agency(_require_session()).agents_and_threads
+
+    def __getitem__(self, key):
+        return self._threads()[key]
+
+    def __iter__(self):
+        return iter(self._threads())
+
+    def __len__(self):
+        return len(self._threads())
+
+class SessionAgency(WebQAAgency):
+    """WebQAAgency whose agents, SendMessage tools and OpenAI assistants are set up by the
+    first instance only; later instances just load their session's threads."""
+
+    _agents_ready = False
+    _agents_lock = threading.Lock()
+
+    def __init__(self, session_name, manager: "SessionManager", **kwargs):
+        self._manager = manager
+        if SessionAgency._agents_ready:
+            super().__init__(session_name, **kwargs)
+        else:
+            with SessionAgency._agents_lock:
+                super().__init__(session_name, **kwargs)
+                SessionAgency._agents_ready = True
+        self.shared_state = manager.shared_state
+
+    def _create_special_tools(self):
+        if SessionAgency._agents_ready:
+            return
+        super()._create_special_tools()
+        threads = SessionThreads(self._manager)
+        for agent in self.agents:
+            for tool in agent.tools:
+                if hasattr(tool, "_agents_and_threads"):
+                    tool._agents_and_threads = threads
+
+    def _init_agents(self):
+        if SessionAgency._agents_ready:
+            return
+        for agent in self.agents:
+            agent.shared_state = self._manager.shared_state
+        super()._init_agents()
+
+class _Session:
+    def __init__(self, agency: SessionAgency):
+        self.agency = agency
+        self.lock = threading.Lock() # agency_swarm threads handle one run at a time
+        self.last_used = time.monotonic()
+        self.in_flight = 0
+
+class SessionManager:
+    """Serves many sessions from one process with shared agents.
+
+    A session's `SessionAgency` is created on first use and kept in memory while it is hot.
+    Beyond `max_sessions`, the least recently used idle session is evicted, and sessions idle
+    for more than `idle_ttl` seconds are evicted by `evict_idle`. Thread IDs are persisted in
+    the thread store, so an evicted session resumes its conversation when it is used again;
+    its in-memory shared state (e.g. scraped files not yet uploaded) is dropped.
+    """
+
+    def __init__(self, max_sessions: int = 256, idle_ttl: float = 30 * 60, answer_cache: bool = True,
+                 answer_similarity_threshold: Optional[float] = None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.answer_cache = answer_cache
+        self.answer_similarity_threshold = answer_similarity_threshold
+        self.shared_state = SessionSharedState()
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._creating: Dict[str, threading.Lock] = {}
+        self.created = 0
+        self.evicted = 0
+
+    def agency(self, session_name: str) -> SessionAgency:
+        """The agency of a session that is serving a request (and so cannot be evicted)."""
+        with self._lock:
+            return self._sessions[session_name].agency
+
+    def _acquire(self, session_name: str) -> _Session:
+        """Returns the session, creating it if needed, with its in-flight count incremented."""
+        with self._lock:
+            if session := self._sessions.get(session_name):
+                self._sessions.move_to_end(session_name)
+                session.in_flight += 1
+                return session
+            creating = self._creating.setdefault(session_name, threading.Lock())
+        # Creating an agency calls the OpenAI API for new sessions; only block callers of the same session
+        with creating:
+            with self._lock:
+                if session := self._sessions.get(session_name):
+                    session.in_flight += 1
+                    return session
+            token = current_session.set(session_name)
+            try:
+                agency = SessionAgency(session_name, self, answer_cache=self.answer_cache,
+                                       answer_similarity_threshold=self.answer_similarity_threshold)
+            finally:
+                current_session.reset(token)
+            session = _Session(agency)
+            with self._lock:
+                session.in_flight += 1
+                self._sessions[session_name] = session
+                self._creating.pop(session_name, None)
+                self.created += 1
+                self._evict_lru()
+        get_telemetry().count("sessions_created_total")
+        return session
+
+    def _evict(self, session_name: str):
+        # Called with self._lock held
+        del self._sessions[session_name]
+        self.shared_state.drop(session_name)
+        self.evicted += 1
+        get_telemetry().count("sessions_evicted_total")
+
+    def _evict_lru(self):
+        for session_name in [name for name, session in self._sessions.items() if not session.in_flight]:
+            if len(self._sessions) <= self.max_sessions:
+                break
+            self._evict(session_name)
+
+    def evict_idle(self) -> int:
+        """Evicts every session idle for longer than `idle_ttl`. Returns how many were evicted."""
+        cutoff = time.monotonic() - self.idle_ttl
+        with self._lock:
+            idle = [name for name, session in self._sessions.items() if not session.in_flight and session.last_used < cutoff]
+            for session_name in idle:
+                self._evict(session_name)
+        return len(idle)
+
+    def evict(self, session_name: str) -> bool:
+        with self._lock:
+            session = self._sessions.get(session_name)
+            if session is None or session.in_flight:
+                return False
+            self._evict(session_name)
+            return True
+
+    @contextmanager
+    def session(self, session_name: str):
+        """Activates the session for the calling thread and yields its agency; requests of one
+        session are serialized, different sessions run concurrently."""
+        session = self._acquire(session_name)
+        token = current_session.set(session_name)
+        try:
+            with session.lock:
+                yield session.agency
+        finally:
+            current_session.reset(token)
+            with self._lock:
+                session.in_flight -= 1
+                session.last_used = time.monotonic()
+
+    def ask(self, session_name: str, message: str, recipient: Optional[str] = None) -> str:
+        recipients = {agent.name: agent for agent in (ceo, answering_agent)}
+        if recipient is not None and recipient not in recipients:
+            raise ValueError(f"Unknown recipient {recipient}. Valid recipients are: {list(recipients)}")
+        with self.session(session_name) as agency:
+            with get_telemetry().span("session_request"):
+                return agency.get_completion(message, recipient_agent=recipients.get(recipient))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"active_sessions": len(self._sessions), "in_flight": sum(s.in_flight for s in self._sessions.values()),
+                    "created": self.created, "evicted": self.evicted, "max_sessions": self.max_sessions,
+                    "idle_ttl": self.idle_ttl}
+
+    def start_janitor(self, interval: float = 60.0) -> threading.Thread:
+        def sweep():
+            while True:
+                time.sleep(interval)
+                if evicted := self.evict_idle():
+                    print(f"Evicted {evicted} idle sessions ({len(self._sessions)} active).")
+        thread = threading.Thread(target=sweep, name="session-janitor", daemon=True)
+        thread.start()
+        return thread
+
+def make_handler(manager: SessionManager):
+    class Handler(BaseHTTPRequestHandler):
+        """POST /sessions/<name>/messages {"message": ..., "recipient": "AnsweringAgent"}
+        DELETE /sessions/<name> (evicts from memory; use thread_functions to tear down)
+        GET /sessions"""
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status: int, body: dict):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _session_path(self):
+            parts = [unquote(part) for part in self.path.split("?", 1)[0].strip("/").split("/")]
+            return parts if len(parts) >= 2 and parts[0] == "sessions" and parts[1] else None
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/sessions":
+                self._reply(200, manager.stats())
+            else:
+                self._reply(404, {"error": "Not found"})
+
+        def do_POST(self):
+            parts = self._session_path()
+            if not parts or parts[2:] != ["messages"]:
+                self._reply(404, {"error": "Not found"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                if not isinstance(body.get("message"), str) or not body["message"]:
+                    raise ValueError("'message' must be a non-empty string")
+                response = manager.ask(parts[1], body["message"], body.get("recipient"))
+            except ValueError as e:
+                self._reply(400, {"error": str(e)})
+            except Exception as e:
+                print(f"❌ Request for session {parts[1]} failed: {e}")
+                self._reply(500, {"error": str(e)})
+            else:
+                self._reply(200, {"session_name": parts[1], "response": response})
+
+        def do_DELETE(self):
+            parts = self._session_path()
+            if not parts or parts[2:]:
+                self._reply(404, {"error": "Not found"})
+                return
+            self._reply(200, {"session_name": parts[1], "evicted": manager.evict(parts[1])})
+
+    return Handler
+
+def serve(host: str = "127.0.0.1", port: int = 8000, **manager_kwargs):
+    manager = SessionManager(**manager_kwargs)
+    manager.start_janitor()
+    get_browser_pool().warm_up()
+    server = ThreadingHTTPServer((host, port), make_handler(manager))
+    server.daemon_threads = True
+    print(f"✅ Serving WebsiteQA sessions at http://{host}:{port}/sessions")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve many WebsiteQA sessions from one process with shared agents.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-sessions", type=int, default=256, help="Sessions kept in memory (LRU beyond that)")
+    parser.add_argument("--idle-ttl", type=float, default=1800.0, help="Seconds before an idle session is evicted")
+    parser.add_argument("--answer-similarity-threshold", type=float, default=None)
+    args = parser.parse_args()
+    serve(args.host, args.port, max_sessions=args.max_sessions, idle_ttl=args.idle_ttl,
+          answer_similarity_threshold=args.answer_similarity_threshold)
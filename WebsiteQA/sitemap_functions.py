@@ -0,0 +1,146 @@
+import asyncio
+import zlib
+from typing import AsyncIterator, Callable, NamedTuple, Optional
+from xml.etree.ElementTree import XMLPullParser
+import httpx
+from telemetry import get_telemetry
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+class SitemapEntry(NamedTuple):
+    loc: str
+    lastmod: Optional[str] = None
+
+def _local_name(tag: str) -> str:
+    # Sitemaps are usually namespaced ({http://www.sitemaps.org/schemas/sitemap/0.9}loc) but not always
+    return tag.rsplit("}", 1)[-1]
+
+def _child_text(elem, name: str) -> Optional[str]:
+    for child in elem:
+        if _local_name(child.tag) == name:
+            return child.text.strip() if child.text else None
+    return None
+
+async def _parse_sitemap(client: httpx.AsyncClient, sitemap_url: str, on_sitemap, on_url):
+    """Streams one sitemap document and parses it incrementally.
+
+    Child sitemaps of a <sitemapindex> are passed to `on_sitemap`, page entries of a
+    <urlset> to `on_url`. Elements are cleared as soon as they are handled so memory
+    stays flat regardless of the document size.
+    """
+    parser = XMLPullParser(events=("start", "end"))
+    root = None
+    decompressor = None
+    first_chunk = True
+    telemetry = get_telemetry()
+
+    async with client.stream("GET", sitemap_url) as response:
+        response.raise_for_status()
+        # aiter_bytes() already undoes Content-Encoding; .xml.gz files are served as plain gzip bodies
+        async for chunk in response.aiter_bytes():
+            telemetry.count("sitemap_bytes_total", len(chunk))
+            if first_chunk:
+                first_chunk = False
+                if chunk.startswith(GZIP_MAGIC):
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            if decompressor:
+                chunk = decompressor.decompress(chunk)
+            parser.feed(chunk)
+
+            for event, elem in parser.read_events():
+                if event == "start":
+                    if root is None:
+                        root = elem
+                    continue
+                name = _local_name(elem.tag)
+                if name == "sitemap":
+                    if loc := _child_text(elem, "loc"):
+                        await on_sitemap(loc)
+                elif name == "url":
+                    if loc := _child_text(elem, "loc"):
+                        await on_url(SitemapEntry(loc, _child_text(elem, "lastmod")))
+                else:
+                    continue
+                # Drop handled entries so the tree never grows past one <url> element
+                elem.clear()
+                root.clear()
+
+    if decompressor:
+        parser.feed(decompressor.flush())
+    parser.close()
+
+async def iter_sitemap_entries(
+    website_url: str,
+    client: Optional[httpx.AsyncClient] = None,
+    max_concurrent: int = 8,
+    queue_size: int = 1000,
+    on_error: Optional[Callable[[str, Exception], None]] = None,
+) -> AsyncIterator[SitemapEntry]:
+    """Yields every page entry reachable from the website's /sitemap.xml.
+
+    Sitemap indexes are followed recursively and child sitemaps (plain or .xml.gz) are
+    fetched concurrently over a single pooled client. Entries are yielded as soon as
+    they are parsed; the bounded output queue pauses the fetchers when the consumer
+    falls behind. Sitemaps that fail to load are reported to `on_error` and skipped.
+    """
+    root_sitemap = f"{website_url.rstrip('/')}/sitemap.xml"
+    own_client = client is None
+    if own_client:
+        client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(max_connections=max_concurrent, max_keepalive_connections=max_concurrent),
+        )
+
+    pending_sitemaps: asyncio.Queue = asyncio.Queue()
+    entries: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    seen_sitemaps = {root_sitemap}
+    seen_urls = set()
+    done = object()
+
+    async def on_sitemap(loc: str):
+        if loc not in seen_sitemaps:
+            seen_sitemaps.add(loc)
+            pending_sitemaps.put_nowait(loc)
+
+    async def on_url(entry: SitemapEntry):
+        if entry.loc not in seen_urls:
+            seen_urls.add(entry.loc)
+            await entries.put(entry)
+
+    async def worker():
+        while True:
+            sitemap_url = await pending_sitemaps.get()
+            try:
+                with get_telemetry().span("sitemap_fetch"):
+                    await _parse_sitemap(client, sitemap_url, on_sitemap, on_url)
+            except Exception as e: # One bad sitemap (e.g. a malformed child <loc>) must not stop the worker
+                print(f"Error fetching sitemap {sitemap_url}: {e}")
+                if on_error:
+                    on_error(sitemap_url, e)
+            finally:
+                pending_sitemaps.task_done()
+
+    async def supervisor():
+        # All sitemaps (including children discovered along the way) have been processed
+        await pending_sitemaps.join()
+        await entries.put(done)
+
+    pending_sitemaps.put_nowait(root_sitemap)
+    tasks = [asyncio.create_task(worker()) for _ in range(max_concurrent)]
+    tasks.append(asyncio.create_task(supervisor()))
+
+    try:
+        while (entry := await entries.get()) is not done:
+            yield entry
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if own_client:
+            await client.aclose()
+
+async def iter_sitemap_urls(website_url: str, **kwargs) -> AsyncIterator[str]:
+    """Yields only the page URLs from `iter_sitemap_entries`."""
+    async for entry in iter_sitemap_entries(website_url, **kwargs):
+        yield entry.loc
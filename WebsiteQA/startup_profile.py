@@ -0,0 +1,89 @@
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import List, NamedTuple
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# What a worker, the agency and a CLI teardown import on startup, by the names `python agency.py`
+# imports them under: from the WebsiteQA directory, with the agent packages on the path.
+DEFAULT_TARGETS = [
+    "agency",
+    "ScraperAgent.tools.WebsiteScraperTool",
+    "UploaderAgent.tools.UploadToOpenAITool",
+    "thread_functions",
+]
+
+class ModuleTime(NamedTuple):
+    name: str
+    self_ms: float
+    cumulative_ms: float
+    depth: int
+
+class ImportProfile(NamedTuple):
+    target: str
+    total_ms: float
+    modules: List[ModuleTime]
+
+def _parse_importtime(stderr: str) -> List[ModuleTime]:
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2 # One space, then two per level of nesting
+        modules.append(ModuleTime(name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000, depth))
+    return modules
+
+def profile_import(target: str) -> ImportProfile:
+    """Imports `target` in a fresh interpreter with `-X importtime` and returns per-module times."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [PACKAGE_DIR, env.get("PYTHONPATH")]))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=PACKAGE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {target} failed:\n{result.stderr.splitlines()[-1] if result.stderr else ''}")
+    modules = _parse_importtime(result.stderr)
+    return ImportProfile(target, sum(m.cumulative_ms for m in modules if m.depth == 0), modules)
+
+def report(profile: ImportProfile, top: int) -> str:
+    packages = defaultdict(float)
+    for module in profile.modules:
+        packages[module.name.split(".", 1)[0]] += module.self_ms
+    lines = [f"\n=== {profile.target}: {profile.total_ms:.0f}ms ({len(profile.modules)} modules) ==="]
+    lines.append(f"{'package':<40}{'self ms':>10}")
+    for name, self_ms in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        lines.append(f"{name:<40}{self_ms:>10.1f}")
+    lines.append(f"\n{'module':<60}{'self ms':>10}{'cumulative ms':>15}")
+    for module in sorted(profile.modules, key=lambda m: -m.self_ms)[:top]:
+        lines.append(f"{module.name:<60}{module.self_ms:>10.1f}{module.cumulative_ms:>15.1f}")
+    return "\n".join(lines)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Report import time per module for WebsiteQA entry points.")
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS, help="Modules to import (default: the entry points)")
+    parser.add_argument("--top", type=int, default=15, help="Number of packages and modules to list")
+    parser.add_argument("--budget-ms", type=float, help="Exit with status 1 if any target takes longer to import")
+    parser.add_argument("--repeat", type=int, default=3, help="Imports per target; the fastest is reported")
+    args = parser.parse_args(argv)
+
+    over_budget = []
+    for target in args.targets:
+        profile = min((profile_import(target) for _ in range(args.repeat)), key=lambda p: p.total_ms)
+        print(report(profile, args.top))
+        if args.budget_ms is not None and profile.total_ms > args.budget_ms:
+            over_budget.append(f"{target} ({profile.total_ms:.0f}ms)")
+
+    if over_budget:
+        print(f"\n❌ Over the {args.budget_ms:.0f}ms startup budget: {', '.join(over_budget)}")
+        return 1
+    if args.budget_ms is not None:
+        print(f"\n✅ All targets import within {args.budget_ms:.0f}ms.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+import bisect
+import functools
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from crawl_manifest import write_json_atomic
+
+# Upper bounds (seconds) shared by every latency histogram
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+class Histogram:
+    """Cumulative-bucket histogram, as exposed by Prometheus."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimates a quantile by linear interpolation inside the bucket that holds it."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+class Telemetry:
+    """Process-wide counters, latency histograms and recent spans for the ingest and teardown paths.
+
+    `span(name, **labels)` times a block and records it in the `<name>_seconds` histogram
+    (and `<name>_errors_total` when the block raises). Exporters registered with
+    `add_exporter` receive the registry on `export()`; the tools export at the end of
+    each run.
+    """
+
+    def __init__(self, max_spans: int = 1000):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self.spans = deque(maxlen=max_spans)
+        self.exporters: List["Exporter"] = []
+        self.started_at = time.time()
+
+    def count(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        start = time.perf_counter()
+        started_at = time.time()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = e.__class__.__name__
+            self.count(f"{name}_errors_total", **labels)
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.observe(f"{name}_seconds", duration, **labels)
+            with self._lock:
+                self.spans.append({"name": name, "start": started_at, "duration": round(duration, 6),
+                                   "labels": dict(labels), "error": error})
+
+    def add_exporter(self, exporter: "Exporter"):
+        self.exporters.append(exporter)
+
+    def export(self):
+        for exporter in self.exporters:
+            try:
+                exporter.export(self)
+            except Exception as e:
+                print(f"⚠️ Telemetry export via {exporter.__class__.__name__} failed: {e}")
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.spans.clear()
+            self.started_at = time.time()
+
+    def snapshot(self) -> dict:
+        """JSON-serializable view: counters, histogram summaries (count, sum, p50/p95/p99) and recent spans."""
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "exported_at": time.time(),
+                "counters": {name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                             for name, series in self.counters.items()},
+                "histograms": {name: [{"labels": dict(key), "count": h.count, "sum": round(h.sum, 6),
+                                       "p50": round(h.quantile(0.5), 6), "p95": round(h.quantile(0.95), 6),
+                                       "p99": round(h.quantile(0.99), 6)} for key, h in series.items()]
+                               for name, series in self.histograms.items()},
+                "spans": list(self.spans),
+            }
+
+    def prometheus_text(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                metric = f"websiteqa_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                lines += [f"{metric}{_format_labels(key)} {value}" for key, value in series.items()]
+            for name, series in sorted(self.histograms.items()):
+                metric = f"websiteqa_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{_format_labels(key + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{metric}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{metric}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in key)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + "}"
+
+class Exporter(ABC):
+    """Receives the registry on every `Telemetry.export()`."""
+
+    @abstractmethod
+    def export(self, telemetry: Telemetry) -> None:
+        ...
+
+class JsonFileExporter(Exporter):
+    """Writes `Telemetry.snapshot()` to a JSON file on every export."""
+
+    def __init__(self, path: str = "telemetry.json"):
+        self.path = path
+
+    def export(self, telemetry: Telemetry) -> None:
+        write_json_atomic(self.path, telemetry.snapshot())
+
+class PrometheusExporter(Exporter):
+    """Serves the live registry at http://<host>:<port>/metrics for Prometheus to scrape.
+    Scrapes read the registry directly, so `export()` has nothing to do.
+
+    Binds to loopback by default; pass another `host` (e.g. "0.0.0.0") to let remote scrapers in."""
+
+    def __init__(self, telemetry: Telemetry, port: int = 9464, host: str = "127.0.0.1"):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer # Only processes that serve metrics need it
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="prometheus-exporter", daemon=True).start()
+        print(f"✅ Prometheus metrics at http://{host}:{self._server.server_address[1]}/metrics")
+
+    def export(self, telemetry: Telemetry) -> None:
+        pass
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+def traced(name: str, **labels):
+    """Decorates an async function so each call is recorded as a `name` span."""
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with get_telemetry().span(name, **labels):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def exports_telemetry(method):
+    """Decorates an async tool `run` so the registry is exported once the run finishes, even on failure."""
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            get_telemetry().export()
+    return wrapper
+
+_telemetry: Optional[Telemetry] = None
+_telemetry_lock = threading.Lock()
+
+def get_telemetry() -> Telemetry:
+    """Returns the process-wide registry.
+
+    On first use, `WEBSITEQA_TELEMETRY_JSON` (a file path) and `WEBSITEQA_METRICS_PORT`
+    register the JSON and Prometheus exporters. `WEBSITEQA_METRICS_HOST` sets the address
+    the metrics server binds to (127.0.0.1 by default).
+    """
+    global _telemetry
+    with _telemetry_lock:
+        if _telemetry is None:
+            _telemetry = Telemetry()
+            if path := os.getenv("WEBSITEQA_TELEMETRY_JSON"):
+                _telemetry.add_exporter(JsonFileExporter(path))
+            if port := os.getenv("WEBSITEQA_METRICS_PORT"):
+                _telemetry.add_exporter(PrometheusExporter(_telemetry, int(port), os.getenv("WEBSITEQA_METRICS_HOST", "127.0.0.1")))
+        return _telemetry
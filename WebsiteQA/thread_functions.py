@@ -1,98 +1,264 @@
+import argparse
+import asyncio
 import json
 import os
-import asyncio
-from openai import AsyncOpenAI # Changed from OpenAI
 from dotenv import load_dotenv
+from rate_limiter import get_rate_limiter # Shared with UploadToOpenAITool so teardown and uploads respect the same limits
+from upload_cache import get_upload_cache
+from thread_store import SqliteThreadStore, get_thread_store
+from crawl_manifest import write_json_atomic
+from search_index import get_search_index
+from answer_cache import get_answer_cache
+from telemetry import get_telemetry, traced
+from openai_client import get_client # Built on first use, so the CLI starts without it
+# `openai` is imported inside the functions that catch its errors, once a client has loaded it anyway
 
 load_dotenv()
 
 def load_threads(session_name):
-    if os.path.exists(f"{session_name}_threads.json"):
-        with open(f"{session_name}_threads.json", "r") as file:
-            threads = json.load(file)
-    else:
-        threads = []
-    return threads
+    # Threads live in the configured thread store (SQLite by default), see thread_store.py
+    return get_thread_store().load(session_name)
 
 def save_threads(new_threads, session_name):
-    # Save threads to a file or database using the session_name
-    with open(f"{session_name}_threads.json", "w") as file:
-        json.dump(new_threads, file)
+    get_thread_store().save(session_name, new_threads)
 
 
-# Use Async Client
-client = AsyncOpenAI()
+TEARDOWN_DIR = "teardown_progress" # Resumable record of each session's teardown
+TEARDOWN_CONCURRENCY = 16 # Deletions in flight per session; the shared rate limiter caps the total
+LIST_PAGE_SIZE = 100 # Largest page vector_stores.files.list accepts
+MAX_LIST_PASSES = 3 # Files are deleted while listing, so the store is re-listed until it is empty
+
+# Helper async function to delete a file object once it is no longer attached anywhere
+async def _delete_file_object(async_client, file_id, session_name=None):
+    import openai
+    # Files are shared through the upload cache; keep the object while another session uses it
+    if not get_upload_cache().release(file_id, session_name or "default"):
+        get_telemetry().count("file_objects_total", result="kept")
+        return
+    # Attempt to delete the file object itself
+    # This might fail if the file is associated with other resources.
+    try:
+        await get_rate_limiter().call(lambda: async_client.files.with_raw_response.delete(file_id), f"Deleting file {file_id}")
+        get_telemetry().count("file_objects_total", result="deleted")
+    except openai.NotFoundError:
+        pass # Already gone
+    except Exception as e:
+        # Log inability to delete file object, might be intentional if shared
+        print(f"Could not delete file object {file_id} (may still be associated elsewhere): {e}")
 
 # Helper async function to delete a single file from vector store and then the file object
-async def delete_file(async_client, file_id, vector_store_id):
+async def delete_file(async_client, file_id, vector_store_id, session_name=None):
+    # Retries are handled by the rate limiter (with jitter) rather than by the client
+    async_client = async_client.with_options(max_retries=0)
     try:
         # Remove file association from the vector store
-        await async_client.vector_stores.files.delete(vector_store_id=vector_store_id, file_id=file_id)
-        print(f"Removed file {file_id} from vector store {vector_store_id}.")
-        # Attempt to delete the file object itself
-        # This might fail if the file is associated with other resources.
-        try:
-            await async_client.files.delete(file_id)
-            print(f"Deleted file object {file_id}.")
-        except Exception as e:
-            # Log inability to delete file object, might be intentional if shared
-            print(f"Could not delete file object {file_id} (may still be associated elsewhere): {e}")
+        await get_rate_limiter().call(
+            lambda: async_client.vector_stores.files.with_raw_response.delete(vector_store_id=vector_store_id, file_id=file_id),
+            f"Removing file {file_id}",
+        )
+        get_telemetry().count("vector_store_files_removed_total")
+        await _delete_file_object(async_client, file_id, session_name)
     except Exception as e:
         print(f"Error processing file {file_id} for vector store {vector_store_id}: {e}")
         raise # Re-raise exception to be caught by asyncio.gather
 
 # Helper async function to delete a single thread
 async def delete_thread(async_client, thread_id):
+    import openai
     try:
-        await async_client.beta.threads.delete(thread_id)
-        print(f"Deleted thread {thread_id}.")
+        await get_rate_limiter().call(
+            lambda: async_client.with_options(max_retries=0).beta.threads.with_raw_response.delete(thread_id),
+            f"Deleting thread {thread_id}",
+        )
+        get_telemetry().count("threads_deleted_total")
+    except openai.NotFoundError:
+        print(f"Thread {thread_id} was already deleted.")
     except Exception as e:
         print(f"Error deleting thread {thread_id}: {e}")
         raise # Re-raise exception to be caught by asyncio.gather
 
-async def deactivate_threads(session_name): # Changed to async def
-    threads = load_threads(session_name)
-    main_thread_id = threads.get("main_thread")
-    
+async def _run_bounded(items, handler, max_concurrent):
+    """Runs `handler` over a (sync or async) iterable with at most `max_concurrent` calls in flight.
+    Items are pulled lazily, so a listing of tens of thousands of files is never held at once.
+    Returns the number of failed items."""
+    queue = asyncio.Queue(maxsize=max_concurrent * 2)
+    failures = 0
+
+    async def worker():
+        nonlocal failures
+        while (item := await queue.get()) is not None:
+            try:
+                await handler(item)
+            except Exception:
+                failures += 1 # Errors are printed by the handlers
+
+    workers = [asyncio.create_task(worker()) for _ in range(max_concurrent)]
     try:
-        # Check if main thread has a vector store
-        if main_thread_id:
-            main_thread = await client.beta.threads.retrieve(main_thread_id) # await added
-            if main_thread.tool_resources and main_thread.tool_resources.file_search:
-                 vs_ids = main_thread.tool_resources.file_search.vector_store_ids # Plural suggests list
-            else:
-                 vs_ids = []
-
-            if vs_ids:
-                # Assuming we process the first vector store ID if multiple exist
-                vector_store_id = vs_ids[0]
-                print(f"Processing vector store {vector_store_id} for main thread {main_thread_id}.")
-
-                # Retrieve all files in the vector store asynchronously
-                try:
-                    vector_store_files = await client.vector_stores.files.list(vector_store_id=vector_store_id) # await added, used vector_store_id
-
-                    # Create tasks to delete each file asynchronously
-                    delete_file_tasks = []
-                    for file_obj in vector_store_files.data:
-                        delete_file_tasks.append(delete_file(client, file_obj.id, vector_store_id))
-
-                    # Run file deletion tasks concurrently
-                    if delete_file_tasks:
-                        print(f"Attempting to remove/delete {len(delete_file_tasks)} files from vector store {vector_store_id}...")
-                        file_results = await asyncio.gather(*delete_file_tasks, return_exceptions=True)
-                        # Process results/errors if needed (errors printed in helper)
-                        successful_files = sum(1 for r in file_results if not isinstance(r, Exception))
-                        print(f"Successfully processed {successful_files} files.")
-
-                    # Delete the vector store itself asynchronously
-                    await client.vector_stores.delete(vector_store_id=vector_store_id) # await added, used vector_store_id
-                    print(f"Deleted vector store {vector_store_id} for main thread {main_thread_id}.")
-                except Exception as e:
-                    print(f"Error processing vector store {vector_store_id}: {e}")
-            else:
-                print(f"No vector stores found for main thread {main_thread_id}.")
-        
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                await queue.put(item)
+        else:
+            for item in items:
+                await queue.put(item)
+    finally:
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    return failures
+
+async def _list_store_file_ids(vector_store_id, skip):
+    """Yields the IDs of every file in the vector store, page by page, except those in `skip`."""
+    async_client = get_client().with_options(max_retries=0)
+    after = None
+    while True:
+        params = {"vector_store_id": vector_store_id, "limit": LIST_PAGE_SIZE}
+        if after:
+            params["after"] = after
+        page = await get_rate_limiter().call(
+            lambda: async_client.vector_stores.files.with_raw_response.list(**params), "Listing vector store files"
+        )
+        for file_obj in page.data:
+            if file_obj.id not in skip:
+                yield file_obj.id
+        if not page.data or not page.has_next_page():
+            return
+        after = page.data[-1].id
+
+def _progress_path(session_name):
+    return os.path.join(TEARDOWN_DIR, f"{session_name}.json")
+
+def _load_progress(session_name):
+    path = _progress_path(session_name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def _save_progress(session_name, progress):
+    write_json_atomic(_progress_path(session_name), progress)
+
+async def _main_thread_vector_stores(main_thread_id):
+    import openai
+    if not main_thread_id:
+        return []
+    try:
+        main_thread = await get_rate_limiter().call(lambda: get_client().beta.threads.retrieve(main_thread_id), "Retrieving main thread")
+    except openai.NotFoundError:
+        print(f"Main thread {main_thread_id} no longer exists.")
+        return []
+    if main_thread.tool_resources and main_thread.tool_resources.file_search:
+        return list(main_thread.tool_resources.file_search.vector_store_ids or [])
+    return []
+
+async def _empty_vector_store(session_name, vector_store_id, progress, max_concurrent):
+    """Removes every file from the vector store and deletes file objects no other session uses.
+    Returns True once the store is empty."""
+    import openai
+    detached = set(progress["detached"])
+    failed = set()
+    async_client = get_client().with_options(max_retries=0)
+
+    def checkpoint():
+        progress["detached"] = sorted(detached)
+        _save_progress(session_name, progress)
+
+    async def remove(file_id):
+        try:
+            await get_rate_limiter().call(
+                lambda: async_client.vector_stores.files.with_raw_response.delete(vector_store_id=vector_store_id, file_id=file_id),
+                f"Removing file {file_id}",
+            )
+        except openai.NotFoundError:
+            pass # Removed by an earlier, interrupted run
+        except Exception as e:
+            failed.add(file_id)
+            get_telemetry().count("teardown_failures_total")
+            print(f"Error removing file {file_id} from vector store {vector_store_id}: {e}")
+            raise
+        # Record the file before deleting its object, so a crash in between is finished on resume
+        detached.add(file_id)
+        await _delete_file_object(async_client, file_id, session_name)
+        detached.discard(file_id)
+        progress["files_removed"] += 1
+        get_telemetry().count("vector_store_files_removed_total")
+        if progress["files_removed"] % 200 == 0:
+            checkpoint()
+            print(f"Removed {progress['files_removed']} files from vector store {vector_store_id} so far...")
+
+    try:
+        for list_pass in range(MAX_LIST_PASSES):
+            listed = 0
+
+            async def counted():
+                nonlocal listed
+                async for file_id in _list_store_file_ids(vector_store_id, failed):
+                    listed += 1
+                    yield file_id
+
+            try:
+                await _run_bounded(counted(), remove, max_concurrent)
+            except openai.NotFoundError:
+                return True # The vector store itself is already gone
+            if listed == 0:
+                break
+    finally:
+        # Also runs on cancellation, so files detached mid-flight are finished on resume
+        checkpoint()
+    print(f"Removed {progress['files_removed']} files from vector store {vector_store_id} "
+          f"({len(failed)} could not be removed).")
+    return not failed
+
+@traced("teardown")
+async def deactivate_threads(session_name, max_concurrent=TEARDOWN_CONCURRENCY): # Changed to async def
+    """Deletes the session's vector stores, their files and all its threads.
+
+    Vector store files are listed page by page and deleted with at most `max_concurrent`
+    requests in flight, through the shared rate limiter (which retries 429s with backoff).
+    Progress is recorded in `teardown_progress/{session_name}.json`; calling this again
+    after an interruption resumes where it stopped. Returns True when teardown completed.
+    """
+    import openai
+    progress = _load_progress(session_name)
+    if progress is None:
+        threads = load_threads(session_name)
+        if not threads:
+            print(f"No stored threads found for session {session_name}.")
+            return True
+        # Snapshot the threads so a resumed run does not depend on the thread store entry
+        progress = {"threads": threads, "vector_store_ids": None, "detached": [], "files_removed": 0, "threads_deleted": []}
+    else:
+        print(f"Resuming teardown of session {session_name} ({progress['files_removed']} files already removed).")
+    threads = progress["threads"]
+    get_answer_cache().bump_version(session_name) # Nothing cached for this session is valid once teardown starts
+
+    try:
+        if progress["vector_store_ids"] is None:
+            progress["vector_store_ids"] = await _main_thread_vector_stores(threads.get("main_thread"))
+            _save_progress(session_name, progress)
+            if not progress["vector_store_ids"]:
+                print(f"No vector stores found for main thread {threads.get('main_thread')}.")
+
+        # Finish file objects whose vector store association was removed before an interruption
+        if progress["detached"]:
+            await _run_bounded(list(progress["detached"]), lambda file_id: _delete_file_object(get_client(), file_id, session_name), max_concurrent)
+            progress["detached"] = []
+            _save_progress(session_name, progress)
+
+        for vector_store_id in list(progress["vector_store_ids"]):
+            print(f"Processing vector store {vector_store_id} for session {session_name}.")
+            if not await _empty_vector_store(session_name, vector_store_id, progress, max_concurrent):
+                continue # Keep the store recorded so the next run retries it
+            try:
+                await get_rate_limiter().call(
+                    lambda: get_client().vector_stores.delete(vector_store_id=vector_store_id), "Deleting vector store"
+                )
+                print(f"Deleted vector store {vector_store_id}.")
+            except openai.NotFoundError:
+                pass
+            progress["vector_store_ids"].remove(vector_store_id)
+            _save_progress(session_name, progress)
+        get_upload_cache().save()
+
         # Delete all threads
         thread_ids = []
         for value in threads.values():
@@ -100,36 +266,85 @@ async def deactivate_threads(session_name): # Changed to async def
                 thread_ids.extend(value.values())
             else:
                 thread_ids.append(value)
-        # Create tasks to delete each thread asynchronously
-        delete_thread_tasks = []
-        for thread_id in thread_ids:
-            delete_thread_tasks.append(delete_thread(client, thread_id))
-
-        # Run thread deletion tasks concurrently
-        if delete_thread_tasks:
-            print(f"Attempting to delete {len(delete_thread_tasks)} threads...")
-            thread_results = await asyncio.gather(*delete_thread_tasks, return_exceptions=True)
-            # Process results/errors if needed (errors printed in helper)
-            successful_threads = sum(1 for r in thread_results if not isinstance(r, Exception))
-            print(f"Successfully deleted {successful_threads} threads.")
-        
-        # Delete the threads JSON file
-        threads_file = f"{session_name}_threads.json"
-        if os.path.exists(threads_file):
-            os.remove(threads_file)
-            print(f"Deleted threads file {threads_file}.")
-        else:
-            print(f"Threads file {threads_file} not found.")
-        
-        print("All threads and associated files deleted successfully.")
-    except FileNotFoundError as e:
-        print(f"Error: {e}")
-            
+        deleted = set(progress["threads_deleted"])
+        pending = [thread_id for thread_id in dict.fromkeys(thread_ids) if thread_id not in deleted]
+
+        async def remove_thread(thread_id):
+            await delete_thread(get_client(), thread_id)
+            progress["threads_deleted"].append(thread_id)
+
+        if pending:
+            print(f"Attempting to delete {len(pending)} threads...")
+            failed_threads = await _run_bounded(pending, remove_thread, max_concurrent)
+            print(f"Successfully deleted {len(pending) - failed_threads} threads.")
+        _save_progress(session_name, progress)
     except Exception as e:
         print(f"Error processing threads: {e}")
-    
+        _save_progress(session_name, progress)
+        return False
+
+    if progress["vector_store_ids"] or len(set(progress["threads_deleted"])) < len(set(thread_ids)):
+        print(f"⚠️ Teardown of session {session_name} is incomplete; run it again to resume.")
+        return False
+
+    # Forget the session in the thread store and drop its local search index
+    if get_thread_store().delete(session_name):
+        print(f"Deleted stored threads for session {session_name}.")
+    get_search_index(session_name).clear()
+    os.remove(_progress_path(session_name))
+    print("All threads and associated files deleted successfully.")
+    return True
+
 # Modified main execution block to run the async deactivate function
 async def deactivate(session_name_to_delete):
     print(f"--- Running Deactivation for Session: {session_name_to_delete} ---")
     await deactivate_threads(session_name_to_delete)
-    print(f"--- Deactivation Complete for Session: {session_name_to_delete} ---")
\ No newline at end of file
+    get_telemetry().export()
+    print(f"--- Deactivation Complete for Session: {session_name_to_delete} ---")
+
+async def sweep_expired_sessions(max_age_hours=24.0, max_parallel_sessions=4, max_concurrent=TEARDOWN_CONCURRENCY):
+    """Janitor: tears down every session idle for more than `max_age_hours`, plus any
+    interrupted teardowns, `max_parallel_sessions` at a time. Returns {session_name: completed}."""
+    store = get_thread_store()
+    if isinstance(store, SqliteThreadStore):
+        store.migrate_json_files() # Legacy sessions would otherwise be invisible to the sweep
+    sessions = list(store.expired_sessions(max_age_hours * 3600))
+    if os.path.isdir(TEARDOWN_DIR):
+        sessions += [name[:-len(".json")] for name in sorted(os.listdir(TEARDOWN_DIR)) if name.endswith(".json")]
+    sessions = list(dict.fromkeys(sessions))
+    if not sessions:
+        print("Janitor: no expired sessions.")
+        return {}
+
+    print(f"Janitor: tearing down {len(sessions)} sessions...")
+    semaphore = asyncio.Semaphore(max_parallel_sessions)
+
+    async def sweep(session_name):
+        async with semaphore:
+            try:
+                return await deactivate_threads(session_name, max_concurrent=max_concurrent)
+            except Exception as e:
+                print(f"Janitor: teardown of session {session_name} failed: {e}")
+                return False
+
+    results = dict(zip(sessions, await asyncio.gather(*[sweep(name) for name in sessions])))
+    for completed in results.values():
+        get_telemetry().count("teardown_sessions_total", result="completed" if completed else "incomplete")
+    get_telemetry().export()
+    print(f"Janitor: {sum(results.values())}/{len(sessions)} sessions torn down. API calls: {get_rate_limiter().summary()}")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tear down WebsiteQA sessions.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    deactivate_parser = subcommands.add_parser("deactivate", help="Tear down one session")
+    deactivate_parser.add_argument("session_name")
+    janitor_parser = subcommands.add_parser("janitor", help="Tear down all expired sessions")
+    janitor_parser.add_argument("--max-age-hours", type=float, default=24.0)
+    janitor_parser.add_argument("--parallel-sessions", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "deactivate":
+        asyncio.run(deactivate(args.session_name))
+    else:
+        asyncio.run(sweep_expired_sessions(args.max_age_hours, args.parallel_sessions))
@@ -0,0 +1,229 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from crawl_manifest import write_json_atomic
+
+THREADS_DB_PATH = "threads.db"
+JSON_SUFFIX = "_threads.json"
+
+class ThreadStore(ABC):
+    """Backend for the per-session thread IDs Agency Swarm persists through `threads_callbacks`.
+
+    `load` returns the session's threads dict, or an empty list when the session has none
+    (what `load_threads` has always returned, and what Agency Swarm treats as "start fresh").
+    """
+
+    @abstractmethod
+    def load(self, session_name: str):
+        ...
+
+    @abstractmethod
+    def save(self, session_name: str, threads) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, session_name: str) -> bool:
+        """Forgets the session. Returns True if it existed."""
+
+    @abstractmethod
+    def sessions(self) -> List[str]:
+        ...
+
+    @abstractmethod
+    def expired_sessions(self, max_age: float) -> List[str]:
+        """Sessions whose threads have not been saved for more than `max_age` seconds."""
+
+    def main_thread(self, session_name: str) -> Optional[str]:
+        threads = self.load(session_name)
+        return threads.get("main_thread") if isinstance(threads, dict) else None
+
+class JsonThreadStore(ThreadStore):
+    """One `{session_name}_threads.json` file per session in `directory`, written atomically."""
+
+    def __init__(self, directory: str = "."):
+        self.directory = directory
+
+    def _path(self, session_name: str) -> str:
+        return os.path.join(self.directory, f"{session_name}{JSON_SUFFIX}")
+
+    def load(self, session_name: str):
+        path = self._path(session_name)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def save(self, session_name: str, threads) -> None:
+        write_json_atomic(self._path(session_name), threads)
+
+    def delete(self, session_name: str) -> bool:
+        path = self._path(session_name)
+        if not os.path.exists(path):
+            return False
+        os.remove(path)
+        return True
+
+    def sessions(self) -> List[str]:
+        pattern = os.path.join(glob.escape(self.directory), f"*{JSON_SUFFIX}")
+        return sorted(os.path.basename(p)[:-len(JSON_SUFFIX)] for p in glob.glob(pattern))
+
+    def expired_sessions(self, max_age: float) -> List[str]:
+        cutoff = time.time() - max_age
+        return [name for name in self.sessions() if os.path.getmtime(self._path(name)) < cutoff]
+
+class SqliteThreadStore(ThreadStore):
+    """Thread IDs for every session in one SQLite database.
+
+    - Each save is a single-row upsert in its own transaction, so a crash never leaves a
+      half-written session and concurrent Gradio workers cannot interleave writes.
+    - WAL mode lets readers in other processes proceed while one process writes.
+    - Lookups are served from an in-memory cache, which is dropped whenever SQLite's
+      `data_version` shows another connection has committed.
+    - Legacy `{session_name}_threads.json` files in `json_directory` are imported the
+      first time their session is looked up (or all at once with `migrate_json_files`)
+      and renamed to `*.migrated`.
+    """
+
+    def __init__(self, path: str = THREADS_DB_PATH, json_directory: str = ".", busy_timeout: float = 30.0):
+        self.path = path
+        self.json_directory = json_directory
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Optional[str]] = {}
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS threads ("
+                " session_name TEXT PRIMARY KEY,"
+                " threads TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS threads_updated_at ON threads (updated_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.data_version = None
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _check_cache(self, conn: sqlite3.Connection):
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._local.data_version:
+            if self._local.data_version is not None:
+                with self._lock:
+                    self._cache.clear()
+            self._local.data_version = version
+
+    def load(self, session_name: str):
+        conn = self._connection()
+        self._check_cache(conn)
+        with self._lock:
+            if session_name in self._cache:
+                cached = self._cache[session_name]
+                return json.loads(cached) if cached is not None else []
+
+        row = conn.execute("SELECT threads FROM threads WHERE session_name = ?", (session_name,)).fetchone()
+        if row is None and self._migrate(session_name):
+            row = conn.execute("SELECT threads FROM threads WHERE session_name = ?", (session_name,)).fetchone()
+        data = row[0] if row else None
+        with self._lock:
+            self._cache[session_name] = data
+        return json.loads(data) if data is not None else []
+
+    def save(self, session_name: str, threads) -> None:
+        data = json.dumps(threads)
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO threads (session_name, threads, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_name) DO UPDATE SET threads = excluded.threads, updated_at = excluded.updated_at",
+                (session_name, data, time.time()),
+            )
+        with self._lock:
+            self._cache[session_name] = data
+
+    def delete(self, session_name: str) -> bool:
+        with self._transaction() as conn:
+            deleted = conn.execute("DELETE FROM threads WHERE session_name = ?", (session_name,)).rowcount
+        with self._lock:
+            self._cache.pop(session_name, None)
+        return bool(deleted)
+
+    def sessions(self) -> List[str]:
+        rows = self._connection().execute("SELECT session_name FROM threads ORDER BY session_name").fetchall()
+        return [row[0] for row in rows]
+
+    def expired_sessions(self, max_age: float) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT session_name FROM threads WHERE updated_at < ? ORDER BY updated_at", (time.time() - max_age,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def _migrate(self, session_name: str) -> bool:
+        path = os.path.join(self.json_directory, f"{session_name}{JSON_SUFFIX}")
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, "r") as f:
+                threads = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not migrate threads file {path}: {e}")
+            return False
+        with self._transaction() as conn:
+            # Never overwrite a session another worker already saved or migrated
+            conn.execute(
+                "INSERT OR IGNORE INTO threads (session_name, threads, updated_at) VALUES (?, ?, ?)",
+                (session_name, json.dumps(threads), os.path.getmtime(path)),
+            )
+        try:
+            os.replace(path, f"{path}.migrated")
+        except OSError:
+            pass
+        print(f"✅ Migrated threads file {path} into {self.path}")
+        return True
+
+    def migrate_json_files(self) -> int:
+        """Imports every legacy threads JSON file in `json_directory`. Returns how many were imported."""
+        return sum(self._migrate(name) for name in JsonThreadStore(self.json_directory).sessions())
+
+_store: Optional[ThreadStore] = None
+_store_lock = threading.Lock()
+
+def get_thread_store() -> ThreadStore:
+    """Returns the process-wide thread store.
+
+    `WEBSITEQA_THREAD_STORE` selects the backend ("sqlite", the default, or "json") and
+    `WEBSITEQA_THREADS_DB` the SQLite database path.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            if os.getenv("WEBSITEQA_THREAD_STORE", "sqlite").lower() == "json":
+                _store = JsonThreadStore()
+            else:
+                _store = SqliteThreadStore(os.getenv("WEBSITEQA_THREADS_DB", THREADS_DB_PATH))
+        return _store
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional, Set
+from crawl_manifest import write_json_atomic
+from rate_limiter import get_rate_limiter
+
+try:
+    import fcntl
+except ImportError: # Windows: saves stay atomic, but concurrent processes are not merged
+    fcntl = None
+
+UPLOAD_CACHE_PATH = "upload_cache.json"
+
+def sha256_bytes(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+class UploadCache:
+    """Content-addressed map from the sha256 of an uploaded file to its OpenAI `file_id`.
+
+    Identical files (re-runs that lost their manifest, other sessions ingesting the same
+    site) are attached to the vector store by file id instead of being uploaded again. The
+    digest covers the whole file, including the page's URL header, so a file is only reused
+    for the page it was uploaded for; identical pages under different URLs are caught by the
+    scraper's near-duplicate check instead.
+    Each entry records which sessions reference the file, so tearing down one session
+    does not delete a file another session still uses.
+
+    Entries are kept in LRU order, expire after `ttl` seconds and are capped at
+    `max_entries`. Before a cached id is reused it is checked against the API at most
+    once per `verify_interval`, since files can be deleted outside this cache.
+
+    Several processes (sessions) may share the cache file. Saving re-reads it under a file
+    lock and merges this process's changes into what the others saved, and `release`
+    re-reads it first if it changed, so a file another session has recorded is never
+    dropped from the cache or deleted.
+    """
+
+    def __init__(self, path: str = UPLOAD_CACHE_PATH, max_entries: int = 100_000,
+                 ttl: float = 30 * 24 * 3600, verify_interval: float = 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.verify_interval = verify_interval
+        self._lock = threading.Lock()
+        self._disk_stamp = None
+        self._dirty: Set[str] = set() # Digests stored or used since the last save
+        self._released: Dict[str, Set[str]] = {} # file_id -> sessions released since the last save
+        self._removed: Set[str] = set() # File ids deleted or released by their last session since the last save
+        self.entries: "OrderedDict[str, dict]" = self._read()
+        self.hits = 0
+        self.misses = 0
+
+    def _read(self) -> "OrderedDict[str, dict]":
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = OrderedDict(json.load(f))
+                stat = os.fstat(f.fileno())
+        except FileNotFoundError:
+            return OrderedDict()
+        self._disk_stamp = (stat.st_mtime_ns, stat.st_size)
+        return entries
+
+    def _disk_changed(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return self._disk_stamp is not None
+        return (stat.st_mtime_ns, stat.st_size) != self._disk_stamp
+
+    @contextmanager
+    def _file_lock(self):
+        """Excludes other processes reading and rewriting the cache file meanwhile."""
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _merge(self, disk: "OrderedDict[str, dict]") -> "OrderedDict[str, dict]":
+        """Applies this process's unsaved changes to `disk`, the cache as last saved by any process."""
+        merged = {}
+        for digest, entry in disk.items():
+            released = self._released.get(entry["file_id"], ())
+            sessions = [session for session in entry["sessions"] if session not in released]
+            if entry["file_id"] not in self._removed and sessions:
+                merged[digest] = dict(entry, sessions=sessions)
+        for digest in self._dirty:
+            local, saved = self.entries.get(digest), merged.get(digest)
+            if local is None:
+                continue
+            if saved is None or (saved["file_id"] != local["file_id"] and saved["last_used"] <= local["last_used"]):
+                merged[digest] = dict(local, sessions=list(local["sessions"]))
+            elif saved["file_id"] == local["file_id"]:
+                saved["sessions"] = list(dict.fromkeys(saved["sessions"] + local["sessions"]))
+                saved["last_used"] = max(saved["last_used"], local["last_used"])
+                saved["verified_at"] = max(saved.get("verified_at", 0), local.get("verified_at", 0))
+        return OrderedDict(sorted(merged.items(), key=lambda item: item[1]["last_used"]))
+
+    def _refresh(self):
+        """Picks up what other processes saved, keeping this process's unsaved changes."""
+        if self._disk_changed():
+            self.entries = self._merge(self._read())
+
+    def save(self) -> None:
+        with self._file_lock():
+            with self._lock:
+                self.entries = self._merge(self._read())
+                self._evict()
+                snapshot = dict(self.entries)
+                self._dirty.clear()
+                self._released.clear()
+                self._removed.clear()
+            write_json_atomic(self.path, snapshot)
+            stat = os.stat(self.path)
+            self._disk_stamp = (stat.st_mtime_ns, stat.st_size)
+
+    def _evict(self):
+        now = time.time()
+        for digest in [d for d, entry in self.entries.items() if now - entry["last_used"] > self.ttl]:
+            del self.entries[digest]
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def lookup(self, client, digest: str, session_name: str) -> Optional[str]:
+        """Returns a still-existing file id for `digest`, registering `session_name` as a user."""
+        with self._lock:
+            entry = self.entries.get(digest)
+            if entry is None or time.time() - entry["last_used"] > self.ttl:
+                self.misses += 1
+                return None
+            needs_verify = time.time() - entry.get("verified_at", 0) > self.verify_interval
+
+        if needs_verify:
+            import openai # Loaded by `client` already
+            try:
+                await get_rate_limiter().call(
+                    lambda: client.with_options(max_retries=0).files.with_raw_response.retrieve(entry["file_id"]),
+                    f"Verifying cached file {entry['file_id']}",
+                )
+            except openai.NotFoundError:
+                with self._lock:
+                    self.entries.pop(digest, None)
+                    self._removed.add(entry["file_id"])
+                    self.misses += 1
+                return None
+
+        with self._lock:
+            if self.entries.get(digest, {}).get("file_id") != entry["file_id"]:
+                self.misses += 1 # Replaced by another process's entry meanwhile
+                return None
+            entry = self.entries[digest]
+            now = time.time()
+            entry.update(last_used=now)
+            if needs_verify:
+                entry["verified_at"] = now
+            if session_name not in entry["sessions"]:
+                entry["sessions"].append(session_name)
+            self.entries.move_to_end(digest)
+            self._dirty.add(digest)
+            self.hits += 1
+            return entry["file_id"]
+
+    def store(self, digest: str, file_id: str, session_name: str) -> None:
+        with self._lock:
+            now = time.time()
+            self.entries[digest] = {"file_id": file_id, "sessions": [session_name], "last_used": now, "verified_at": now}
+            self.entries.move_to_end(digest)
+            self._dirty.add(digest)
+
+    def release(self, file_id: str, session_name: str) -> bool:
+        """Drops `session_name` from the file's users. Returns True if no other session still uses it."""
+        with self._file_lock(), self._lock:
+            self._refresh()
+            for digest, entry in self.entries.items():
+                if entry["file_id"] == file_id:
+                    if session_name in entry["sessions"]:
+                        entry["sessions"].remove(session_name)
+                        self._released.setdefault(file_id, set()).add(session_name)
+                    if entry["sessions"]:
+                        return False
+                    del self.entries[digest]
+                    self._removed.add(file_id)
+                    return True
+        return True
+
+    def summary(self) -> str:
+        return f"upload cache: {self.hits} hits, {self.misses} misses, {len(self.entries)} entries"
+
+_cache: Optional[UploadCache] = None
+_cache_lock = threading.Lock()
+
+def get_upload_cache() -> UploadCache:
+    """Returns the process-wide upload cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = UploadCache()
+        return _cache
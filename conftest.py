@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import modules the way `python agency.py` does: from the WebsiteQA directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "WebsiteQA"))
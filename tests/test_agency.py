@@ -0,0 +1,49 @@
+import os
+from types import SimpleNamespace
+import pytest
+from answer_cache import AnswerCache
+from thread_store import SqliteThreadStore
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "WebsiteQA")
+
+class FakeThread:
+    """The main thread before its first completion: no id until `init_thread` creates it."""
+
+    def __init__(self):
+        self.id = None
+        self.agent = None
+        self.created = []
+        self.client = SimpleNamespace(beta=SimpleNamespace(threads=SimpleNamespace(
+            messages=SimpleNamespace(create=lambda **message: self.created.append(message)))))
+
+    def init_thread(self):
+        self.id = self.id or "thread_1"
+
+@pytest.fixture
+def agency_module(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", os.environ.get("OPENAI_API_KEY", "sk-test"))
+    monkeypatch.chdir(PACKAGE_DIR) # Tools load relative to the working directory, as with `python agency.py`
+    import agency
+    return agency
+
+@pytest.fixture
+def fresh_agency(agency_module, tmp_path, monkeypatch):
+    store = SqliteThreadStore(str(tmp_path / "threads.db"))
+    monkeypatch.setattr(agency_module, "get_thread_store", lambda: store)
+    # Skip Agency.__init__, which creates the assistants through the API
+    agency = object.__new__(agency_module.WebQAAgency)
+    agency.session_name = "s1"
+    agency.answer_cache = AnswerCache(versions_path=str(tmp_path / "versions.json"))
+    agency.answer_similarity_threshold = None
+    agency._turn_context = ""
+    agency.main_thread = FakeThread()
+    return SimpleNamespace(agency=agency, store=store)
+
+def test_cached_answer_on_a_fresh_agency_creates_the_main_thread(agency_module, fresh_agency):
+    agency = fresh_agency.agency
+    agency.answer_cache.put("s1", agency.answer_cache.version("s1"), "What is SSO?", "Single sign-on.")
+
+    assert agency.get_completion("What is SSO?", recipient_agent=agency_module.answering_agent) == "Single sign-on."
+    assert [message["thread_id"] for message in agency.main_thread.created] == ["thread_1", "thread_1"]
+    assert fresh_agency.store.main_thread("s1") == "thread_1" # Resumed sessions find the turn
+    assert agency._turn_context # Follow-up questions are cached after this turn
@@ -0,0 +1,60 @@
+import time
+from answer_cache import AnswerCache, normalize_question, turn_context
+
+def cache_at(tmp_path, **kwargs) -> AnswerCache:
+    return AnswerCache(versions_path=str(tmp_path / "versions.json"), **kwargs)
+
+def test_normalize_question():
+    assert normalize_question("  What does SSO cost?! ") == "what does sso cost"
+
+def test_answers_are_keyed_by_previous_turn(tmp_path):
+    cache = cache_at(tmp_path)
+    pricing = turn_context("What does the Pro plan cost?", "$20 per month.")
+    support = turn_context("Which support channels are there?", "Email and chat.")
+    cache.put("s1", 0, "And for teams?", "$15 per seat.", context=pricing)
+    assert cache.get("s1", "and for teams", context=pricing) == "$15 per seat."
+    assert cache.get("s1", "And for teams?", context=support) is None
+    assert cache.get("s1", "And for teams?") is None # First question of a thread
+    assert cache.get("s2", "And for teams?", context=pricing) is None
+    assert (cache.hits, cache.misses) == (1, 3)
+
+def test_bumped_version_invalidates_answers(tmp_path):
+    cache = cache_at(tmp_path)
+    version = cache.version("s1")
+    cache.put("s1", version, "What is SSO?", "Single sign-on.")
+    cache.bump_version("s1")
+    assert cache.get("s1", "What is SSO?") is None
+    # An answer computed before the bump is not stored
+    cache.put("s1", version, "What is SSO?", "Single sign-on.")
+    assert cache.get("s1", "What is SSO?") is None
+    # Other processes see the bump through the versions file
+    assert cache_at(tmp_path).version("s1") == version + 1
+
+def test_expiry_and_lru_eviction(tmp_path):
+    cache = cache_at(tmp_path, max_entries=2, ttl=60)
+    for n in range(3):
+        cache.put("s1", 0, f"question {n}", f"answer {n}")
+    assert cache.get("s1", "question 0") is None and cache.evictions == 1
+    assert cache.get("s1", "question 2") == "answer 2"
+    entry = cache._entries[("s1", 0, "", "question 2")]
+    cache._entries[("s1", 0, "", "question 2")] = entry._replace(created_at=time.time() - 120)
+    assert cache.get("s1", "question 2") is None
+
+def test_similar_questions_match_within_the_same_context(tmp_path):
+    cache = cache_at(tmp_path)
+    vectors = {"how much is sso": [1.0, 0.0], "what does sso cost": [0.96, 0.28], "who founded the company": [0.0, 1.0]}
+    embedded = []
+
+    def embed(text):
+        embedded.append(text)
+        return vectors[text]
+
+    cache._embed = embed
+    assert cache.get("s1", "How much is SSO?", similarity_threshold=0.9) is None
+    cache.put("s1", 0, "How much is SSO?", "$5 per user.", similarity_threshold=0.9)
+    assert embedded == ["how much is sso"] # The miss's embedding is reused by put
+    assert cache.get("s1", "What does SSO cost?", similarity_threshold=0.9) == "$5 per user."
+    assert cache.get("s1", "Who founded the company?", similarity_threshold=0.9) is None
+    context = turn_context("Hi", "Hello!")
+    assert cache.get("s1", "What does SSO cost?", similarity_threshold=0.9, context=context) is None
+    assert cache.semantic_hits == 1
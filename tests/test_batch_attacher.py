@@ -0,0 +1,134 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+import batch_attacher
+from batch_attacher import BatchAttacher
+from rate_limiter import RateLimiter
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10))
+
+class ServerError(Exception):
+    status_code = 503
+
+class FakeClient:
+    """file_batches of one vector store. Each batch is `in_progress` for `polls` retrievals; files in `failing`
+    fail to attach, and `errors` are raised by the next create calls."""
+
+    def __init__(self, polls=0, failing=(), errors=()):
+        self.polls = polls
+        self.failing = set(failing)
+        self.errors = list(errors)
+        self.batches = {}
+        self.retrievals = 0
+        file_batches = SimpleNamespace(create=self._create, retrieve=self._retrieve)
+        self.vector_stores = SimpleNamespace(file_batches=SimpleNamespace(with_raw_response=file_batches))
+
+    def with_options(self, **options):
+        return self
+
+    def _batch(self, batch_id):
+        file_ids, polls_left = self.batches[batch_id]
+        failed = len(self.failing.intersection(file_ids))
+        status = "in_progress" if polls_left else "failed" if failed else "completed"
+        counts = SimpleNamespace(completed=0 if polls_left else len(file_ids) - failed, failed=0 if polls_left else failed,
+                                 cancelled=0)
+        return SimpleNamespace(id=batch_id, status=status, file_counts=counts)
+
+    async def _create(self, vector_store_id, file_ids):
+        if self.errors:
+            raise self.errors.pop(0)
+        batch_id = f"batch_{len(self.batches) + 1}"
+        self.batches[batch_id] = (file_ids, self.polls)
+        return self._batch(batch_id)
+
+    async def _retrieve(self, batch_id, vector_store_id):
+        self.retrievals += 1
+        file_ids, polls_left = self.batches[batch_id]
+        self.batches[batch_id] = (file_ids, polls_left - 1)
+        return self._batch(batch_id)
+
+    def attached(self):
+        return [file_ids for file_ids, _ in self.batches.values()]
+
+@pytest.fixture
+def use_client(monkeypatch):
+    limiter = RateLimiter(requests_per_second=1000, base_delay=0.01)
+    monkeypatch.setattr(batch_attacher, "get_rate_limiter", lambda: limiter)
+
+    def use(client):
+        monkeypatch.setattr(batch_attacher, "get_client", lambda: client)
+        return client
+    return use
+
+def test_batches_are_created_at_batch_size_and_on_close(use_client):
+    client = use_client(FakeClient())
+
+    async def scenario():
+        attacher = BatchAttacher("vs_1", batch_size=2, linger=60)
+        attacher.add_many([f"file-{n}" for n in range(5)])
+        await asyncio.sleep(0.01)
+        assert client.attached() == [["file-0", "file-1"], ["file-2", "file-3"]] # Before the uploads finish
+        return await attacher.close()
+
+    assert run(scenario()) == 5
+    assert client.attached()[-1] == ["file-4"]
+
+def test_partial_batch_is_created_after_linger(use_client):
+    client = use_client(FakeClient())
+
+    async def scenario():
+        attacher = BatchAttacher("vs_1", linger=0.05)
+        attacher.add("file-0")
+        await asyncio.sleep(0.2)
+        assert client.attached() == [["file-0"]]
+        return await attacher.close()
+
+    assert run(scenario()) == 1 and len(client.batches) == 1
+
+def test_files_are_attached_once(use_client):
+    client = use_client(FakeClient())
+
+    async def scenario():
+        attacher = BatchAttacher("vs_1", batch_size=2, linger=60)
+        attacher.add_many(["file-0", "file-1", "file-0"]) # Identical pages share a file ID
+        attacher.add_many(["file-1", "file-2"])
+        return await attacher.close()
+
+    assert run(scenario()) == 3
+    assert client.attached() == [["file-0", "file-1"], ["file-2"]]
+
+def test_batches_are_polled_until_done(use_client):
+    client = use_client(FakeClient(polls=2))
+
+    async def scenario():
+        attacher = BatchAttacher("vs_1", poll_interval=0.01)
+        attacher.add_many(["file-0", "file-1"])
+        return await attacher.close()
+
+    assert run(scenario()) == 2 and client.retrievals == 2
+
+def test_transient_errors_are_retried(use_client):
+    client = use_client(FakeClient(errors=[ServerError("unavailable")]))
+
+    async def scenario():
+        attacher = BatchAttacher("vs_1")
+        attacher.add("file-0")
+        return await attacher.close()
+
+    assert run(scenario()) == 1 and client.attached() == [["file-0"]]
+
+def test_failed_files_and_batches_are_reported(use_client):
+    use_client(FakeClient(failing=["file-1"]))
+
+    async def attach(file_ids, batch_size=500):
+        attacher = BatchAttacher("vs_1", batch_size=batch_size)
+        attacher.add_many(file_ids)
+        return await attacher.close()
+
+    with pytest.raises(RuntimeError, match=r"Attachment failed for 1 file\(s\)"):
+        run(attach(["file-0", "file-1"]))
+
+    use_client(FakeClient(errors=[ValueError("invalid file id")]))
+    with pytest.raises(RuntimeError, match="1 of 2 file batches could not be attached: invalid file id"):
+        run(attach(["file-0", "file-1"], batch_size=1))
@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+from browser_pool import BrowserPool
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10))
+
+class FakeCrawler:
+    def __init__(self):
+        self.started = self.closed = False
+        self.crawls = []
+        self.killed = []
+        self.crawler_strategy = SimpleNamespace(kill_session=self._kill_session)
+
+    async def _kill_session(self, session_id):
+        self.killed.append(session_id)
+
+    async def start(self):
+        self.started = True
+
+    async def close(self):
+        self.closed = True
+
+    async def arun(self, url, config, session_id):
+        self.crawls.append((url, session_id))
+        if "broken" in url:
+            raise RuntimeError("page crashed")
+        return SimpleNamespace(url=url, success=True)
+
+@pytest.fixture
+def pool():
+    crawlers = []
+
+    def factory():
+        crawlers.append(FakeCrawler())
+        return crawlers[-1]
+
+    pool = BrowserPool(max_browsers=1, pages_per_browser=2, max_uses=3, crawler_factory=factory)
+    pool.crawlers = crawlers
+    yield pool
+    pool.close()
+
+def test_browser_and_page_are_reused_across_runs(pool):
+    # Each tool call runs on its own event loop; the pool's browser outlives them
+    assert run(pool.crawl("https://example.com/a", None)).url == "https://example.com/a"
+    run(pool.crawl("https://example.com/b", None))
+    [crawler] = pool.crawlers
+    assert crawler.started and crawler.crawls == [("https://example.com/a", "pool_1_1"), ("https://example.com/b", "pool_1_1")]
+    assert pool.stats() == {"browsers": 1, "in_flight": 0, "uses": [2]}
+
+def test_failed_crawl_releases_its_page_without_reusing_it(pool):
+    with pytest.raises(RuntimeError, match="page crashed"):
+        run(pool.crawl("https://example.com/broken", None))
+    run(pool.crawl("https://example.com/a", None))
+    [crawler] = pool.crawlers
+    assert crawler.killed == ["pool_1_1"]
+    assert crawler.crawls[-1] == ("https://example.com/a", "pool_1_2")
+    assert pool.stats()["in_flight"] == 0
+
+def test_browser_is_recycled_after_max_uses(pool):
+    async def crawl_all(urls):
+        return await asyncio.gather(*(pool.crawl(url, None) for url in urls))
+
+    run(crawl_all([f"https://example.com/{n}" for n in range(4)]))
+    first, second = pool.crawlers
+    assert first.closed and len(first.crawls) == 3
+    assert not second.closed and len(second.crawls) == 1
+
+def test_close_shuts_down_every_browser(pool):
+    run(pool.crawl("https://example.com/a", None))
+    thread = pool._thread
+    pool.close()
+    assert all(crawler.closed for crawler in pool.crawlers)
+    assert pool.stats()["browsers"] == 0 and not thread.is_alive()
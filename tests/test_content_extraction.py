@@ -0,0 +1,74 @@
+from lxml import html as lxml_html
+from content_extraction import BoilerplateTemplates, block_hash, extract_main_content
+
+PARAGRAPHS = [
+    "Invoices are sent on the first day of each month, and they can be paid by card, transfer or direct debit.",
+    "Failed payments are retried three times over a week, after which the workspace is paused until it is paid.",
+    "Refunds for annual plans are prorated, and they are issued to the original payment method within ten days.",
+]
+ARTICLE = "".join(f"<p>{text}</p>" for text in PARAGRAPHS)
+HELPFUL = '<p class="feedback">Was this page helpful? Let us know on the forum.</p>'
+
+def page(content: str, title: str = "Billing | Docs") -> str:
+    return f"""<html><head><title>{title}</title><script>track()</script></head><body>
+<header><a href="/">Docs home</a></header>
+<nav><a href="/start">Getting started</a> <a href="/billing">Billing</a></nav>
+<div class="sidebar"><a href="/api">API reference</a> <a href="/faq">FAQ</a></div>
+<div class="layout">
+  <div class="toc"><a href="#invoices">Invoices</a> <a href="#refunds">Refunds</a></div>
+  {content}
+  <div class="share"><a href="https://x.com/share">Share on X</a></div>
+  <div class="pagination"><a href="/plans">Previous: Plans</a> <a href="/taxes">Next: Taxes</a></div>
+</div>
+<footer>Copyright 2026 Example Inc. All rights reserved.</footer>
+</body></html>"""
+
+def test_main_element_is_preferred():
+    result, _, _ = extract_main_content(page(f"<main><h1>Billing</h1>{ARTICLE}</main><div><p>Try the new dashboard today, "
+                                             "it has many more charts, graphs and tables than before.</p></div>"))
+    assert result.startswith("<main>") and all(text in result for text in PARAGRAPHS)
+    assert "dashboard" not in result
+
+def test_best_scoring_container_is_selected_without_main():
+    result, _, _ = extract_main_content(page(f'<div class="post-body"><h1>Billing</h1>{ARTICLE}</div>'))
+    assert "<h1>Billing</h1>" in result and all(text in result for text in PARAGRAPHS)
+
+def test_site_chrome_is_removed():
+    result, _, _ = extract_main_content(page(f"<div><h2>Payments</h2>{ARTICLE}</div>"))
+    assert all(text in result for text in PARAGRAPHS)
+    for chrome in ("track()", "Docs home", "Getting started", "API reference", "#refunds", "Share on X", "Next: Taxes",
+                   "Copyright"):
+        assert chrome not in result
+    assert result.startswith("<h1>Billing | Docs</h1>") # The <title> stands in for the missing heading
+
+def test_unparseable_html_is_returned_unchanged():
+    assert extract_main_content("") == ("", [], 0)
+
+def test_learned_templates_strip_repeated_blocks(tmp_path):
+    templates = BoilerplateTemplates(str(tmp_path / "templates.json"), min_pages=3, min_fraction=0.5)
+    for n in range(3):
+        _, hashes, removed = extract_main_content(page(f"<main><h1>Page {n}</h1>{ARTICLE}{HELPFUL}</main>"))
+        assert removed == 0
+        templates.observe(hashes)
+    helpful = block_hash(lxml_html.fragment_fromstring(HELPFUL))
+    assert helpful in templates.snapshot()
+    # Every page repeated the article too; headings are never learned, so the new page keeps its own
+    result, _, removed = extract_main_content(page(f"<main><h1>Taxes</h1>{HELPFUL}<p>Sales tax is added at checkout "
+                                                   "for customers in states that require it.</p></main>"),
+                                              templates.snapshot())
+    assert removed == 1 and "Was this page helpful" not in result
+    assert "<h1>Taxes</h1>" in result and "Sales tax" in result
+
+    # Saved templates are stripped from the first page of the next run
+    templates.save()
+    reloaded = BoilerplateTemplates(str(tmp_path / "templates.json"))
+    assert reloaded.snapshot() == templates.snapshot()
+
+def test_blocks_seen_on_few_pages_are_not_templates(tmp_path):
+    templates = BoilerplateTemplates(str(tmp_path / "templates.json"), min_pages=2, min_fraction=0.5)
+    templates.observe([1, 2])
+    templates.observe([1])
+    templates.observe([3])
+    templates.observe([4])
+    templates.observe([2])
+    assert templates.templates == {1} # Block 2 reached two pages, but not half of them
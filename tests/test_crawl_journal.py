@@ -0,0 +1,73 @@
+import json
+import os
+from crawl_journal import CrawlJournal
+from crawl_manifest import CrawlManifest, content_hash
+
+def page_file(tmp_path, name: str) -> str:
+    path = tmp_path / name
+    path.write_text(f"# {name}\n")
+    return str(path)
+
+def test_for_site_path():
+    journal = CrawlJournal.for_site("https://docs.example.com:8080/start", "s1", directory="journals")
+    assert journal.path == os.path.join("journals", "s1_docs.example.com_8080.jsonl")
+
+def test_replay_keeps_latest_state_and_skips_torn_line(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = CrawlJournal(path)
+    journal.pending("https://example.com/a", "2024-01-01")
+    journal.done("https://example.com/a", page_file(tmp_path, "a.md"), content_hash("a"), '"e1"')
+    journal.pending("https://example.com/b")
+    journal.failed("https://example.com/b", "timeout")
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"url": "https://example.com/c", "sta') # Crashed mid-write
+
+    resumed = CrawlJournal(path)
+    assert resumed.counts() == {"done": 1, "failed": 1}
+    assert resumed.entries["https://example.com/a"]["lastmod"] == "2024-01-01" # Merged from the pending record
+    assert resumed.state("https://example.com/c") is None
+
+def test_finished_urls_need_their_file_or_upload(tmp_path):
+    journal = CrawlJournal(str(tmp_path / "journal.jsonl"))
+    journal.done("https://example.com/kept", page_file(tmp_path, "kept.md"), content_hash("kept"))
+    journal.done("https://example.com/lost", str(tmp_path / "lost.md"), content_hash("lost"))
+    journal.done("https://example.com/unchanged")
+    journal.done("https://example.com/up", page_file(tmp_path, "up.md"), content_hash("up"))
+    journal.uploaded("https://example.com/up", "file-1")
+    journal.failed("https://example.com/broken", "500")
+    assert journal.finished_urls() == {"https://example.com/kept", "https://example.com/unchanged", "https://example.com/up"}
+
+def test_restore_stages_finished_pages(tmp_path):
+    journal = CrawlJournal(str(tmp_path / "journal.jsonl"))
+    kept, up, committed = (page_file(tmp_path, name) for name in ("kept.md", "up.md", "committed.md"))
+    journal.pending("https://example.com/kept", "2024-01-01")
+    journal.done("https://example.com/kept", kept, content_hash("kept"), '"e1"')
+    journal.done("https://example.com/up", up, content_hash("up"))
+    journal.uploaded("https://example.com/up", "file-1")
+    journal.done("https://example.com/committed", committed, content_hash("committed"))
+    journal.uploaded("https://example.com/committed", "file-2")
+
+    manifest = CrawlManifest(str(tmp_path / "manifest.json"))
+    manifest.pages["https://example.com/committed"] = {"file_id": "file-2", "content_hash": content_hash("committed")}
+    files, uploaded = journal.restore(manifest)
+    assert files == [kept]
+    assert uploaded == {up: "file-1"}
+    assert manifest.pending_by_path() == {kept: "https://example.com/kept", up: "https://example.com/up"}
+    pending = manifest.pages["https://example.com/kept"]["pending"]
+    assert (pending["lastmod"], pending["etag"]) == ("2024-01-01", '"e1"')
+
+def test_old_journals_are_discarded(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    path.write_text(json.dumps({"started_at": 0}) + "\n" + json.dumps({"url": "https://example.com/a", "state": "done"}) + "\n")
+    journal = CrawlJournal(str(path))
+    assert journal.entries == {} and not path.exists()
+
+def test_clear_deletes_the_file(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = CrawlJournal(str(path))
+    journal.pending("https://example.com/a")
+    assert path.exists()
+    journal.clear()
+    assert not path.exists() and journal.entries == {}
+    assert CrawlJournal(str(path)).entries == {}
@@ -0,0 +1,76 @@
+import asyncio
+import httpx
+from crawl_manifest import CrawlManifest, content_hash, revalidate
+
+URL = "https://example.com/a"
+
+def committed(tmp_path, **page):
+    manifest = CrawlManifest(str(tmp_path / "manifest.json"))
+    manifest.pages[URL] = {"file_id": "file-1", "content_hash": content_hash("old"), **page}
+    return manifest
+
+def test_stage_commit_and_reload(tmp_path):
+    manifest = CrawlManifest(str(tmp_path / "manifest.json"))
+    manifest.mark_seen(URL, "2024-01-01")
+    assert manifest.stage(URL, content_hash("v1"), "scraped_content/a.md", '"e1"', None)
+    assert manifest.pending_by_path() == {"scraped_content/a.md": URL}
+    assert manifest.commit(URL, "file-1") is None
+    manifest.save()
+
+    reloaded = CrawlManifest(manifest.path)
+    assert reloaded.pages[URL] == {"lastmod": "2024-01-01", "etag": '"e1"', "last_modified": None,
+                                   "content_hash": content_hash("v1"), "file_id": "file-1"}
+    assert reloaded.is_fresh(URL, "2024-01-01")
+    assert not reloaded.is_fresh(URL, "2024-02-01")
+    assert reloaded.conditional_headers(URL) == {"If-None-Match": '"e1"'}
+
+def test_unchanged_content_is_not_staged_but_refreshes_validators(tmp_path):
+    manifest = committed(tmp_path, etag='"e1"')
+    manifest.mark_seen(URL, "2024-03-01")
+    assert not manifest.stage(URL, content_hash("old"), "a.md", '"e2"', "Mon, 01 Jan 2024 00:00:00 GMT")
+    page = manifest.pages[URL]
+    assert "pending" not in page
+    assert page["etag"] == '"e2"' and page["lastmod"] == "2024-03-01"
+
+def test_commit_returns_the_replaced_file(tmp_path):
+    manifest = committed(tmp_path)
+    manifest.stage(URL, content_hash("new"), "a.md")
+    assert manifest.commit(URL, "file-2") == "file-1"
+
+def test_pages_not_seen_are_removed_unless_the_listing_was_empty(tmp_path):
+    manifest = committed(tmp_path)
+    assert manifest.mark_removed() == 0 # Nothing seen: a failed sitemap must not wipe the store
+    manifest.mark_seen("https://example.com/other")
+    assert manifest.mark_removed() == 1
+    assert manifest.removed() == [URL]
+    assert manifest.forget(URL) == "file-1"
+
+def test_gone_pages_are_removed_even_if_listed(tmp_path):
+    manifest = committed(tmp_path)
+    manifest.mark_seen(URL)
+    manifest.mark_seen("https://example.com/other")
+    manifest.mark_gone(URL)
+    assert manifest.mark_removed() == 1
+
+def test_stale_bundle_members(tmp_path):
+    manifest = CrawlManifest(str(tmp_path / "manifest.json"))
+    for name, file_id in (("a", "b1"), ("b", "b1"), ("c", "b2")):
+        manifest.pages[f"https://example.com/{name}"] = {"file_id": file_id, "bundled": True, "content_hash": name}
+    manifest.stage("https://example.com/a", "changed", "a.md")
+    assert manifest.stale_bundle_members() == ["https://example.com/b"]
+    manifest.restage("https://example.com/b", "bundled/b.md")
+    assert manifest.pages["https://example.com/b"]["pending"]["path"] == "bundled/b.md"
+
+def conditional_get(status, headers=None):
+    def handler(request):
+        assert request.headers["if-none-match"] == '"e1"'
+        return httpx.Response(status, headers=headers or {}, content=b"body")
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await revalidate(client, URL, {"If-None-Match": '"e1"'})
+    return asyncio.run(run())
+
+def test_revalidate():
+    assert conditional_get(304) is None
+    assert conditional_get(200, {"ETag": '"e2"', "Last-Modified": "Tue"}) == {"etag": '"e2"', "last_modified": "Tue"}
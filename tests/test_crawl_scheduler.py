@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from crawl_scheduler import CrawlScheduler, HostLimiter, RobotsCache, RobotsRules
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10))
+
+def test_limiter_halves_on_backoff_and_grows_when_healthy():
+    async def scenario():
+        limiter = HostLimiter(max_limit=8)
+        await limiter.acquire()
+        await limiter.release(0.01, 429)
+        assert limiter.limit == 4 and limiter.backoffs == 1
+        for _ in range(20):
+            await limiter.acquire()
+            await limiter.release(0.01, 200)
+        assert 4 < limiter.limit <= 8
+        assert limiter.in_flight == 0
+    run(scenario())
+
+def test_limiter_never_drops_below_minimum():
+    async def scenario():
+        limiter = HostLimiter(max_limit=4, min_limit=2)
+        for _ in range(5):
+            await limiter.acquire()
+            limiter._last_decrease = 0.0 # Every failure counts, not just one per round trip
+            await limiter.release(0.01, None, failed=True)
+        assert limiter.limit == 2
+    run(scenario())
+
+def test_limiter_applies_one_decrease_per_round_trip():
+    async def scenario():
+        limiter = HostLimiter(max_limit=8)
+        for _ in range(3):
+            await limiter.acquire()
+        for _ in range(3):
+            await limiter.release(1.0, 503) # A burst of failures from the same window
+        assert limiter.limit == 4 and limiter.backoffs == 1
+    run(scenario())
+
+def test_scheduler_crawls_every_url_within_the_window():
+    in_flight = peak = 0
+
+    async def fetch(url, slot):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        if url.endswith("/7"):
+            raise ValueError("boom")
+        return Response(200)
+
+    async def scenario():
+        scheduler = CrawlScheduler(fetch, max_concurrent=3, respect_crawl_delay=False)
+        return [item async for item in scheduler.run(f"https://example.com/{i}" for i in range(20))]
+
+    results = dict(run(scenario()))
+    assert len(results) == 20
+    assert isinstance(results["https://example.com/7"], ValueError)
+    assert all(isinstance(r, Response) for url, r in results.items() if not url.endswith("/7"))
+    assert peak <= 3
+
+def test_scheduler_accepts_async_sources_and_surfaces_their_errors():
+    async def fetch(url, slot):
+        return Response(200)
+
+    async def urls():
+        yield "https://example.com/a"
+        raise RuntimeError("source failed")
+
+    async def scenario():
+        scheduler = CrawlScheduler(fetch, max_concurrent=2, respect_crawl_delay=False)
+        return [item async for item in scheduler.run(urls())]
+
+    with pytest.raises(RuntimeError, match="source failed"):
+        run(scenario())
+
+def test_throttled_host_does_not_hold_back_other_hosts():
+    async def fetch(url, slot):
+        return Response(200)
+
+    async def fetch_robots(origin):
+        return RobotsRules("User-agent: *\nRequest-rate: 4/1\n" if "slow" in origin else None)
+
+    async def scenario():
+        robots = RobotsCache()
+        robots._fetch = fetch_robots
+        scheduler = CrawlScheduler(fetch, max_concurrent=2, robots=robots)
+        urls = [f"https://slow.example.com/{i}" for i in range(3)] + [f"https://fast.example.com/{i}" for i in range(10)]
+        return [url async for url, _ in scheduler.run(urls)]
+
+    order = run(scenario())
+    assert len(order) == 13
+    # Only the first slow page starts right away; the others wait out its request rate without taking a slot
+    assert all("fast" in url for url in order[1:11]) and order[-1] == "https://slow.example.com/2"
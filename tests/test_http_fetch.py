@@ -0,0 +1,45 @@
+import asyncio
+import httpx
+from http_fetch import fetch_static, needs_js_rendering
+
+ARTICLE = "<p>" + "Invoices are sent on the first day of each month and can be paid by card or transfer. " * 4 + "</p>"
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10))
+
+def test_static_page_is_not_rendered():
+    page = f"<html><head><script>track()</script></head><body><h1>Billing</h1>{ARTICLE}" \
+           '<noscript><img src="/pixel.gif"></noscript></body></html>'
+    assert not needs_js_rendering(page)
+
+def test_empty_spa_shell_is_rendered():
+    assert needs_js_rendering('<html><body><div id="root"></div><script src="/app.js"></script></body></html>')
+    assert needs_js_rendering(f'<html><body><app-root></app-root>{ARTICLE}</body></html>') # Even with server text around it
+
+def test_noscript_only_page_is_rendered():
+    assert needs_js_rendering("<html><body><noscript>You need to enable JavaScript to run this app.</noscript>"
+                              "<script>" + "x();" * 200 + "</script></body></html>")
+    assert needs_js_rendering("<html><body><p>Loading...</p></body></html>") # Too little text either way
+
+def test_fetch_static_reports_failures_and_not_modified():
+    def handler(request):
+        if request.url.path == "/missing":
+            return httpx.Response(404)
+        if request.url.path == "/guide.pdf":
+            return httpx.Response(200, headers={"content-type": "application/pdf"}, content=b"%PDF")
+        if request.headers.get("if-none-match") == '"e1"':
+            return httpx.Response(304, headers={"etag": '"e1"'})
+        return httpx.Response(200, headers={"content-type": "text/html", "etag": '"e1"'}, text=ARTICLE)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return [await fetch_static(client, "https://example.com/missing"),
+                    await fetch_static(client, "https://example.com/guide.pdf"),
+                    await fetch_static(client, "https://example.com/page"),
+                    await fetch_static(client, "https://example.com/page", {"If-None-Match": '"e1"'})]
+
+    missing, pdf, page, unchanged = run(scenario())
+    assert not missing.success and missing.error_message == "HTTP 404"
+    assert not pdf.success and pdf.error_message == "Unsupported content type application/pdf"
+    assert page.success and page.html == ARTICLE and page.response_headers["etag"] == '"e1"'
+    assert unchanged.success and unchanged.status_code == 304 and unchanged.html == ""
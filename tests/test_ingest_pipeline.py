@@ -0,0 +1,61 @@
+import asyncio
+from ingest_pipeline import IngestPipeline, Stage
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10))
+
+async def numbers(count: int, produced: list = None):
+    for n in range(count):
+        if produced is not None:
+            produced.append(n)
+        yield n
+
+def test_items_pass_through_every_stage():
+    async def double(n):
+        return n * 2
+
+    async def label(n):
+        return f"item {n}"
+
+    pipeline = IngestPipeline([Stage("double", double, workers=3), Stage("label", label, workers=2)])
+    outputs = run(pipeline.run(numbers(20)))
+    assert sorted(outputs) == sorted(f"item {n * 2}" for n in range(20))
+    assert pipeline.processed == {"double": 20, "label": 20}
+    assert pipeline.failed == {"double": 0, "label": 0}
+
+def test_none_drops_items_and_failures_are_counted():
+    async def convert(n):
+        if n % 5 == 0:
+            raise ValueError("broken page")
+        return None if n % 2 else n
+
+    async def upload(n):
+        return n
+
+    pipeline = IngestPipeline([Stage("convert", convert, workers=2), Stage("upload", upload)])
+    outputs = run(pipeline.run(numbers(10)))
+    assert sorted(outputs) == [2, 4, 6, 8]
+    assert pipeline.failed["convert"] == 2 # 0 and 5
+    assert pipeline.processed == {"convert": 8, "upload": 4}
+    assert "convert: 8 ok / 2 failed" in pipeline.summary()
+
+def test_slow_stage_holds_back_the_source():
+    async def scenario():
+        produced = []
+        release = asyncio.Event()
+
+        async def passthrough(n):
+            return n
+
+        async def slow(n):
+            await release.wait()
+            return n
+
+        pipeline = IngestPipeline([Stage("fast", passthrough), Stage("slow", slow)], queue_size=2)
+        task = asyncio.create_task(pipeline.run(numbers(100, produced)))
+        await asyncio.sleep(0.1)
+        # Two queues of two items, one item held by each stage worker and the one the feeder waits to put
+        assert len(produced) <= 2 * 2 + 2 + 1
+        release.set()
+        assert len(await task) == 100
+    run(scenario())
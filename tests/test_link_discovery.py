@@ -0,0 +1,113 @@
+import asyncio
+import httpx
+from crawl_scheduler import CrawlScheduler, RobotsCache, RobotsRules
+from http_fetch import fetch_static
+from link_discovery import BloomFilter, LinkFrontier, extract_links, normalize_url
+
+ROBOTS = "User-agent: *\nDisallow: /private/\nCrawl-delay: 2\n"
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10))
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://Example.com:443/a/./b/../c?utm_source=x&b=2&a=1#top") == "https://example.com/a/c?a=1&b=2"
+    assert normalize_url("../d/", "http://example.com:8080/a/b/") == "http://example.com:8080/a/d/"
+    assert normalize_url("mailto:someone@example.com") is None
+    assert normalize_url("https://example.com") == "https://example.com/"
+
+def test_extract_links_honours_base_nofollow_and_canonical():
+    page = ('<base href="https://example.com/docs/">'
+            '<a href="intro">Intro</a> <a rel="nofollow" href="/login">Login</a> '
+            '<link rel="canonical" href="https://example.com/docs/page">')
+    assert extract_links(page, "https://example.com/other/page") == ["https://example.com/docs/intro",
+                                                                     "https://example.com/docs/page"]
+    assert extract_links('<meta name="robots" content="noindex, nofollow"><a href="/a">', "https://example.com/") == []
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, error_rate=0.01)
+    urls = [f"https://example.com/page{n}" for n in range(1000)]
+    added = sum(bloom.add(url) for url in urls)
+    assert added > 980 and bloom.count == added # A new URL may collide with the ones before it
+    assert all(url in bloom for url in urls)
+    assert not bloom.add(urls[0])
+    false_positives = sum(f"https://example.com/other{n}" in bloom for n in range(10000))
+    assert false_positives < 300
+
+def crawl(frontier, pages, redirects={}):
+    frontier.seed([frontier.start_url])
+
+    async def scenario():
+        crawled = []
+        async for url in frontier:
+            crawled.append(url)
+            frontier.completed(url, pages.get(url), redirects.get(url))
+        return crawled
+    return run(scenario())
+
+def test_frontier_crawls_breadth_first_within_scope():
+    pages = {
+        "https://example.com/docs/": '<a href="a">A</a><a href="b">B</a><a href="/blog/">Blog</a><a href="guide.pdf">PDF</a>',
+        "https://example.com/docs/a": '<a href="https://www.example.com/docs/c">C</a><a href="/docs/">Home</a>',
+        "https://example.com/docs/b": '<a href="private/x">X</a>',
+    }
+    frontier = LinkFrontier("https://example.com/docs/", allowed=RobotsRules(ROBOTS.replace("/private/", "/docs/private/")).allows)
+    assert crawl(frontier, pages) == ["https://example.com/docs/", "https://example.com/docs/a",
+                                      "https://example.com/docs/b", "https://www.example.com/docs/c"]
+
+def test_frontier_stops_at_limits():
+    pages = {f"https://example.com/{n}": f'<a href="/{n + 1}">next</a><a href="/x{n}">x</a>' for n in range(10)}
+    frontier = LinkFrontier("https://example.com/0", max_pages=3)
+    assert len(crawl(frontier, pages)) == 3 and frontier.truncated
+    frontier = LinkFrontier("https://example.com/0", max_depth=1)
+    assert crawl(frontier, pages) == ["https://example.com/0", "https://example.com/1", "https://example.com/x0"]
+
+def test_frontier_resolves_links_against_redirect_target():
+    pages = {"https://example.com/old": '<a href="next">Next</a><a href="/new/">Self</a>'}
+    frontier = LinkFrontier("https://example.com/old")
+    crawled = crawl(frontier, pages, {"https://example.com/old": "https://example.com/new/"})
+    # Resolved against /old, "next" would have been /next; the redirect target itself is not crawled again
+    assert crawled == ["https://example.com/old", "https://example.com/new/next"]
+
+def test_fetch_static_reports_final_url():
+    def handler(request):
+        if request.url.path == "/old":
+            return httpx.Response(301, headers={"location": "/new"})
+        return httpx.Response(200, headers={"content-type": "text/html"}, text="<p>new</p>")
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True) as client:
+            return await fetch_static(client, "https://example.com/old")
+    page = run(scenario())
+    assert page.url == "https://example.com/new" and page.html == "<p>new</p>"
+
+def test_robots_rules():
+    rules = RobotsRules(ROBOTS)
+    assert rules.allows("https://example.com/docs") and not rules.allows("https://example.com/private/a")
+    assert rules.crawl_delay == 2.0
+    assert RobotsRules("User-agent: *\nRequest-rate: 1/4\n").crawl_delay == 4.0
+    assert RobotsRules().allows("https://example.com/private/a") and RobotsRules().crawl_delay == 0.0
+
+def test_robots_are_read_once_per_origin_for_frontier_and_scheduler():
+    fetched = []
+
+    async def fetch_robots(origin):
+        fetched.append(origin)
+        await asyncio.sleep(0.01)
+        return RobotsRules(ROBOTS)
+
+    async def scenario():
+        robots = RobotsCache()
+        robots._fetch = fetch_robots
+        rules = await robots.rules("https://example.com") # As the link frontier does
+        assert not rules.allows("https://example.com/private/a")
+
+        async def fetch(url, slot):
+            return None
+        scheduler = CrawlScheduler(fetch, max_concurrent=4, robots=robots)
+        urls = [f"https://example.com/{n}" for n in range(4)] + ["https://other.example.com/"]
+        await asyncio.gather(*(scheduler._limiter_for(url) for url in urls))
+        return scheduler.stats()
+
+    stats = run(scenario())
+    assert fetched == ["https://example.com", "https://other.example.com"]
+    assert stats["https://example.com"]["crawl_delay"] == 2.0
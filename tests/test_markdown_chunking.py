@@ -0,0 +1,48 @@
+import pytest
+from markdown_chunking import (
+    MAX_CHUNK_TOKENS, chunk_markdown, estimate_tokens, page_title, split_sections, static_chunking_strategy,
+)
+
+URL = "https://example.com/guide"
+
+def test_estimate_tokens_counts_non_ascii_characters_singly():
+    assert estimate_tokens("abcd" * 10) == 11
+    assert estimate_tokens("日本語") == 4
+
+def test_static_chunking_strategy_checks_bounds():
+    assert static_chunking_strategy(800, 400) == {
+        "type": "static", "static": {"max_chunk_size_tokens": 800, "chunk_overlap_tokens": 400}}
+    with pytest.raises(ValueError):
+        static_chunking_strategy(MAX_CHUNK_TOKENS + 1, 0)
+    with pytest.raises(ValueError):
+        static_chunking_strategy(800, 401)
+
+def test_page_title_falls_back_to_url():
+    assert page_title("## Setup\n\n# Guide #\n", URL) == "Guide"
+    assert page_title("## Setup\n\nText", URL) == URL
+
+def test_split_sections_skips_fenced_lines_and_title():
+    markdown = "# Guide\n\nIntro\n\n## Setup\n\n```bash\n# comment\n```\n\n### Linux\n\nSteps\n\n## Usage\n\nRun it."
+    sections = split_sections(markdown, "Guide")
+    assert [section.path for section in sections] == [(), ("Setup",), ("Setup", "Linux"), ("Usage",)]
+    assert "# comment" in sections[1].text
+    assert [section.path[:1] for section in split_sections(markdown)] == [("Guide",)] * 4
+
+def test_chunks_carry_context_and_respect_the_limit():
+    setup = "\n\n".join(f"Setup step {n} " + "configure the service " * 20 for n in range(12))
+    markdown = f"# Guide\n\nIntro.\n\n## Setup\n\n{setup}\n\n## Usage\n\nRun it."
+    chunks = chunk_markdown(markdown, URL, max_tokens=200)
+    assert len(chunks) > 3
+    assert all(estimate_tokens(chunk) <= 200 for chunk in chunks)
+    assert all(chunk.startswith(f"[Guide]({URL})") for chunk in chunks)
+    assert chunks[1].startswith(f"[Guide]({URL})\n\n## Setup")
+    assert chunks[2].startswith(f"[Guide]({URL}) > Setup\n\n") # Continuations say which section they belong to
+    assert chunks[-1].endswith("Run it.")
+
+def test_small_sections_are_merged_and_code_blocks_kept_whole():
+    code = "```python\n" + "\n\n".join(f"print({n})" for n in range(5)) + "\n```"
+    markdown = f"# Guide\n\n## A\n\nShort.\n\n### A1\n\nAlso short.\n\n## B\n\n{code}"
+    chunks = chunk_markdown(markdown, URL, max_tokens=500)
+    assert len(chunks) == 1 and code in chunks[0]
+    chunks = chunk_markdown(markdown, URL, max_tokens=500, min_fill=0.0) # A new top-level heading starts a chunk
+    assert [chunk.split("\n\n")[1] for chunk in chunks] == ["# Guide", "## A", "## B"]
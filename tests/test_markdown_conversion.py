@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+import markdown_conversion
+from markdown_conversion import MarkdownConverter
+
+PAGE = "<html><body><h1>Install</h1><p>Run <code>pip install websiteqa</code>.</p></body></html>"
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=30))
+
+async def convert_pages(converter: MarkdownConverter, tmp_path):
+    async with converter:
+        markdown = await converter.convert("https://example.com/install", PAGE)
+        await converter.write(str(tmp_path / "install.md"), markdown)
+    return markdown
+
+@pytest.mark.parametrize("executor", ["process", "thread"])
+def test_converts_pages_on_each_executor(executor, tmp_path):
+    converter = MarkdownConverter(executor, max_workers=2)
+    markdown = run(convert_pages(converter, tmp_path))
+    assert "# Install" in markdown and "pip install websiteqa" in markdown
+    assert (tmp_path / "install.md").read_text() == markdown
+    assert converter.executor_type == executor and converter._executor is None # Shut down on exit
+
+def test_falls_back_to_threads_when_processes_cannot_start(tmp_path, monkeypatch):
+    def no_processes(*args, **kwargs):
+        raise OSError("sem_open is not implemented")
+    monkeypatch.setattr(markdown_conversion, "ProcessPoolExecutor", no_processes)
+    converter = MarkdownConverter("process", max_workers=2)
+    assert "# Install" in run(convert_pages(converter, tmp_path))
+    assert converter.executor_type == "thread"
+
+def test_summary_reports_converted_pages(tmp_path):
+    converter = MarkdownConverter("thread", max_workers=3)
+    assert converter.summary() == "No pages converted."
+    run(convert_pages(converter, tmp_path))
+    summary = converter.summary()
+    assert summary.startswith("Converted 1 pages on 3 thread workers: ")
+    assert summary.endswith("(https://example.com/install)")
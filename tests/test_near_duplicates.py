@@ -0,0 +1,76 @@
+import itertools
+from crawl_manifest import CrawlManifest, content_hash
+from near_duplicates import NearDuplicateIndex, minhash_signature, similarity
+
+def page(topic: str, variant: str = "") -> str:
+    words = " ".join(f"{topic}{n % 17} sentence {n} explains the {topic} feature" for n in range(40))
+    return f"# {topic.title()} [Docs]({variant}/docs)\n\n{words}"
+
+def test_signatures_estimate_similarity():
+    assert minhash_signature("too short to compare") is None
+    original = minhash_signature(page("billing", "/v1"))
+    assert similarity(original, minhash_signature(page("billing", "/v2"))) == 1.0 # Only link targets differ
+    assert similarity(original, minhash_signature(page("billing") + " extra words at the end")) > 0.9
+    assert similarity(original, minhash_signature(page("search"))) < 0.2
+
+def test_lowest_url_is_canonical_whatever_the_order(tmp_path):
+    urls = ["https://example.com/v2/billing", "https://example.com/billing", "https://example.com/v1/billing"]
+    for order in itertools.permutations(urls):
+        index = NearDuplicateIndex(str(tmp_path / "dedup.json"))
+        demoted = []
+        for url in order:
+            result = index.check(url, minhash_signature(page("billing", url)))
+            demoted += [result.demoted] if result.demoted else []
+        assert list(index.signatures) == ["https://example.com/billing"]
+        assert index.duplicates == {"https://example.com/v1/billing": "https://example.com/billing",
+                                    "https://example.com/v2/billing": "https://example.com/billing"}
+        assert index.skipped + len(demoted) == 2
+
+def test_canonical_pages_of_earlier_crawls_keep_their_place(tmp_path):
+    path = str(tmp_path / "dedup.json")
+    index = NearDuplicateIndex(path)
+    assert index.check("https://example.com/v2/billing", minhash_signature(page("billing"))).canonical is None
+    index.save()
+
+    index = NearDuplicateIndex(path)
+    result = index.check("https://example.com/billing", minhash_signature(page("billing")))
+    assert result.canonical == "https://example.com/v2/billing" and result.demoted is None
+    index.remove("https://example.com/v2/billing")
+    assert index.check("https://example.com/billing", minhash_signature(page("billing"))).canonical is None
+
+def test_duplicates_are_revalidated_instead_of_uploaded(tmp_path):
+    manifest = CrawlManifest(str(tmp_path / "manifest.json"))
+    url, canonical = "https://example.com/v2/billing", "https://example.com/billing"
+    manifest.pages[url] = {"file_id": "file-1", "content_hash": content_hash("old")}
+    manifest.mark_seen(url, "2024-01-01")
+    manifest.stage(url, content_hash("new"), "v2_billing.md", '"e1"')
+    manifest.duplicate(url, canonical)
+    assert manifest.pending_by_path() == {}
+    assert manifest.pages[url]["etag"] == '"e1"' and manifest.removed() == [url]
+    manifest.mark_seen(url, "2024-01-01") # A duplicate's old file stays flagged until it is deleted
+    assert manifest.forget(url) == "file-1"
+    assert manifest.pages[url] == {"lastmod": "2024-01-01", "etag": '"e1"', "last_modified": None, "duplicate_of": canonical}
+    assert manifest.is_fresh(url, "2024-01-01")
+    assert manifest.conditional_headers(url) == {"If-None-Match": '"e1"'}
+
+def test_released_duplicates_are_fetched_again(tmp_path):
+    manifest = CrawlManifest(str(tmp_path / "manifest.json"))
+    canonical = "https://example.com/billing"
+    for url in ("https://example.com/v1/billing", "https://example.com/v2/billing"):
+        manifest.mark_seen(url, "2024-01-01")
+        manifest.duplicate(url, canonical, '"e1"')
+    assert manifest.release_duplicates({canonical}, keep={"https://example.com/v2/billing"}) == 1
+    assert not manifest.is_fresh("https://example.com/v1/billing", "2024-01-01")
+    assert manifest.conditional_headers("https://example.com/v1/billing") == {}
+    assert manifest.is_fresh("https://example.com/v2/billing", "2024-01-01")
+
+    # A duplicate that changes into a page of its own is uploaded like any other
+    manifest.stage("https://example.com/v2/billing", content_hash("own"), "v2_billing.md")
+    assert "duplicate_of" not in manifest.pages["https://example.com/v2/billing"]
+    # One that leaves the site is dropped entirely
+    manifest.save()
+    next_crawl = CrawlManifest(manifest.path)
+    next_crawl.mark_seen("https://example.com/v2/billing")
+    assert next_crawl.mark_removed() == 1
+    next_crawl.forget("https://example.com/v1/billing")
+    assert "https://example.com/v1/billing" not in next_crawl.pages
@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+from page_buffer import PageBuffer
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10))
+
+def test_buffered_page_round_trip(tmp_path):
+    buffer = PageBuffer(max_bytes=100)
+    path = str(tmp_path / "page.md")
+    run(buffer.put(path, b"# Billing"))
+    assert not (tmp_path / "page.md").exists() # Handed over in memory
+    assert buffer.exists(path) and buffer.size(path) == 9 and run(buffer.read(path)) == b"# Billing"
+    run(buffer.remove(path))
+    assert not buffer.exists(path) and buffer.bytes == 0
+
+def test_pages_beyond_the_budget_spill_to_disk(tmp_path):
+    buffer = PageBuffer(max_bytes=10)
+    first, second = str(tmp_path / "first.md"), str(tmp_path / "second.md")
+    run(buffer.put(first, b"a" * 6))
+    run(buffer.put(second, b"b" * 6))
+    assert (buffer.buffered, buffer.spilled, buffer.bytes) == (1, 1, 6)
+    assert not (tmp_path / "first.md").exists() and (tmp_path / "second.md").read_bytes() == b"b" * 6
+    # Spilled pages are read and removed through the buffer like buffered ones
+    assert buffer.size(second) == 6 and run(buffer.read(second)) == b"b" * 6
+    run(buffer.remove(second))
+    assert not (tmp_path / "second.md").exists()
+
+    # Rewriting a buffered page counts only its new size, and the old copy never outlives a spill
+    run(buffer.put(first, b"c" * 9))
+    assert buffer.bytes == 9 and buffer.spilled == 1
+    run(buffer.put(first, b"d" * 12))
+    assert buffer.bytes == 0 and run(buffer.read(first)) == b"d" * 12
+
+def test_move_writes_buffered_and_spilled_pages_to_the_target(tmp_path):
+    buffer = PageBuffer(max_bytes=10)
+    buffered, spilled = str(tmp_path / "buffered.md"), str(tmp_path / "spilled.md")
+    run(buffer.put(buffered, b"a" * 6))
+    run(buffer.put(spilled, b"b" * 6))
+    buffer.move(buffered, str(tmp_path / "bundle-1.md"))
+    buffer.move(spilled, str(tmp_path / "bundle-2.md"))
+    assert (tmp_path / "bundle-1.md").read_bytes() == b"a" * 6 and (tmp_path / "bundle-2.md").read_bytes() == b"b" * 6
+    assert not buffer.exists(buffered) and not buffer.exists(spilled) and buffer.bytes == 0
+    with pytest.raises(FileNotFoundError):
+        buffer.move(buffered, str(tmp_path / "bundle-3.md"))
+
+def test_discard_drops_pages_under_a_directory(tmp_path):
+    buffer = PageBuffer()
+    run(buffer.put(str(tmp_path / "site" / "a.md"), b"a"))
+    run(buffer.put(str(tmp_path / "other" / "b.md"), b"b"))
+    assert buffer.discard(str(tmp_path / "site")) == 1
+    assert buffer.exists(str(tmp_path / "other" / "b.md")) and buffer.bytes == 1
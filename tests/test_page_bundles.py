@@ -0,0 +1,104 @@
+import asyncio
+import os
+from crawl_journal import CrawlJournal
+from crawl_manifest import CrawlManifest, content_hash
+from ingest_session import IngestSession, restage_bundle_members
+from page_bundles import BUNDLE_SEPARATOR, PageStore, bundle_group, plan_bundles
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10))
+
+def test_bundle_group():
+    assert bundle_group("https://example.com/docs/setup/linux") == "example.com/docs"
+    assert bundle_group("https://example.com/docs/setup/linux", depth=2) == "example.com/docs/setup"
+    assert bundle_group("https://example.com/") == "example.com"
+    assert bundle_group(None) == ""
+
+def test_plan_groups_related_pages_within_caps():
+    pages = [(f"https://example.com/docs/{n}", f"docs_{n}.md", 300) for n in range(5)]
+    pages += [(f"https://example.com/blog/{n}", f"blog_{n}.md", 300) for n in range(3)]
+    pages.append(("https://example.com/docs/huge", "huge.md", 5000))
+    bundles = plan_bundles(pages, max_bytes=1000, max_pages=2)
+    assert [bundle.name for bundle in bundles] == [
+        "bundle_example.com_blog_0001.md", "bundle_example.com_blog_0002.md",
+        "bundle_example.com_docs_0001.md", "bundle_example.com_docs_0002.md",
+        "bundle_example.com_docs_0003.md", "bundle_example.com_docs_0004.md",
+    ]
+    assert [len(bundle.members) for bundle in bundles] == [2, 1, 2, 2, 1, 1]
+    assert bundles[-1].members == [("https://example.com/docs/huge", "huge.md")] # Too big to share a bundle
+    assert bundles[0].size == 600 + len(BUNDLE_SEPARATOR)
+    assert sorted(path for bundle in bundles for _, path in bundle.members) == sorted(path for _, path, _ in pages)
+
+def test_small_groups_share_a_bundle():
+    pages = [("https://example.com/about", "about.md", 100), ("https://example.com/blog/a", "a.md", 100),
+             ("https://example.com/docs/b", "b.md", 100)]
+    bundles = plan_bundles(pages, max_bytes=10_000, max_pages=200)
+    assert len(bundles) == 1 and bundles[0].name == "bundle_example.com_about_0001.md"
+
+def test_page_store_keeps_copies_of_bundled_pages(tmp_path):
+    store = PageStore(str(tmp_path / "store"))
+    page = tmp_path / "page.md"
+    page.write_text("# Page")
+    store.put("https://example.com/docs/page", str(page))
+    assert not page.exists()
+    with open(store.path_for("https://example.com/docs/page")) as f:
+        assert f.read() == "# Page"
+    assert store.prune(["https://example.com/docs/page"]) == 0
+    assert store.prune([]) == 1 and not os.path.exists(store.directory)
+
+def test_changed_page_rebuilds_its_bundle(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manifest = CrawlManifest(str(tmp_path / "manifest.json"))
+    store = PageStore.for_manifest(manifest.path)
+    for name in ("a", "b", "c"):
+        url = f"https://example.com/docs/{name}"
+        manifest.pages[url] = {"file_id": "bundle-1", "content_hash": content_hash(name), "bundled": True}
+        os.makedirs(store.directory, exist_ok=True)
+        with open(store.path_for(url), "w") as f:
+            f.write(f"# {name}")
+    os.remove(store.path_for("https://example.com/docs/c")) # Lost copy
+    manifest.pages["https://example.com/other"] = {"file_id": "file-2", "content_hash": content_hash("other")}
+    manifest.stage("https://example.com/docs/a", content_hash("a2"), "a.md")
+
+    assert restage_bundle_members(manifest) == [store.path_for("https://example.com/docs/b")]
+    assert manifest.pending_by_path() == {"a.md": "https://example.com/docs/a",
+                                          store.path_for("https://example.com/docs/b"): "https://example.com/docs/b"}
+    assert "content_hash" not in manifest.pages["https://example.com/docs/c"] # Uploaded again by the next crawl
+
+class Attacher:
+    def __init__(self):
+        self.file_ids = []
+
+    def add(self, file_id):
+        self.file_ids.append(file_id)
+
+def test_upload_bundles_packs_pages_and_moves_them_to_the_store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    uploads = {}
+
+    async def upload_content(filename, content):
+        uploads[filename] = content
+        return "file-" + filename[-7:-3] # Bundles upload concurrently
+
+    paths, urls_by_path = [], {}
+    for n in range(3):
+        path = str(tmp_path / f"page{n}.md")
+        with open(path, "w") as f:
+            f.write(f"# Page {n}")
+        paths.append(path)
+        urls_by_path[path] = f"https://example.com/docs/{n}"
+    journal = CrawlJournal(str(tmp_path / "journal.jsonl"))
+    store = PageStore(str(tmp_path / "store"))
+    session = IngestSession({"session_name": "s1"}, bundle_max_pages=2)
+    session.attacher = Attacher()
+    session._upload_content = upload_content
+
+    uploaded = run(session.upload_bundles(paths, journal, urls_by_path, store))
+    assert uploads == {"bundle_example.com_docs_0001.md": b"# Page 0" + BUNDLE_SEPARATOR + b"# Page 1",
+                       "bundle_example.com_docs_0002.md": b"# Page 2"}
+    assert uploaded == {paths[0]: "file-0001", paths[1]: "file-0001", paths[2]: "file-0002"}
+    assert session.bundled == set(paths) and sorted(session.attacher.file_ids) == ["file-0001", "file-0002"]
+    assert journal.entries["https://example.com/docs/1"] == {"url": "https://example.com/docs/1", "state": "uploaded",
+                                                             "file_id": "file-0001"}
+    assert not any(os.path.exists(path) for path in paths)
+    assert os.path.exists(store.path_for("https://example.com/docs/2"))
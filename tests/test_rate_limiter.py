@@ -0,0 +1,121 @@
+import asyncio
+import time
+import pytest
+from rate_limiter import RateLimiter, parse_duration
+
+class APIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10))
+
+class Tracker:
+    """Coroutine factory that records how many calls run at once."""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.release = asyncio.Event()
+
+    def reset_peak(self):
+        self.peak = self.running
+
+    async def call(self):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await self.release.wait()
+        finally:
+            self.running -= 1
+        return "ok"
+
+def test_parse_duration():
+    assert parse_duration("1s") == 1.0
+    assert parse_duration("6m0s") == 360.0
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("2.5") == 2.5
+    assert parse_duration("") is None
+    assert parse_duration("soon") is None
+
+def test_concurrency_ceiling():
+    async def scenario():
+        limiter = RateLimiter(max_concurrent=3, requests_per_second=1000)
+        tracker = Tracker()
+        calls = [asyncio.create_task(limiter.call(tracker.call)) for _ in range(10)]
+        await asyncio.sleep(0.05)
+        assert tracker.running == 3
+        tracker.release.set()
+        assert await asyncio.gather(*calls) == ["ok"] * 10
+        assert tracker.peak == 3 and limiter.completed == 10
+    run(scenario())
+
+def test_reconfigure_resizes_slots_of_calls_in_flight():
+    async def scenario():
+        limiter = RateLimiter(max_concurrent=4, requests_per_second=1000)
+        tracker = Tracker()
+        calls = [asyncio.create_task(limiter.call(tracker.call)) for _ in range(12)]
+        await asyncio.sleep(0.05)
+        assert tracker.running == 4
+
+        # Growing admits waiting calls right away
+        limiter.configure(max_concurrent=6)
+        await asyncio.sleep(0.05)
+        assert tracker.running == 6
+
+        # Shrinking keeps running calls but starts no new ones until the count is below the ceiling
+        limiter.configure(max_concurrent=2)
+        tracker.release.set()
+        await asyncio.sleep(0)
+        tracker.release.clear()
+        await asyncio.sleep(0.05)
+        tracker.reset_peak()
+        assert tracker.running <= 2
+        tracker.release.set()
+        await asyncio.gather(*calls)
+        assert tracker.peak <= 2 and limiter.completed == 12
+    run(scenario())
+
+def test_token_bucket_spaces_out_calls():
+    async def scenario():
+        limiter = RateLimiter(max_concurrent=10, requests_per_second=50, burst=1)
+
+        async def call():
+            return time.monotonic()
+
+        started = sorted(await asyncio.gather(*[limiter.call(call) for _ in range(6)]))
+        # One call from the burst, then one every 20 ms
+        assert started[-1] - started[0] >= 0.09
+    run(scenario())
+
+def test_retries_retryable_errors_after_retry_after():
+    async def scenario():
+        limiter = RateLimiter(requests_per_second=1000, base_delay=0.001)
+        attempts = []
+
+        async def flaky():
+            attempts.append(time.monotonic())
+            if len(attempts) < 3:
+                raise APIError(429, {"retry-after-ms": "20"})
+            return "done"
+
+        assert await limiter.call(flaky) == "done"
+        assert limiter.retries == 2 and limiter.failures == 0
+        assert attempts[1] - attempts[0] >= 0.02
+    run(scenario())
+
+def test_does_not_retry_client_errors():
+    async def scenario():
+        limiter = RateLimiter(requests_per_second=1000, base_delay=0.001)
+        attempts = []
+
+        async def bad_request():
+            attempts.append(1)
+            raise APIError(400)
+
+        with pytest.raises(APIError):
+            await limiter.call(bad_request)
+        assert len(attempts) == 1 and limiter.failures == 1
+    run(scenario())
@@ -0,0 +1,134 @@
+import os
+import threading
+import pytest
+from agency_swarm.util.shared_state import SharedState
+import search_index
+from AnsweringAgent.tools.LocalSearchTool import LocalSearchTool
+from search_index import MAX_SECTION_CHARS, SearchIndex, split_sections, tokenize
+
+INSTALL = "# Guide\n\nIntro text.\n\n## Install\n\nRun pip install websiteqa to install the package.\n"
+BILLING = "# Billing\n\nInvoices are sent monthly. Refunds take five days.\n"
+FAQ = "# FAQ\n\n## Refunds\n\nAsk support for a refund within thirty days.\n"
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("How do I install the CLI, v2?") == ["do", "install", "cli", "v2"]
+
+def test_split_sections_keeps_heading_paths_and_caps_length():
+    long_paragraphs = "\n\n".join("word " * 150 for _ in range(10))
+    sections = split_sections(f"# Guide\n\nIntro\n\n## Setup\n\n### Linux\n\nSteps\n\n## Usage\n\n{long_paragraphs}")
+    headings = [heading for heading, _ in sections]
+    assert headings[:3] == ["Guide", "Guide > Setup", "Guide > Setup > Linux"]
+    assert set(headings[3:]) == {"Guide > Usage"} and len(headings) > 4
+    assert all(len(text) <= MAX_SECTION_CHARS for _, text in sections)
+
+def test_split_sections_ignores_headings_in_code_blocks():
+    sections = split_sections("# Guide\n\n```bash\n# install it\npip install websiteqa\n```\n\n## Usage\n\nRun it.")
+    assert [heading for heading, _ in sections] == ["Guide", "Guide > Usage"]
+
+def test_search_ranks_matching_section_first(tmp_path):
+    index = SearchIndex(str(tmp_path / "index"))
+    index.add_page("https://example.com/guide", INSTALL)
+    index.add_page("https://example.com/billing", BILLING)
+    index.add_page("https://example.com/faq", FAQ)
+    index.commit()
+    assert len(index) == 5 and "https://example.com/faq" in index
+
+    results = index.search("how do I install it")
+    assert results[0].url == "https://example.com/guide"
+    assert results[0].heading == "Guide > Install"
+    assert "pip install" in results[0].snippet
+    # A match in the heading outranks a mention in the text
+    assert index.search("refunds")[0].url == "https://example.com/faq"
+    assert index.search("the and of") == []
+
+def test_replaced_and_removed_pages_leave_results(tmp_path):
+    index = SearchIndex(str(tmp_path / "index"), max_segments=100)
+    index.add_page("https://example.com/billing", BILLING)
+    index.add_page("https://example.com/guide", INSTALL)
+    index.commit()
+    index.add_page("https://example.com/billing", "# Billing\n\nPayments are due yearly.\n")
+    index.commit()
+    assert index.search("invoices") == []
+    assert [r.url for r in index.search("payments yearly")] == ["https://example.com/billing"]
+
+    index.remove_page("https://example.com/guide")
+    index.commit()
+    assert index.search("install") == []
+    assert "https://example.com/guide" not in index
+
+def test_other_instances_see_commits(tmp_path):
+    directory = str(tmp_path / "index")
+    writer, reader = SearchIndex(directory), SearchIndex(directory)
+    writer.add_page("https://example.com/faq", FAQ)
+    writer.commit()
+    assert [r.url for r in reader.search("refund")] == ["https://example.com/faq"]
+
+def test_compaction_merges_segments_and_keeps_live_sections(tmp_path):
+    directory = str(tmp_path / "index")
+    index = SearchIndex(directory, max_segments=3)
+    for n in range(5):
+        index.add_page(f"https://example.com/page{n}", f"# Page {n}\n\nTopic{n} details.\n")
+        index.commit()
+    assert len(index.segments) <= 3
+    for n in range(5):
+        assert index.search(f"topic{n}")[0].url == f"https://example.com/page{n}"
+
+    index.compact()
+    assert len(index.segments) == 1
+    (name,) = index.segments
+    assert sorted(os.listdir(directory)) == sorted(["meta.json"] + [name + suffix for suffix in
+                                                   (".lex.json", ".docs.json", ".ids", ".tfs", ".text")])
+    assert len(SearchIndex(directory)) == 5
+
+def test_search_tool_reports_a_missing_index_without_searching(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(search_index, "_indexes", {})
+    monkeypatch.setattr(SearchIndex, "search", lambda *args: pytest.fail("searched an empty index"))
+    shared_state = SharedState()
+    shared_state.set("session_name", "s1")
+    monkeypatch.setattr(LocalSearchTool, "_shared_state", shared_state)
+    assert LocalSearchTool(query="refunds").run().startswith("The local search index is empty")
+
+def test_removed_pages_do_not_count_towards_document_frequency(tmp_path):
+    pages = {f"https://example.com/{n}": f"# Page {n}\n\nTopic {n} and some words.\n" for n in range(6)}
+    pages["https://example.com/0"] += "Refunds are possible.\n"
+    pages["https://example.com/1"] += "Refunds are not possible.\n"
+    index = SearchIndex(str(tmp_path / "index"), max_segments=100)
+    for url, markdown in pages.items():
+        index.add_page(url, markdown)
+    index.commit()
+    index.remove_page("https://example.com/1")
+    index.commit()
+    assert len(index.segments) == 1 # Not compacted; the removed section is still in the segment
+
+    fresh = SearchIndex(str(tmp_path / "fresh"))
+    for url, markdown in pages.items():
+        if url != "https://example.com/1":
+            fresh.add_page(url, markdown)
+    fresh.commit()
+    assert index.search("refunds")[0].score == fresh.search("refunds")[0].score
+
+def test_searches_run_safely_alongside_compaction(tmp_path):
+    index = SearchIndex(str(tmp_path / "index"), max_segments=2)
+    index.add_page("https://example.com/faq", FAQ)
+    index.commit()
+    errors = []
+    stop = threading.Event()
+
+    def search():
+        while not stop.is_set():
+            try:
+                assert index.search("refund")[0].url == "https://example.com/faq"
+            except Exception as e:
+                errors.append(e)
+
+    searcher = threading.Thread(target=search)
+    searcher.start()
+    try:
+        for n in range(30): # Every third commit compacts and unmaps the old segments
+            index.add_page(f"https://example.com/{n}", INSTALL)
+            index.commit()
+    finally:
+        stop.set()
+        searcher.join()
+    assert errors == []
@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+import pytest
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "WebsiteQA")
+
+class FakeAgency:
+    """Stands in for SessionAgency, which creates the assistants through the API."""
+
+    def __init__(self, session_name, manager, **kwargs):
+        self.session_name = session_name
+        self.shared_state = manager.shared_state
+
+@pytest.fixture
+def session_server(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", os.environ.get("OPENAI_API_KEY", "sk-test"))
+    monkeypatch.chdir(PACKAGE_DIR) # Tools load relative to the working directory, as with `python session_server.py`
+    import session_server
+    monkeypatch.setattr(session_server, "SessionAgency", FakeAgency)
+    return session_server
+
+def use(manager, *session_names):
+    for session_name in session_names:
+        with manager.session(session_name):
+            pass
+
+def test_least_recently_used_idle_session_is_evicted(session_server):
+    manager = session_server.SessionManager(max_sessions=2)
+    use(manager, "s1", "s2", "s1", "s3")
+    assert list(manager._sessions) == ["s1", "s3"]
+    # A session serving a request is kept even beyond `max_sessions`
+    with manager.session("s1"):
+        use(manager, "s4", "s5")
+        assert list(manager._sessions) == ["s1", "s5"]
+    assert manager.stats() == {"active_sessions": 2, "in_flight": 0, "created": 5, "evicted": 3,
+                               "max_sessions": 2, "idle_ttl": 30 * 60}
+
+def test_idle_sessions_expire(session_server):
+    manager = session_server.SessionManager(idle_ttl=60)
+    use(manager, "old", "fresh")
+    manager._sessions["old"].last_used = time.monotonic() - 120
+    assert manager.evict_idle() == 1
+    assert list(manager._sessions) == ["fresh"]
+
+def test_concurrent_sessions_see_their_own_shared_state(session_server):
+    manager = session_server.SessionManager()
+    both_set = threading.Barrier(2, timeout=5)
+    seen = {}
+
+    def serve(session_name):
+        with manager.session(session_name) as agency:
+            agency.shared_state.set("scraped_files", [f"{session_name}.md"])
+            both_set.wait() # Both sessions are active at once
+            seen[session_name] = (session_server.current_session.get(), agency.shared_state.get("session_name"),
+                                  agency.shared_state.get("scraped_files"))
+
+    threads = [threading.Thread(target=serve, args=(name,)) for name in ("s1", "s2")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen == {"s1": ("s1", "s1", ["s1.md"]), "s2": ("s2", "s2", ["s2.md"])}
+    with pytest.raises(RuntimeError, match="No session is active"):
+        manager.shared_state.get("scraped_files")
+
+def test_eviction_drops_the_session_and_its_state(session_server):
+    manager = session_server.SessionManager()
+    with manager.session("s1") as agency:
+        agency.shared_state.set("scraped_files", ["s1.md"])
+        assert not manager.evict("s1") # Still serving a request
+    first = manager._sessions["s1"].agency
+    assert manager.evict("s1") and not manager.evict("s1")
+    assert "s1" not in manager.shared_state._sessions
+
+    # Used again, the session gets a new agency (which resumes its threads from the store) and empty state
+    with manager.session("s1") as agency:
+        assert agency is not first and agency.shared_state.get("scraped_files") is None
+    assert (manager.created, manager.evicted) == (2, 1)
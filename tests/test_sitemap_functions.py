@@ -0,0 +1,58 @@
+import asyncio
+import gzip
+import httpx
+from sitemap_functions import SitemapEntry, iter_sitemap_entries
+
+SITE = "https://example.com"
+
+def urlset(*locs):
+    urls = "".join(f"<url><loc>{loc}</loc><lastmod>2024-01-01</lastmod></url>" for loc in locs)
+    return f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'.encode()
+
+def sitemapindex(*locs):
+    children = "".join(f"<sitemap><loc>{loc}</loc></sitemap>" for loc in locs)
+    return f'<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{children}</sitemapindex>'.encode()
+
+def collect(documents, **kwargs):
+    """Runs iter_sitemap_entries against `documents` (URL -> body) served by a mock transport."""
+    def handler(request):
+        body = documents.get(str(request.url))
+        return httpx.Response(200, content=body) if body is not None else httpx.Response(404)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return [entry async for entry in iter_sitemap_entries(SITE, client=client, **kwargs)]
+    return asyncio.run(asyncio.wait_for(run(), timeout=10))
+
+def test_plain_sitemap():
+    entries = collect({f"{SITE}/sitemap.xml": urlset(f"{SITE}/a", f"{SITE}/b")})
+    assert entries == [SitemapEntry(f"{SITE}/a", "2024-01-01"), SitemapEntry(f"{SITE}/b", "2024-01-01")]
+
+def test_index_recursion_gzip_and_duplicates():
+    entries = collect({
+        f"{SITE}/sitemap.xml": sitemapindex(f"{SITE}/one.xml", f"{SITE}/two.xml.gz", f"{SITE}/one.xml"),
+        f"{SITE}/one.xml": urlset(f"{SITE}/a", f"{SITE}/b"),
+        f"{SITE}/two.xml.gz": gzip.compress(urlset(f"{SITE}/b", f"{SITE}/c")),
+    })
+    assert sorted(entry.loc for entry in entries) == [f"{SITE}/a", f"{SITE}/b", f"{SITE}/c"]
+
+def test_failed_child_sitemaps_are_reported_and_skipped():
+    errors = []
+    entries = collect({
+        f"{SITE}/sitemap.xml": sitemapindex(f"{SITE}/missing.xml", f"{SITE}/broken.xml", f"{SITE}/good.xml"),
+        f"{SITE}/broken.xml": b"<urlset><url><loc>",
+        f"{SITE}/good.xml": urlset(f"{SITE}/a"),
+    }, on_error=lambda url, e: errors.append(url))
+    assert [entry.loc for entry in entries] == [f"{SITE}/a"]
+    assert sorted(errors) == [f"{SITE}/broken.xml", f"{SITE}/missing.xml"]
+
+def test_malformed_child_loc_does_not_stall_the_crawl():
+    # Unsupported schemes and invalid URLs raise outside httpx.HTTPError; with one worker,
+    # a worker dying on them would leave the good sitemap queued forever
+    errors = []
+    entries = collect({
+        f"{SITE}/sitemap.xml": sitemapindex("ftp://example.com/s.xml", "http://[::1/s.xml", f"{SITE}/good.xml"),
+        f"{SITE}/good.xml": urlset(f"{SITE}/a"),
+    }, max_concurrent=1, on_error=lambda url, e: errors.append(url))
+    assert [entry.loc for entry in entries] == [f"{SITE}/a"]
+    assert len(errors) == 2
@@ -0,0 +1,25 @@
+import os
+import subprocess
+import sys
+import openai
+from rate_limiter import _is_retryable
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "WebsiteQA")
+
+def test_teardown_cli_imports_without_openai_or_httpx():
+    code = "import sys, thread_functions; print(sorted({'openai', 'httpx'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=PACKAGE_DIR, capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
+
+def test_agency_loads_each_module_under_one_name():
+    # `python agency.py` runs from the WebsiteQA directory; the tools and agency.py must import shared
+    # modules (thread_functions, the thread store, the browser pool) by the same top-level names
+    code = "import sys, agency; print(sorted(name for name in sys.modules if name.startswith('WebsiteQA')))"
+    env = dict(os.environ, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "sk-test"))
+    output = subprocess.run([sys.executable, "-c", code], cwd=PACKAGE_DIR, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    assert output.strip().splitlines()[-1] == "[]"
+
+def test_connection_errors_are_retryable():
+    assert _is_retryable(openai.APIConnectionError(request=None))
+    assert not _is_retryable(ValueError("bad request"))
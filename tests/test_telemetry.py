@@ -0,0 +1,64 @@
+import json
+import urllib.request
+import pytest
+from telemetry import Exporter, Histogram, JsonFileExporter, PrometheusExporter, Telemetry
+
+def test_exporter_is_abstract():
+    with pytest.raises(TypeError):
+        Exporter()
+
+def test_histogram_quantiles():
+    histogram = Histogram(buckets=(1.0, 2.0, 4.0))
+    assert histogram.quantile(0.5) == 0.0
+    for value in (0.5, 1.5, 1.5, 3.0):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1, 0]
+    assert histogram.quantile(0.5) == 1.5
+    assert histogram.quantile(1.0) == 4.0
+
+def test_span_records_latency_and_errors():
+    telemetry = Telemetry()
+    with telemetry.span("upload", kind="file"):
+        pass
+    with pytest.raises(ValueError):
+        with telemetry.span("upload", kind="file"):
+            raise ValueError("boom")
+    snapshot = telemetry.snapshot()
+    assert snapshot["histograms"]["upload_seconds"][0]["count"] == 2
+    assert snapshot["counters"]["upload_errors_total"] == [{"labels": {"kind": "file"}, "value": 1}]
+    assert [span["error"] for span in snapshot["spans"]] == [None, "ValueError"]
+
+def test_prometheus_text_escapes_labels():
+    telemetry = Telemetry()
+    telemetry.count("pages_total", 3, status='a"b')
+    telemetry.observe("fetch_seconds", 0.02)
+    text = telemetry.prometheus_text()
+    assert '# TYPE websiteqa_pages_total counter' in text
+    assert 'websiteqa_pages_total{status="a\\"b"} 3' in text
+    assert 'websiteqa_fetch_seconds_bucket{le="0.025"} 1' in text
+    assert 'websiteqa_fetch_seconds_count 1' in text
+
+def test_failing_exporter_does_not_stop_the_others(tmp_path):
+    class Failing(Exporter):
+        def export(self, telemetry):
+            raise OSError("disk full")
+
+    telemetry = Telemetry()
+    telemetry.count("uploads_total")
+    path = tmp_path / "telemetry.json"
+    telemetry.add_exporter(Failing())
+    telemetry.add_exporter(JsonFileExporter(str(path)))
+    telemetry.export()
+    assert json.loads(path.read_text())["counters"]["uploads_total"][0]["value"] == 1
+
+def test_prometheus_exporter_binds_to_loopback_by_default():
+    telemetry = Telemetry()
+    telemetry.count("uploads_total")
+    exporter = PrometheusExporter(telemetry, port=0)
+    try:
+        host, port = exporter._server.server_address
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert "websiteqa_uploads_total 1" in response.read().decode()
+    finally:
+        exporter.close()
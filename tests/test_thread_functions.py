@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+import time
+from types import SimpleNamespace
+import pytest
+import thread_functions
+from answer_cache import AnswerCache
+from rate_limiter import RateLimiter
+from thread_store import SqliteThreadStore
+from upload_cache import UploadCache
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10))
+
+class Page:
+    def __init__(self, data, more):
+        self.data = data
+        self.more = more
+
+    def has_next_page(self):
+        return self.more
+
+class FakeOpenAI:
+    """Vector stores, files and threads (with their vector stores) as the teardown sees them. `fail_lists` makes that
+    many file listings after the first page fail, as if the connection dropped."""
+
+    def __init__(self, stores, threads, fail_lists=0):
+        self.stores = {store_id: list(files) for store_id, files in stores.items()}
+        self.threads = dict(threads)
+        self.file_objects = set().union(*self.stores.values())
+        self.fail_lists = fail_lists
+        self.deleted_files = []
+        self.files = SimpleNamespace(with_raw_response=SimpleNamespace(delete=self._delete_file))
+        store_files = SimpleNamespace(list=self._list, delete=self._detach)
+        self.vector_stores = SimpleNamespace(files=SimpleNamespace(with_raw_response=store_files), delete=self._delete_store)
+        threads_api = SimpleNamespace(retrieve=self._retrieve, with_raw_response=SimpleNamespace(delete=self._delete_thread))
+        self.beta = SimpleNamespace(threads=threads_api)
+
+    def with_options(self, **options):
+        return self
+
+    async def _list(self, vector_store_id, limit, after=None):
+        files = self.stores[vector_store_id]
+        start = files.index(after) + 1 if after else 0
+        if after and self.fail_lists:
+            self.fail_lists -= 1
+            raise RuntimeError("connection reset")
+        page = files[start:start + limit]
+        return Page([SimpleNamespace(id=file_id) for file_id in page], start + limit < len(files))
+
+    async def _detach(self, vector_store_id, file_id):
+        self.stores[vector_store_id].remove(file_id)
+
+    async def _delete_file(self, file_id):
+        self.file_objects.remove(file_id)
+        self.deleted_files.append(file_id)
+
+    async def _delete_store(self, vector_store_id):
+        del self.stores[vector_store_id]
+
+    async def _retrieve(self, thread_id):
+        store_ids = [store_id for store_id in self.threads[thread_id] if store_id in self.stores]
+        return SimpleNamespace(tool_resources=SimpleNamespace(file_search=SimpleNamespace(vector_store_ids=store_ids)))
+
+    async def _delete_thread(self, thread_id):
+        del self.threads[thread_id]
+
+@pytest.fixture
+def teardown(tmp_path, monkeypatch):
+    """Runs teardown against a fake client and stores kept under `tmp_path`."""
+    monkeypatch.chdir(tmp_path)
+    store = SqliteThreadStore(str(tmp_path / "threads.db"))
+    upload_cache = UploadCache(str(tmp_path / "upload_cache.json"))
+    answer_cache = AnswerCache(versions_path=str(tmp_path / "versions.json"))
+    limiter = RateLimiter(requests_per_second=1000)
+    monkeypatch.setattr(thread_functions, "LIST_PAGE_SIZE", 3)
+    monkeypatch.setattr(thread_functions, "get_rate_limiter", lambda: limiter)
+    monkeypatch.setattr(thread_functions, "get_thread_store", lambda: store)
+    monkeypatch.setattr(thread_functions, "get_upload_cache", lambda: upload_cache)
+    monkeypatch.setattr(thread_functions, "get_answer_cache", lambda: answer_cache)
+
+    def use(client):
+        monkeypatch.setattr(thread_functions, "get_client", lambda: client)
+        return client
+    return SimpleNamespace(store=store, upload_cache=upload_cache, use=use)
+
+def session(teardown, name, files=10, **client_options):
+    teardown.store.save(name, {"main_thread": f"{name}-main", "CEO": {"AnsweringAgent": f"{name}-answers"}})
+    client = teardown.use(FakeOpenAI({f"{name}-vs": [f"{name}-file-{n}" for n in range(files)]},
+                                     {f"{name}-main": [f"{name}-vs"], f"{name}-answers": []}, **client_options))
+    return client
+
+def test_interrupted_teardown_resumes_where_it_stopped(teardown):
+    client = session(teardown, "s1", fail_lists=1)
+    assert run(thread_functions.deactivate_threads("s1", max_concurrent=2)) is False
+    with open(os.path.join(thread_functions.TEARDOWN_DIR, "s1.json")) as f:
+        progress = json.load(f)
+    assert progress["vector_store_ids"] == ["s1-vs"] and 0 < progress["files_removed"] < 10
+    assert client.file_objects # Some files are left for the next run
+
+    assert run(thread_functions.deactivate_threads("s1", max_concurrent=2)) is True
+    assert client.stores == {} and client.threads == {} and client.file_objects == set()
+    assert sorted(client.deleted_files) == sorted(f"s1-file-{n}" for n in range(10)) # Each deleted exactly once
+    assert not teardown.store.load("s1") and not os.path.exists(os.path.join(thread_functions.TEARDOWN_DIR, "s1.json"))
+
+def test_resume_deletes_files_detached_before_the_interruption(teardown):
+    client = session(teardown, "s1", files=2)
+    client.stores["s1-vs"].remove("s1-file-0") # Detached, but its object was never deleted
+    os.makedirs(thread_functions.TEARDOWN_DIR)
+    progress = {"threads": teardown.store.load("s1"), "vector_store_ids": ["s1-vs"], "detached": ["s1-file-0"],
+                "files_removed": 0, "threads_deleted": []}
+    with open(os.path.join(thread_functions.TEARDOWN_DIR, "s1.json"), "w") as f:
+        json.dump(progress, f)
+
+    assert run(thread_functions.deactivate_threads("s1")) is True
+    assert client.deleted_files[0] == "s1-file-0" and client.file_objects == set()
+
+def test_files_shared_with_another_session_are_kept(teardown):
+    client = session(teardown, "s1", files=2)
+    teardown.upload_cache.store("d0", "s1-file-0", "s1")
+    run(teardown.upload_cache.lookup(client, "d0", "s2"))
+    assert run(thread_functions.deactivate_threads("s1")) is True
+    assert client.file_objects == {"s1-file-0"} and client.stores == {}
+
+def test_janitor_collects_expired_and_interrupted_sessions(teardown):
+    for name in ("old", "fresh"):
+        session(teardown, name, files=1)
+    client = teardown.use(FakeOpenAI({"old-vs": ["old-file-0"], "broken-vs": ["broken-file-0"]},
+                                     {"old-main": ["old-vs"], "old-answers": [], "fresh-main": []}))
+    with teardown.store._transaction() as conn:
+        conn.execute("UPDATE threads SET updated_at = ? WHERE session_name = 'old'", (time.time() - 48 * 3600,))
+    # A teardown of a session no longer in the store was interrupted earlier
+    os.makedirs(thread_functions.TEARDOWN_DIR)
+    with open(os.path.join(thread_functions.TEARDOWN_DIR, "broken.json"), "w") as f:
+        json.dump({"threads": {"main_thread": "broken-main"}, "vector_store_ids": ["broken-vs"], "detached": [],
+                   "files_removed": 0, "threads_deleted": ["broken-main"]}, f)
+
+    results = run(thread_functions.sweep_expired_sessions(max_age_hours=24))
+    assert results == {"old": True, "broken": True}
+    assert client.stores == {} and client.file_objects == set() and list(client.threads) == ["fresh-main"]
+    assert teardown.store.sessions() == ["fresh"]
+    assert os.listdir(thread_functions.TEARDOWN_DIR) == []
@@ -0,0 +1,77 @@
+import json
+import os
+import threading
+import time
+import pytest
+from thread_store import JsonThreadStore, SqliteThreadStore, ThreadStore
+
+def sqlite_store(tmp_path) -> SqliteThreadStore:
+    return SqliteThreadStore(str(tmp_path / "threads.db"), json_directory=str(tmp_path))
+
+def test_thread_store_is_abstract():
+    with pytest.raises(TypeError):
+        ThreadStore()
+
+@pytest.mark.parametrize("make_store", [sqlite_store, lambda tmp_path: JsonThreadStore(str(tmp_path))])
+def test_save_load_delete(tmp_path, make_store):
+    store = make_store(tmp_path)
+    assert store.load("s1") == []
+    assert store.main_thread("s1") is None
+    store.save("s1", {"main_thread": "thread_1"})
+    store.save("s2", {"main_thread": "thread_2"})
+    assert store.load("s1") == {"main_thread": "thread_1"}
+    assert store.main_thread("s2") == "thread_2"
+    assert store.sessions() == ["s1", "s2"]
+    assert store.delete("s1") is True
+    assert store.delete("s1") is False
+    assert store.load("s1") == []
+    assert store.sessions() == ["s2"]
+
+def test_expired_sessions(tmp_path):
+    store = sqlite_store(tmp_path)
+    store.save("old", {"main_thread": "t1"})
+    time.sleep(0.05)
+    store.save("new", {"main_thread": "t2"})
+    assert store.expired_sessions(0.03) == ["old"]
+    assert store.expired_sessions(3600) == []
+
+def test_sees_commits_of_other_connections(tmp_path):
+    writer, reader = sqlite_store(tmp_path), sqlite_store(tmp_path)
+    writer.save("s1", {"main_thread": "thread_1"})
+    assert reader.main_thread("s1") == "thread_1" # Now cached by the reader
+    writer.save("s1", {"main_thread": "thread_2"})
+    assert reader.main_thread("s1") == "thread_2"
+    writer.delete("s1")
+    assert reader.load("s1") == []
+
+def test_concurrent_saves_from_threads(tmp_path):
+    store = sqlite_store(tmp_path)
+
+    def save_sessions(worker: int):
+        for n in range(20):
+            store.save(f"w{worker}-{n}", {"main_thread": f"thread_{worker}_{n}"})
+
+    workers = [threading.Thread(target=save_sessions, args=(worker,)) for worker in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert len(store.sessions()) == 80
+    assert sqlite_store(tmp_path).main_thread("w3-19") == "thread_3_19"
+
+def test_migrates_legacy_json_files(tmp_path):
+    legacy = tmp_path / "s1_threads.json"
+    legacy.write_text(json.dumps({"main_thread": "thread_1"}))
+    (tmp_path / "s2_threads.json").write_text(json.dumps({"main_thread": "thread_2"}))
+    store = sqlite_store(tmp_path)
+    assert store.main_thread("s1") == "thread_1"
+    assert not legacy.exists() and os.path.exists(f"{legacy}.migrated")
+    assert store.migrate_json_files() == 1
+    assert store.sessions() == ["s1", "s2"]
+
+def test_migration_never_overwrites_saved_threads(tmp_path):
+    store = sqlite_store(tmp_path)
+    store.save("s1", {"main_thread": "thread_new"})
+    (tmp_path / "s1_threads.json").write_text(json.dumps({"main_thread": "thread_old"}))
+    store.migrate_json_files()
+    assert sqlite_store(tmp_path).main_thread("s1") == "thread_new"
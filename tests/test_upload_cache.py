@@ -0,0 +1,95 @@
+import asyncio
+import time
+import httpx
+import openai
+from upload_cache import UploadCache, sha256_bytes
+
+class Files:
+    def __init__(self, existing):
+        self.existing = existing
+        self.retrieved = []
+        self.with_raw_response = self
+
+    async def retrieve(self, file_id):
+        self.retrieved.append(file_id)
+        if file_id not in self.existing:
+            response = httpx.Response(404, request=httpx.Request("GET", f"https://api.openai.com/v1/files/{file_id}"))
+            raise openai.NotFoundError("No such file", response=response, body=None)
+        return {"id": file_id}
+
+class Client:
+    def __init__(self, *existing):
+        self.files = Files(set(existing))
+
+    def with_options(self, **options):
+        return self
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10))
+
+def test_lookup_reuses_stored_file_and_registers_session(tmp_path):
+    cache = UploadCache(str(tmp_path / "cache.json"))
+    digest = sha256_bytes(b"# Scraped Content from https://example.com/a\n\nbody")
+    assert run(cache.lookup(Client(), digest, "s1")) is None
+    cache.store(digest, "file-1", "s1")
+    client = Client("file-1")
+    assert run(cache.lookup(client, digest, "s2")) == "file-1"
+    assert client.files.retrieved == [] # Verified when stored
+    assert cache.entries[digest]["sessions"] == ["s1", "s2"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_deleted_file_is_dropped_on_verification(tmp_path):
+    cache = UploadCache(str(tmp_path / "cache.json"), verify_interval=0)
+    cache.store("d1", "file-gone", "s1")
+    client = Client()
+    assert run(cache.lookup(client, "d1", "s1")) is None
+    assert client.files.retrieved == ["file-gone"]
+    assert "d1" not in cache.entries
+
+def test_release_keeps_files_other_sessions_use(tmp_path):
+    cache = UploadCache(str(tmp_path / "cache.json"))
+    cache.store("d1", "file-1", "s1")
+    run(cache.lookup(Client("file-1"), "d1", "s2"))
+    assert cache.release("file-1", "s1") is False
+    assert cache.release("file-1", "s2") is True
+    assert "d1" not in cache.entries
+    assert cache.release("file-unknown", "s1") is True
+
+def test_save_evicts_expired_and_least_recently_used(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = UploadCache(path, max_entries=2, ttl=60)
+    for n in range(3):
+        cache.store(f"d{n}", f"file-{n}", "s1")
+    cache.entries["d2"]["last_used"] = time.time() - 120
+    cache.store("d3", "file-3", "s1")
+    cache.save()
+
+    reloaded = UploadCache(path)
+    assert list(reloaded.entries) == ["d1", "d3"]
+    assert reloaded.entries["d3"]["file_id"] == "file-3"
+
+def test_sessions_in_other_processes_are_merged_on_save(tmp_path):
+    path = str(tmp_path / "cache.json")
+    first, second = UploadCache(path, max_entries=2), UploadCache(path, max_entries=2) # One per process
+    first.store("d0", "file-0", "s1")
+    first.store("d1", "file-1", "s1")
+    first.save()
+    second.store("d2", "file-2", "s2")
+    second.save() # Evicts the least recently used entry of both processes, not the new one
+    assert list(UploadCache(path).entries) == ["d1", "d2"]
+
+def test_release_sees_sessions_recorded_by_other_processes(tmp_path):
+    path = str(tmp_path / "cache.json")
+    first = UploadCache(path)
+    first.store("d1", "file-1", "s1")
+    first.store("d2", "file-2", "s1")
+    first.save()
+    second = UploadCache(path)
+    run(second.lookup(Client("file-1"), "d1", "s2"))
+    second.save()
+
+    assert first.release("file-1", "s1") is False # s2 still uses it
+    assert first.release("file-2", "s1") is True
+    first.save()
+    second.save() # Does not bring back the entry of the deleted file
+    assert {digest: entry["sessions"] for digest, entry in UploadCache(path).entries.items()} == {"d1": ["s2"]}